@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+嵌入模型后端基准
+
+对比Ollama服务与进程内ONNX后端的单条查询延迟与批量编码吞吐量；
+不可用的后端（如Ollama未启动、模型目录不存在）会记录错误后跳过
+
+使用方法:
+  python benchmarks/bench_embeddings.py
+  python benchmarks/bench_embeddings.py --backends bge-m3:latest onnx:models/bge-small-zh-v1.5 --output bench_embeddings.json
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import DEFAULT_CONFIG, HAZARD_TAXONOMY
+from src.tools.embeddings import create_embeddings
+
+FILLER = "施工单位应当建立健全安全生产责任制度，作业前进行安全技术交底，发现隐患立即整改。"
+
+
+def build_texts(count, seed=42):
+    """生成长度不一的规范片段（约50~400字）"""
+    rng = random.Random(seed)
+    queries = [entry["query"] for entry in HAZARD_TAXONOMY.values()]
+    texts = []
+    for _ in range(count):
+        parts = [rng.choice(queries) + "。" + FILLER for _ in range(rng.randint(1, 5))]
+        texts.append("".join(parts)[:400])
+    return texts
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def bench_backend(spec, texts, queries, warmup):
+    start = time.perf_counter()
+    embeddings = create_embeddings(spec)
+    init_ms = (time.perf_counter() - start) * 1000
+
+    for query in queries[:warmup]:
+        embeddings.embed_query(query)
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embeddings.embed_query(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    vectors = embeddings.embed_documents(texts)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "backend": spec,
+        "init_ms": round(init_ms, 3),
+        "dim": len(vectors[0]) if vectors else 0,
+        "query_latency_ms": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "mean": round(statistics.mean(latencies), 3),
+        },
+        "batch_texts": len(texts),
+        "batch_texts_per_s": round(len(texts) / batch_seconds, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入模型后端基准")
+    parser.add_argument("--backends", nargs="+", default=[DEFAULT_CONFIG["embedding_model"]],
+                        help="embedding_model 配置值，如 bge-m3:latest、onnx:<模型目录>")
+    parser.add_argument("--texts", type=int, default=256, help="批量编码的片段数")
+    parser.add_argument("--queries", type=int, default=50, help="单条查询次数")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    texts = build_texts(args.texts)
+    queries = [f"{term}有哪些安全要求" for entry in HAZARD_TAXONOMY.values() for term in entry["synonyms"]]
+    queries = (queries * (args.queries // len(queries) + 1))[:args.queries]
+
+    results = {"runs": []}
+    print(f"{'后端':<40} {'维度':>6} {'查询p50(ms)':>12} {'查询p95(ms)':>12} {'批量(条/s)':>12}")
+    for spec in args.backends:
+        try:
+            run = bench_backend(spec, texts, queries, args.warmup)
+        except Exception as e:
+            run = {"backend": spec, "error": str(e)}
+            print(f"{spec:<40} 不可用: {e}")
+        else:
+            latency = run["query_latency_ms"]
+            print(
+                f"{spec:<40} {run['dim']:>6} {latency['p50']:>12} {latency['p95']:>12} "
+                f"{run['batch_texts_per_s']:>12}"
+            )
+        results["runs"].append(run)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+上传图片到视觉模型输入的内存与耗时基准
+
+对比两条路径从上传缓冲区到格式化后的模型提示词的开销：
+  - 落盘路径（原实现）：写入磁盘 -> 按路径校验 -> 读回并base64编码 -> data URL 嵌入提示词模板后构建
+  - 内存路径：ImagePayload 直接包装上传缓冲区的 memoryview -> 校验、哈希、预处理 -> 分块编码 -> 作为变量传入预先构建的模板
+以 tracemalloc 统计每次上传的峰值分配（及相当于原图的份数）
+
+使用方法:
+  python benchmarks/bench_image_pipeline.py
+  python benchmarks/bench_image_pipeline.py --images 4000x3000 1600x1200 --max-px 0 2048 --output bench_image_pipeline.json
+"""
+
+import argparse
+import io
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from PIL import Image
+from langchain_core.prompts import ChatPromptTemplate
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.image_pipeline import ImagePayload
+from src.core.utils import FileUtils
+
+SYSTEM_PROMPT = "你是一位专业的建筑施工安全检查员。请分析这张施工现场图片，识别其中的安全隐患。"
+USER_TEXT = "请分析这张施工现场图片，识别安全隐患。"
+
+
+def build_upload(width, height):
+    """生成模拟手机照片的JPEG（渐变叠加噪声，压缩率接近实拍照片）"""
+    noise = Image.effect_noise((width, height), 24)
+    gradient = Image.linear_gradient("L").rotate(90).resize((width, height))
+    image = Image.merge("RGB", (noise, gradient, Image.blend(noise, gradient, 0.5)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=90)
+    return buffer
+
+
+def disk_path(upload, upload_dir):
+    """原实现：getbuffer 写盘，按路径校验，读回后base64编码并嵌入模板"""
+    temp_path = Path(upload_dir) / "IMG_0001.jpg"
+    with open(temp_path, "wb") as f:
+        f.write(upload.getbuffer())
+    is_valid, _ = FileUtils.validate_image(str(temp_path))
+    assert is_valid
+    image_base64 = FileUtils.image_to_base64(temp_path)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", [
+            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{image_base64}"}},
+            {"type": "text", "text": USER_TEXT},
+        ]),
+    ])
+    return prompt.invoke({})
+
+
+def memory_path(upload, prompt):
+    """内存路径：memoryview 贯穿校验、哈希、预处理与编码，模板预先构建"""
+    payload = ImagePayload(upload.getbuffer(), "IMG_0001.jpg")
+    is_valid, _ = payload.validate()
+    assert is_valid
+    payload.digest
+    return prompt.invoke({"image_url": payload.data_url()})
+
+
+def measure(func, *args):
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    start = time.perf_counter()
+    func(*args)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="上传图片到视觉模型输入的内存与耗时基准")
+    parser.add_argument("--images", nargs="+", default=["4000x3000", "1600x1200"], help="图片尺寸，宽x高")
+    parser.add_argument("--max-px", type=int, nargs="+", default=[0, DEFAULT_CONFIG["vision_max_px"]],
+                        help="内存路径的 vision_max_px（0 表示不缩放，与原实现一样发送原图）")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("human", [
+            {"type": "image_url", "image_url": {"url": "{image_url}"}},
+            {"type": "text", "text": USER_TEXT},
+        ]),
+    ])
+
+    results = {"runs": []}
+    with tempfile.TemporaryDirectory() as upload_dir:
+        for spec in args.images:
+            width, height = (int(v) for v in spec.split("x"))
+            upload = build_upload(width, height)
+            size = upload.getbuffer().nbytes
+            print(f"\n图片 {spec}，{size / 1024 / 1024:.2f} MB")
+
+            cases = [("disk", None, lambda: disk_path(upload, upload_dir))]
+            for max_px in args.max_px:
+                cases.append(("memory", max_px, lambda: memory_path(upload, prompt)))
+
+            for name, max_px, func in cases:
+                if max_px is not None:
+                    DEFAULT_CONFIG["vision_max_px"] = max_px
+                runs = [measure(func) for _ in range(args.repeat)]
+                elapsed = min(r[0] for r in runs)
+                peak = min(r[1] for r in runs)
+                label = "落盘路径" if name == "disk" else f"内存路径（vision_max_px={max_px}）"
+                print(
+                    f"  {label}: {elapsed * 1000:.1f} ms，峰值分配 {peak / 1024 / 1024:.2f} MB"
+                    f"（{peak / size:.2f} 份原图）"
+                )
+                results["runs"].append({
+                    "image": spec,
+                    "size_bytes": size,
+                    "path": name,
+                    "vision_max_px": max_px,
+                    "elapsed_ms": round(elapsed * 1000, 2),
+                    "peak_bytes": peak,
+                    "peak_copies": round(peak / size, 2),
+                })
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
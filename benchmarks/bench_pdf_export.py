@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF批量导出吞吐量基准
+
+对比当前进程内逐份渲染与渲染进程池（不同工作进程数）并行渲染的吞吐量（份/秒），
+并测量带目录合订本的生成耗时；报告为合成数据，章节长度与实际生成的报告相近
+
+使用方法:
+  python benchmarks/bench_pdf_export.py
+  python benchmarks/bench_pdf_export.py --reports 200 --workers 1 2 4 --output bench_pdf_export.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import REPORT_TEMPLATE
+from src.core.pdf_render import (
+    REPORTLAB_AVAILABLE,
+    compendium_job,
+    export_job,
+    register_chinese_font,
+    render_report_pdf,
+)
+
+SENTENCES = [
+    "施工现场临边作业区域未设置防护栏杆，存在高处坠落风险。",
+    "作业人员未按规定佩戴安全帽，应立即停止作业并整改。",
+    "脚手架连墙件设置间距不符合规范要求，需加密设置。",
+    "临时用电配电箱未做到一机一闸一漏一箱，存在触电隐患。",
+    "依据《建筑施工高处作业安全技术规范》JGJ80-2016第4.1.1条执行。",
+]
+
+
+def build_reports(count, seed=42):
+    """生成合成报告数据"""
+    rng = random.Random(seed)
+    reports = []
+    for i in range(count):
+        reports.append({
+            "report_id": f"BENCH-{i:05d}",
+            "title": "施工现场安全评估报告",
+            "company": f"测试建设集团第{i % 7 + 1}工程公司",
+            "site_id": f"SITE-{i % 13:03d}",
+            "generate_date": f"2026年{i % 12 + 1:02d}月{i % 28 + 1:02d}日",
+            "overall_risk": rng.choice(["high", "medium", "low"]),
+            "sections": {
+                section: "".join(rng.choice(SENTENCES) for _ in range(rng.randint(3, 12)))
+                for section in REPORT_TEMPLATE["sections"]
+            },
+        })
+    return reports
+
+
+def bench_serial(reports, output_dir):
+    register_chinese_font()
+    start = time.perf_counter()
+    for report in reports:
+        data = render_report_pdf(report)
+        (output_dir / f"{report['report_id']}.pdf").write_bytes(data)
+    return time.perf_counter() - start
+
+
+def bench_pool(reports, output_dir, workers):
+    """返回 (进程池启动耗时, 批量渲染耗时)"""
+    start = time.perf_counter()
+    pool = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=register_chinese_font,
+    )
+    # 预热：确保所有工作进程已启动并完成字体注册
+    list(pool.map(export_job, reports[:workers], [None] * workers, [False] * workers))
+    warmup = time.perf_counter() - start
+
+    start = time.perf_counter()
+    futures = [
+        pool.submit(export_job, report, str(output_dir / f"{report['report_id']}.pdf"), False)
+        for report in reports
+    ]
+    failed = sum(not future.result()["success"] for future in futures)
+    elapsed = time.perf_counter() - start
+    pool.shutdown()
+    if failed:
+        print(f"  警告: {failed} 份报告渲染失败")
+    return warmup, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF批量导出吞吐量基准")
+    parser.add_argument("--reports", type=int, default=100, help="报告份数")
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, max(1, (os.cpu_count() or 1))}))
+    parser.add_argument("--compendium-size", type=int, default=50, help="合订本包含的报告份数")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    if not REPORTLAB_AVAILABLE:
+        print("ReportLab未安装，请先安装: pip install reportlab")
+        return
+
+    reports = build_reports(args.reports)
+    results = {"reports": args.reports, "cpu_count": os.cpu_count(), "runs": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output_dir = Path(tmp)
+
+        elapsed = bench_serial(reports, output_dir)
+        serial_rate = args.reports / elapsed
+        results["serial"] = {"elapsed_s": round(elapsed, 3), "pdfs_per_s": round(serial_rate, 2)}
+        print(f"进程内逐份渲染: {elapsed:.2f}s，{serial_rate:.1f} 份/秒")
+
+        for workers in args.workers:
+            warmup, elapsed = bench_pool(reports, output_dir, workers)
+            rate = args.reports / elapsed
+            results["runs"].append({
+                "workers": workers,
+                "warmup_s": round(warmup, 3),
+                "elapsed_s": round(elapsed, 3),
+                "pdfs_per_s": round(rate, 2),
+                "speedup": round(rate / serial_rate, 2),
+            })
+            print(
+                f"进程池 {workers} 个工作进程: 启动 {warmup:.2f}s，渲染 {elapsed:.2f}s，"
+                f"{rate:.1f} 份/秒（{rate / serial_rate:.2f}x）"
+            )
+
+        subset = reports[:args.compendium_size]
+        start = time.perf_counter()
+        result = compendium_job(subset, output_path=output_dir / "compendium.pdf", return_data=False)
+        elapsed = time.perf_counter() - start
+        results["compendium"] = {
+            "reports": len(subset),
+            "elapsed_s": round(elapsed, 3),
+            "size_kb": result.get("size", 0) // 1024,
+            "success": result["success"],
+        }
+        print(f"合订本（{len(subset)} 份，含目录）: {elapsed:.2f}s，{result.get('size', 0) // 1024} KB")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
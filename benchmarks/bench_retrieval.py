@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+知识库检索基准
+
+使用合成的中文安全规范语料与确定性的本地哈希嵌入（不依赖Ollama），关闭近重复去重，在多个语料规模下测量:
+  - 入库吞吐量（片段/秒），同时给出切分得到的片段数与实际入库片段数（多条短条文会合并为一个片段）
+  - 查询延迟 p50/p95/p99（绕过检索结果缓存）
+  - 标注查询的 recall@k（前k个结果中属于目标类别的片段数 / min(k, 该类别片段总数)）
+
+结果可写入JSON，便于不同提交之间对比
+
+使用方法:
+  python benchmarks/bench_retrieval.py
+  python benchmarks/bench_retrieval.py --sizes 200 1000 5000 --k 5 --output bench_retrieval.json
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import HAZARD_TAXONOMY
+from src.core.utils import CacheUtils
+from src.tools import retrieval as retrieval_module
+from src.tools.retrieval import KnowledgeRetriever
+
+SUBJECTS = ["施工单位", "总承包单位", "项目负责人", "专职安全生产管理人员", "作业人员", "监理单位"]
+TEMPLATES = [
+    "{subject}应当对{term}进行检查，发现{term}存在隐患的应立即整改。",
+    "{term}作业前，{subject}必须进行安全技术交底并留存记录。",
+    "严禁在{term}不符合要求的情况下组织施工，{subject}应当履行监督职责。",
+    "{subject}应按规定配备与{term}相关的防护设施，并定期维护保养。",
+    "涉及{term}的危险性较大的分部分项工程，{subject}应当编制专项施工方案。",
+    "{term}验收合格后方可投入使用，{subject}应在显著位置设置验收标识牌。",
+]
+
+
+class HashingEmbeddings(Embeddings):
+    """确定性哈希嵌入：字符二元组哈希到固定维度后归一化，同样的文本始终得到同样的向量"""
+
+    def __init__(self, dim=256):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for i in range(len(text) - 1):
+            digest = hashlib.blake2b(text[i:i + 2].encode("utf-8"), digest_size=4).digest()
+            value = int.from_bytes(digest, "little")
+            vector[value % self.dim] += 1.0 if value & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class BenchmarkRetriever(KnowledgeRetriever):
+    """使用哈希嵌入的检索器"""
+
+    def _create_embeddings(self, model_name):
+        return HashingEmbeddings()
+
+
+def build_corpus(num_articles, corpus_dir, seed=42):
+    """
+    生成合成规范语料：每个隐患类别一个文件，条文由模板与该类别术语随机组合
+
+    Returns:
+        {文件路径: 隐患类别}
+    """
+    rng = random.Random(seed)
+    categories = list(HAZARD_TAXONOMY)
+    articles = {category: [] for category in categories}
+    for n in range(num_articles):
+        category = categories[n % len(categories)]
+        terms = [category] + HAZARD_TAXONOMY[category]["synonyms"]
+        sentences = [
+            rng.choice(TEMPLATES).format(subject=rng.choice(SUBJECTS), term=rng.choice(terms))
+            for _ in range(rng.randint(2, 4))
+        ]
+        articles[category].append(f"第{n + 1}条 " + "".join(sentences))
+
+    labels = {}
+    for index, category in enumerate(categories):
+        path = Path(corpus_dir) / f"{index:02d}_{category}.txt"
+        path.write_text("\n\n".join(articles[category]), encoding="utf-8")
+        labels[str(path)] = category
+    return labels
+
+
+def build_queries(seed=7):
+    """标注查询：类别的法规检索语句与同义词组合问句"""
+    rng = random.Random(seed)
+    queries = []
+    for category, entry in HAZARD_TAXONOMY.items():
+        queries.append((entry["query"], category))
+        for term in rng.sample(entry["synonyms"], min(2, len(entry["synonyms"]))):
+            queries.append((f"{term}有哪些安全要求", category))
+    return queries
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def run_size(num_articles, k, rounds):
+    workdir = Path(tempfile.mkdtemp(prefix="bench_retrieval_"))
+    try:
+        corpus_dir = workdir / "corpus"
+        corpus_dir.mkdir()
+        labels = build_corpus(num_articles, corpus_dir)
+        # 合成条文由模板组合而成，彼此相似度高；关闭近重复去重，使入库与检索的片段数
+        # 等于切分得到的片段数，吞吐与召回率对应完整语料
+        retriever = BenchmarkRetriever({"persist_dir": str(workdir / "chroma_db"), "dedup_enabled": False})
+
+        start = time.perf_counter()
+        num_chunks = num_input_chunks = 0
+        for path in labels:
+            result = retriever.add_documents(path)
+            num_chunks += result.get("num_chunks", 0)
+            num_input_chunks += result.get("num_input_chunks", 0)
+        ingest_seconds = time.perf_counter() - start
+
+        # 每个类别的相关片段数取自增量统计中的来源计数
+        source_counts = retriever.get_collection_stats("safe")["sources"]
+        relevant = {}
+        for path, category in labels.items():
+            relevant[category] = relevant.get(category, 0) + source_counts.get(path, 0)
+
+        queries = build_queries()
+        latencies, recalls = [], []
+        for _ in range(rounds):
+            for query, category in queries:
+                CacheUtils.clear()
+                start = time.perf_counter()
+                docs = retriever.retrieve(query, k=k)
+                latencies.append((time.perf_counter() - start) * 1000)
+                hits = sum(1 for doc in docs if labels.get(doc.metadata.get("source")) == category)
+                recalls.append(hits / max(1, min(k, relevant[category])))
+
+        return {
+            "articles": num_articles,
+            "input_chunks": num_input_chunks,
+            "chunks": num_chunks,
+            "ingest_seconds": round(ingest_seconds, 3),
+            "ingest_chunks_per_s": round(num_chunks / ingest_seconds, 1) if ingest_seconds else None,
+            "queries": len(latencies),
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 3),
+                "p95": round(percentile(latencies, 95), 3),
+                "p99": round(percentile(latencies, 99), 3),
+                "mean": round(statistics.mean(latencies), 3),
+            },
+            f"recall@{k}": round(statistics.mean(recalls), 4),
+        }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库检索基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[200, 1000, 5000], help="语料条文数")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rounds", type=int, default=3, help="每个规模下标注查询的重复轮数")
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    # 逐次检索的INFO日志会干扰计时
+    retrieval_module.logger.setLevel("WARNING")
+
+    results = {"k": args.k, "embedding": "hashing-256", "runs": []}
+    print(f"{'条文数':>8} {'切分片段':>8} {'入库片段':>8} {'入库(片段/s)':>14} {'p50(ms)':>10} {'p95(ms)':>10} {'p99(ms)':>10} {'recall@' + str(args.k):>10}")
+    for size in args.sizes:
+        run = run_size(size, args.k, args.rounds)
+        results["runs"].append(run)
+        latency = run["latency_ms"]
+        print(
+            f"{run['articles']:>8} {run['input_chunks']:>8} {run['chunks']:>8} {run['ingest_chunks_per_s']:>14} "
+            f"{latency['p50']:>10} {latency['p95']:>10} {latency['p99']:>10} {run[f'recall@{args.k}']:>10}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+隐患分类匹配器微基准
+
+对比编译后的前缀树匹配器与逐词 str.count 扫描（原路由实现方式）在长文本上的吞吐量
+
+使用方法:
+  python benchmarks/bench_taxonomy.py
+  python benchmarks/bench_taxonomy.py --sizes 10000 100000 1000000 --output bench_taxonomy.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import HAZARD_TAXONOMY, KB_SHARDS
+from src.core.taxonomy import HazardTaxonomy
+
+FILLER = "施工单位应当建立健全安全生产责任制度和安全生产教育培训制度，制定安全生产规章制度和操作规程。"
+
+
+def build_text(size, seed=42):
+    """生成指定长度的混合文本：规范性套话中随机穿插隐患术语"""
+    rng = random.Random(seed)
+    terms = [t for entry in HAZARD_TAXONOMY.values() for t in entry["synonyms"]]
+    parts, length = [], 0
+    while length < size:
+        part = FILLER[: rng.randint(10, len(FILLER))]
+        if rng.random() < 0.3:
+            part += rng.choice(terms)
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+
+def naive_analyze(text):
+    """基线：对每个术语各做一次完整扫描并计数"""
+    category_hits = {
+        category: sum(text.count(term) for term in [category] + entry["synonyms"])
+        for category, entry in HAZARD_TAXONOMY.items()
+    }
+    shard_hits = {
+        shard: sum(text.count(term) for term in entry["keywords"])
+        for shard, entry in KB_SHARDS.items()
+    }
+    return (
+        sorted((c for c in category_hits if category_hits[c]), key=lambda c: -category_hits[c]),
+        sorted((s for s in shard_hits if shard_hits[s]), key=lambda s: -shard_hits[s]),
+    )
+
+
+def time_call(func, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="隐患分类匹配器微基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="结果JSON输出路径")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    taxonomy = HazardTaxonomy()
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    results = {"compile_ms": round(compile_ms, 3), "runs": []}
+    print(f"匹配器编译耗时: {compile_ms:.2f} ms")
+    print(f"{'字符数':>10} {'匹配器(ms)':>12} {'匹配器(MB/s)':>14} {'逐词扫描(ms)':>14}")
+
+    for size in args.sizes:
+        text = build_text(size)
+        mb = len(text.encode("utf-8")) / (1024 * 1024)
+        matcher_seconds = time_call(taxonomy.analyze, text, args.repeat)
+        naive_seconds = time_call(naive_analyze, text, args.repeat)
+        run = {
+            "chars": size,
+            "matcher_ms": round(matcher_seconds * 1000, 3),
+            "matcher_mb_per_s": round(mb / matcher_seconds, 2),
+            "matcher_chars_per_s": round(size / matcher_seconds),
+            "naive_ms": round(naive_seconds * 1000, 3),
+        }
+        results["runs"].append(run)
+        print(
+            f"{size:>10} {run['matcher_ms']:>12} {run['matcher_mb_per_s']:>14} {run['naive_ms']:>14}"
+        )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+知识库快照工具
+
+功能:
+- export: 将知识库全部集合（向量、文本、元数据）导出为单个带校验和的快照文件
+- import: 将快照批量导入到新的持久化目录，无需重新计算向量
+- verify: 校验快照完整性并打印概要
+
+使用方法:
+  python kb_snapshot.py export --out snapshots/kb.snap
+  python kb_snapshot.py import snapshots/kb.snap --persist-dir data/chroma_db
+  python kb_snapshot.py verify snapshots/kb.snap
+"""
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.snapshot import export_snapshot, import_snapshot, verify_snapshot, SnapshotError
+
+# 配置日志
+logging.basicConfig(
+    format='%(asctime)s %(levelname)s [kb_snapshot] %(message)s',
+    level=logging.INFO,
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _summary(header):
+    total = sum(c["count"] for c in header["collections"])
+    logger.info(f"快照创建时间: {header['created_at']}，嵌入模型: {header['embedding_model']}")
+    for collection in header["collections"]:
+        logger.info(f"  {collection['name']}: {collection['count']} 条记录，维度 {collection['dim']}")
+    logger.info(f"合计 {total} 条记录，校验和 {header['payload_sha256'][:16]}...")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库快照导出/导入工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="导出知识库快照")
+    export_parser.add_argument("--out", required=True, help="快照输出路径")
+    export_parser.add_argument("--persist-dir", default=DEFAULT_CONFIG["persist_dir"])
+
+    import_parser = subparsers.add_parser("import", help="导入知识库快照")
+    import_parser.add_argument("snapshot", help="快照文件路径")
+    import_parser.add_argument("--persist-dir", default=DEFAULT_CONFIG["persist_dir"])
+    import_parser.add_argument("--overwrite", action="store_true", help="覆盖目标目录中的同名集合")
+
+    verify_parser = subparsers.add_parser("verify", help="校验快照完整性")
+    verify_parser.add_argument("snapshot", help="快照文件路径")
+
+    args = parser.parse_args()
+    start = time.perf_counter()
+
+    try:
+        if args.command == "export":
+            header = export_snapshot(args.out, args.persist_dir)
+        elif args.command == "import":
+            header = import_snapshot(args.snapshot, args.persist_dir, overwrite=args.overwrite)
+        else:
+            header = verify_snapshot(args.snapshot)
+    except SnapshotError as e:
+        logger.error(f"快照操作失败: {e}")
+        sys.exit(1)
+
+    _summary(header)
+    logger.info(f"{args.command} 完成，耗时 {time.perf_counter() - start:.2f} 秒")
+
+
+if __name__ == "__main__":
+    main()
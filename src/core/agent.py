@@ -16,6 +16,9 @@ from src.tools import (
     retrieve_knowledge_tool,
     generate_report_tool,
     export_pdf_tool,
+    aanalyze_image_tool,
+    aretrieve_knowledge_tool,
+    agenerate_report_tool,
 )
 from src.core.logging import getLogger
 
@@ -176,16 +179,19 @@ tools = [
     Tool(
         name="analyze_image_tool",
         func=analyze_image_tool,
+        coroutine=aanalyze_image_tool,
         description="分析施工现场图片，识别安全隐患。输入应为图片文件路径。【限制：仅支持 JPG/JPEG/PNG 格式，不超过 10MB】",
     ),
     Tool(
         name="retrieve_knowledge_tool",
         func=retrieve_knowledge_tool,
+        coroutine=aretrieve_knowledge_tool,
         description="从知识库中检索相关的建筑施工安全知识。输入为查询关键词。【限制：仅限中文查询，与施工安全相关】",
     ),
     Tool(
         name="generate_report_tool",
         func=generate_report_tool,
+        coroutine=agenerate_report_tool,
         description="生成安全评估报告。输入应为JSON格式的分析结果，或使用默认示例数据。【限制：JSON 必须包含 hazards 字段】",
     ),
     Tool(
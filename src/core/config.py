@@ -12,12 +12,73 @@ BASE_DIR = Path(__file__).parent.parent.parent
 DEFAULT_CONFIG = {
     "persist_dir": str(BASE_DIR / "data" / "chroma_db"),
     "upload_dir": str(BASE_DIR / "data" / "uploads"),
+    "report_store_db": str(BASE_DIR / "data" / "reports.db"),
+    "ingest_queue_db": str(BASE_DIR / "data" / "ingest_jobs.db"),
+    "upload_store_db": str(BASE_DIR / "data" / "uploads.db"),
+    # 嵌入模型："<Ollama模型名>" 或 "onnx:<模型目录>"（进程内CPU推理）
     "embedding_model": "bge-m3:latest",
+    "embedding_batch_size": 32,
+    "embedding_num_threads": 0,
+    "embedding_max_length": 512,
+    "embedding_pooling": "cls",
     "chunk_size": 400,
     "chunk_overlap": 40,
     "retrieval_k": 5,
+    "dedup_enabled": True,
+    "dedup_similarity_threshold": 0.8,
+    "max_open_collections": 8,
+    "shard_search_workers": 4,
+    "chroma_memory_limit_bytes": 2 * 1024 * 1024 * 1024,
     "max_image_size": 10 * 1024 * 1024,
     "allowed_image_formats": ["jpg", "jpeg", "png"],
+    # 送入视觉模型前的预处理：长边超过 vision_max_px 时缩放并以 vision_jpeg_quality 重新压缩，0表示不缩放
+    "vision_max_px": 2048,
+    "vision_jpeg_quality": 85,
+    # 上传文件异步落盘的线程数
+    "upload_persist_workers": 2,
+    # 上传文件按内容寻址存储：会话引用在 ttl 后过期，报告引用其现场照片保留 retention 天，
+    # 无引用的文件超过宽限期后删除；总大小超出配额时优先删除最久未使用的无引用文件
+    "upload_quota_mb": 2048,
+    "upload_session_ttl_hours": 24,
+    "upload_report_retention_days": 180,
+    "upload_gc_grace_seconds": 600,
+    # 导出的PDF与照片压缩缓存的保留期限与配额，由后台清理线程定期执行
+    "pdf_output_max_age_days": 30,
+    "pdf_output_quota_mb": 1024,
+    "pdf_image_cache_quota_mb": 512,
+    "storage_sweep_interval_seconds": 600,
+    # PDF渲染工作进程数
+    "pdf_render_workers": 2,
+    # PDF中文字体：留空时自动查找（常见系统路径与fontconfig）；TTC字体集需指定子字体序号
+    "pdf_font_path": "",
+    "pdf_font_subfont_index": 0,
+    # PDF中的现场照片：长边缩放到 max_px 并以 quality 重新压缩为JPEG，压缩结果按原图内容哈希缓存
+    "pdf_image_max_px": 1024,
+    "pdf_image_quality": 70,
+    "pdf_image_cache_dir": str(BASE_DIR / "data" / "pdf_image_cache"),
+    # 单个PDF的大小上限（KB），超出时逐级降低照片分辨率与质量，仍超出则不嵌入照片
+    "pdf_max_size_kb": 4096,
+    # 合订本的大小上限（KB）：按报告份数放大单份上限，但不超过此值
+    "pdf_compendium_max_size_kb": 102400,
+    # 巡检批量评估时同时进行的图片分析请求数
+    "inspection_max_concurrency": 8,
+    # 报告生成模式：hybrid 由规则引擎填写可确定的章节，其余章节调用大模型；llm 全部调用大模型
+    "report_mode": "hybrid",
+    # 单项隐患措施片段缓存（按规范隐患类型+严重程度复用）
+    "report_snippet_cache": str(BASE_DIR / "data" / "report_snippets.json"),
+    "report_snippet_max_entries": 2000,
+    # 各章节提示词中法规片段的token预算，0表示不附带法规片段
+    "report_context_budgets": {
+        "隐患概述": 0,
+        "风险等级评估": 300,
+        "隐患详细描述": 600,
+        "整改建议": 800,
+        "预防措施": 600,
+        "相关法规依据": 1200,
+    },
+    "report_context_default_budget": 600,
+    # 提示词中单条隐患描述的最大字数
+    "report_hazard_description_chars": 120,
 }
 
 # 模型配置
@@ -27,6 +88,11 @@ MODELS = {
         "api_base": "https://dashscope.aliyuncs.com/compatible-mode/v1",
         "api_key_env": "DASHSCOPE_API_KEY",
     },
+    "qwen_turbo": {
+        "model": "qwen-turbo",  # 短章节与措施片段使用的快速模型
+        "api_base": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+        "api_key_env": "DASHSCOPE_API_KEY",
+    },
     "qwen_vision": {
         "model": "qwen-vl-plus",  # 改为专门的视觉模型
         "api_base": "https://dashscope.aliyuncs.com/compatible-mode/v1",
@@ -53,3 +119,228 @@ REPORT_TEMPLATE = {
         "相关法规依据",
     ],
 }
+
+# 报告章节生成策略：tier 为 MODELS 中的模型键（缺省时使用报告生成器的模型），
+# max_tokens = min(max_tokens, base_tokens + tokens_per_hazard × 隐患数)；
+# "措施片段" 用于单项隐患的整改/预防措施片段，按每个片段计
+REPORT_GENERATION_POLICY = {
+    "default": {"tier": None, "base_tokens": 800, "tokens_per_hazard": 200, "max_tokens": 3000, "temperature": 0.3},
+    "隐患概述": {"tier": "qwen_turbo", "base_tokens": 300, "tokens_per_hazard": 40, "max_tokens": 600},
+    "风险等级评估": {"tier": "qwen_turbo", "base_tokens": 400, "tokens_per_hazard": 80, "max_tokens": 1200, "temperature": 0.2},
+    "隐患详细描述": {"base_tokens": 600, "tokens_per_hazard": 300},
+    "整改建议": {"base_tokens": 500, "tokens_per_hazard": 250},
+    "预防措施": {"base_tokens": 400, "tokens_per_hazard": 150, "max_tokens": 2000},
+    "相关法规依据": {"tier": "qwen_turbo", "base_tokens": 400, "tokens_per_hazard": 100, "max_tokens": 1500, "temperature": 0.1},
+    "措施片段": {"tier": "qwen_turbo", "base_tokens": 200, "tokens_per_hazard": 0, "max_tokens": 200},
+}
+
+# 知识库专业分片：general分片沿用历史"safe"集合，已入库的数据无需迁移
+KB_SHARDS = {
+    "scaffolding": {
+        "label": "脚手架",
+        "collection": "safe_scaffolding",
+        "keywords": ["脚手架", "扣件", "立杆", "横杆", "剪刀撑", "连墙件", "模板支架"],
+    },
+    "electrical": {
+        "label": "施工用电",
+        "collection": "safe_electrical",
+        "keywords": ["临时用电", "配电箱", "开关箱", "漏电", "电缆", "接地", "用电"],
+    },
+    "lifting": {
+        "label": "起重吊装",
+        "collection": "safe_lifting",
+        "keywords": ["起重", "吊装", "塔吊", "塔式起重机", "施工升降机", "吊索", "吊钩"],
+    },
+    "excavation": {
+        "label": "基坑土方",
+        "collection": "safe_excavation",
+        "keywords": ["基坑", "土方", "开挖", "边坡", "支护", "降水"],
+    },
+    "fire": {
+        "label": "消防",
+        "collection": "safe_fire",
+        "keywords": ["消防", "动火", "灭火器", "易燃", "焊接", "火灾"],
+    },
+    "general": {
+        "label": "综合",
+        "collection": "safe",
+        "keywords": [],
+    },
+}
+
+# 施工隐患分类体系：规范类别 -> 所属专业分片、同义词、预计算法规映射使用的检索语句
+# 同义词会被编译为多模式匹配器，用于问题路由、视觉模型隐患类型归一化与缓存键生成
+HAZARD_TAXONOMY = {
+    "未佩戴安全帽": {
+        "discipline": "general",
+        "synonyms": ["安全帽", "头盔", "未戴帽", "安全头盔"],
+        "query": "施工现场作业人员必须正确佩戴安全帽",
+    },
+    "未系安全带": {
+        "discipline": "general",
+        "synonyms": ["安全带", "安全绳", "未系挂", "高挂低用", "生命线"],
+        "query": "高处作业人员必须系挂安全带 高挂低用",
+    },
+    "高处作业无防护": {
+        "discipline": "general",
+        "synonyms": ["高处作业", "高空作业", "临边", "洞口", "防护栏杆", "安全网", "攀爬", "坠落"],
+        "query": "高处作业临边洞口防护 防护栏杆 安全网设置要求",
+    },
+    "个人防护用品缺失": {
+        "discipline": "general",
+        "synonyms": ["防护眼镜", "防护手套", "反光背心", "反光衣", "劳保鞋", "绝缘鞋", "防尘口罩"],
+        "query": "施工作业人员个人劳动防护用品配备与使用要求",
+    },
+    "临时用电不规范": {
+        "discipline": "electrical",
+        "synonyms": ["临时用电", "配电箱", "开关箱", "电缆", "电线", "漏电", "私拉乱接", "一闸多机", "接地", "带电"],
+        "query": "施工现场临时用电 三级配电两级保护 漏电保护器",
+    },
+    "脚手架搭设不规范": {
+        "discipline": "scaffolding",
+        "synonyms": ["脚手架", "扣件", "立杆", "扫地杆", "剪刀撑", "连墙件", "脚手板", "架体"],
+        "query": "脚手架搭设 立杆 扫地杆 剪刀撑 连墙件要求",
+    },
+    "模板支撑不规范": {
+        "discipline": "scaffolding",
+        "synonyms": ["模板支撑", "支模架", "高支模", "模板支架", "满堂架"],
+        "query": "模板支撑体系搭设 高大模板专项施工方案",
+    },
+    "起重吊装违规": {
+        "discipline": "lifting",
+        "synonyms": ["起重", "吊装", "塔吊", "塔式起重机", "汽车吊", "吊车", "吊物", "吊索", "吊钩"],
+        "query": "起重吊装作业 安全操作规程 吊物下方严禁站人",
+    },
+    "施工升降设备隐患": {
+        "discipline": "lifting",
+        "synonyms": ["施工升降机", "人货电梯", "物料提升机", "井架", "吊篮"],
+        "query": "施工升降机 物料提升机 吊篮安装验收与使用要求",
+    },
+    "基坑支护不到位": {
+        "discipline": "excavation",
+        "synonyms": ["基坑", "边坡", "支护", "土方开挖", "坑边堆载", "坍塌", "降水"],
+        "query": "基坑支护 边坡防护 土方开挖安全要求",
+    },
+    "消防隐患": {
+        "discipline": "fire",
+        "synonyms": ["消防", "灭火器", "易燃", "可燃", "火灾", "消防通道", "吸烟"],
+        "query": "施工现场消防安全 灭火器配置 消防通道",
+    },
+    "动火作业违规": {
+        "discipline": "fire",
+        "synonyms": ["动火", "焊接", "电焊", "气割", "氧气瓶", "乙炔", "火花"],
+        "query": "动火作业审批 焊接切割作业 气瓶安全距离",
+    },
+    "物料堆放混乱": {
+        "discipline": "general",
+        "synonyms": ["堆放", "材料堆", "物料", "通道堵塞", "乱堆", "杂物"],
+        "query": "施工现场材料堆放 文明施工 安全通道畅通",
+    },
+    "机械设备防护缺失": {
+        "discipline": "general",
+        "synonyms": ["防护罩", "切割机", "电锯", "圆盘锯", "钢筋机械", "搅拌机", "机械设备"],
+        "query": "施工机具安全防护装置 机械设备操作规程",
+    },
+}
+
+# 常见隐患的整改要求与法规依据（规则引擎直接填写报告章节，无需调用大模型）
+HAZARD_REMEDIATION = {
+    "未佩戴安全帽": {
+        "remediation": "立即责令相关人员停止作业并正确佩戴合格安全帽、系紧下颏带；对班组进行安全教育，现场设专人检查安全帽佩戴情况。",
+        "regulations": [
+            "《建筑施工安全检查标准》JGJ 59 —— 安全帽、安全带、安全网及临边洞口防护检查要求",
+            "《头部防护 安全帽》GB 2811",
+        ],
+    },
+    "未系安全带": {
+        "remediation": "立即停止高处作业，作业人员必须系挂合格安全带并高挂低用；无可靠挂点处应设置安全绳或生命线后方可恢复作业。",
+        "regulations": [
+            "《建筑施工高处作业安全技术规范》JGJ 80",
+            "《坠落防护 安全带》GB 6095",
+        ],
+    },
+    "高处作业无防护": {
+        "remediation": "临边、洞口立即设置防护栏杆、盖板或安全网等防护设施，防护设施验收合格前禁止人员进入作业区域。",
+        "regulations": [
+            "《建筑施工高处作业安全技术规范》JGJ 80 —— 临边与洞口作业防护要求",
+            "《建筑施工安全检查标准》JGJ 59",
+        ],
+    },
+    "个人防护用品缺失": {
+        "remediation": "为作业人员配齐符合标准的劳动防护用品并监督正确使用，未按规定佩戴防护用品的人员不得上岗作业。",
+        "regulations": [
+            "《中华人民共和国安全生产法》第四十五条 —— 生产经营单位必须为从业人员提供符合标准的劳动防护用品",
+            "《个体防护装备配备规范》GB 39800",
+        ],
+    },
+    "临时用电不规范": {
+        "remediation": "立即断电整改，拆除私拉乱接线路；按三级配电、两级漏电保护配置配电箱和开关箱，落实一机一闸一漏一箱，并由专业电工检查验收。",
+        "regulations": [
+            "《施工现场临时用电安全技术规范》JGJ 46",
+            "《建设工程施工现场供用电安全规范》GB 50194",
+        ],
+    },
+    "脚手架搭设不规范": {
+        "remediation": "停止使用存在缺陷的架体，按专项方案补设扫地杆、剪刀撑、连墙件并紧固扣件，经验收合格挂牌后方可继续使用。",
+        "regulations": [
+            "《建筑施工扣件式钢管脚手架安全技术规范》JGJ 130",
+            "《建筑施工脚手架安全技术统一标准》GB 51210",
+        ],
+    },
+    "模板支撑不规范": {
+        "remediation": "停止模板支撑体系上的作业，按专项施工方案复核立杆间距、水平杆步距及剪刀撑设置，超过一定规模的须组织专家论证并验收。",
+        "regulations": [
+            "《建筑施工模板安全技术规范》JGJ 162",
+            "《危险性较大的分部分项工程安全管理规定》（住房和城乡建设部令第37号）",
+        ],
+    },
+    "起重吊装违规": {
+        "remediation": "立即停止吊装作业，清理吊物下方及回转半径内人员，检查吊索具与限位保险装置，由持证司索信号工指挥后方可恢复作业。",
+        "regulations": [
+            "《建筑施工起重吊装工程安全技术规范》JGJ 276",
+            "《起重机械安全规程 第1部分：总则》GB/T 6067.1",
+        ],
+    },
+    "施工升降设备隐患": {
+        "remediation": "停用存在隐患的升降设备，检查防坠安全器、限位及门联锁装置，经有资质单位检测验收合格后方可使用。",
+        "regulations": [
+            "《建筑施工升降机安装、使用、拆卸安全技术规程》JGJ 215",
+            "《龙门架及井架物料提升机安全技术规范》JGJ 88",
+        ],
+    },
+    "基坑支护不到位": {
+        "remediation": "立即撤离坑内及坑边人员，清除坑边超载堆土，按设计补强支护并加强基坑监测，监测数据稳定前不得恢复开挖。",
+        "regulations": [
+            "《建筑基坑支护技术规程》JGJ 120",
+            "《建筑深基坑工程施工安全技术规范》JGJ 311",
+        ],
+    },
+    "消防隐患": {
+        "remediation": "清理易燃可燃物，按规定配置并定期检查灭火器材，保持消防通道畅通，严禁在施工现场吸烟。",
+        "regulations": [
+            "《建设工程施工现场消防安全技术规范》GB 50720",
+            "《中华人民共和国消防法》",
+        ],
+    },
+    "动火作业违规": {
+        "remediation": "立即停止动火作业，补办动火审批手续，清理周边可燃物并配置灭火器材和看火人，气瓶间距及与明火距离须符合要求。",
+        "regulations": [
+            "《建设工程施工现场消防安全技术规范》GB 50720 —— 动火作业管理",
+            "《焊接与切割安全》GB 9448",
+        ],
+    },
+    "物料堆放混乱": {
+        "remediation": "按施工总平面布置分类整齐堆放材料，控制堆放高度，清理占用安全通道的物料和杂物。",
+        "regulations": [
+            "《建筑施工安全检查标准》JGJ 59 —— 文明施工检查要求",
+            "《建设工程施工现场环境与卫生标准》JGJ 146",
+        ],
+    },
+    "机械设备防护缺失": {
+        "remediation": "停用缺少防护装置的机械设备，补齐防护罩、急停等安全装置并检查接零保护，操作人员须持证上岗。",
+        "regulations": [
+            "《建筑机械使用安全技术规程》JGJ 33",
+            "《施工现场机械设备检查技术规范》JGJ 160",
+        ],
+    },
+}
@@ -0,0 +1,175 @@
+"""
+内存图片管道
+上传的图片以 memoryview 的形式在内存中完成校验、哈希、预处理与编码，原始字节只保存一份：
+- 校验按文件头识别格式，不依赖磁盘文件与扩展名
+- 预处理只在图片超过 vision_max_px 时解码缩放，否则直接使用原始字节
+- base64 分块编码进预分配的缓冲区，生成模型所需的 data URL 时只分配缓冲区与最终字符串，
+  不再经过读回的文件副本、base64字节与字符串拼接
+落盘由调用方决定，可在分析的同时异步进行（见 UploadStore.put_async）
+"""
+
+import binascii
+import hashlib
+import io
+from functools import cached_property
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from .config import DEFAULT_CONFIG
+from .logging import getLogger
+
+logger = getLogger(__name__)
+
+# 文件头 -> (格式, MIME类型)
+IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", ("jpeg", "image/jpeg")),
+    (b"\x89PNG\r\n\x1a\n", ("png", "image/png")),
+]
+
+# base64 分块编码的输入块大小，须为3的倍数
+_B64_CHUNK = 3 * 16 * 1024
+
+
+def sniff_format(view):
+    """按文件头识别图片格式，返回 (格式, MIME类型)，无法识别时返回 (None, None)"""
+    for signature, image_format in IMAGE_SIGNATURES:
+        if view[:len(signature)] == signature:
+            return image_format
+    return None, None
+
+
+def encode_data_url(view, mime):
+    """
+    将图片字节编码为 data URL 字符串
+
+    base64 按块写入预分配的 bytearray，最后一次性解码为字符串，
+    峰值内存约为原图大小加上两份base64结果（bytearray 与最终字符串）
+    """
+    prefix = f"data:{mime};base64,".encode("ascii")
+    encoded_len = (len(view) + 2) // 3 * 4
+    out = bytearray(len(prefix) + encoded_len)
+    out[:len(prefix)] = prefix
+    pos = len(prefix)
+    for start in range(0, len(view), _B64_CHUNK):
+        chunk = binascii.b2a_base64(view[start:start + _B64_CHUNK], newline=False)
+        out[pos:pos + len(chunk)] = chunk
+        pos += len(chunk)
+    return out.decode("ascii")
+
+
+class _ViewReader(io.RawIOBase):
+    """只读的 memoryview 文件对象，供PIL读取图片而不复制整个缓冲区"""
+
+    def __init__(self, view):
+        self._view = view
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = max(0, min(len(buffer), len(self._view) - self._pos))
+        buffer[:n] = self._view[self._pos:self._pos + n]
+        self._pos += n
+        return n
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += len(self._view)
+        self._pos = max(0, offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+
+class ImagePayload:
+    """
+    内存中的一张图片
+
+    data 可以是 bytes、bytearray 或 memoryview（如 Streamlit UploadedFile.getbuffer()），
+    内部只持有其 memoryview，不复制
+    """
+
+    def __init__(self, data, name=""):
+        self.view = memoryview(data).cast("B")
+        self.name = name
+        self.format, self.mime = sniff_format(self.view)
+
+    @classmethod
+    def from_path(cls, file_path):
+        """从文件读取：按文件大小预分配缓冲区后一次读入"""
+        path = Path(file_path)
+        buffer = bytearray(path.stat().st_size)
+        with open(path, "rb", buffering=0) as f:
+            f.readinto(buffer)
+        return cls(buffer, path.name)
+
+    @property
+    def size(self):
+        return len(self.view)
+
+    @cached_property
+    def digest(self):
+        """原图内容的SHA-256，用作分析缓存键与上传存储的地址"""
+        return hashlib.sha256(self.view).hexdigest()
+
+    def validate(self):
+        """验证图片大小与格式，返回 (是否通过, 说明)，与 FileUtils.validate_image 一致"""
+        max_size = DEFAULT_CONFIG["max_image_size"]
+        if self.size > max_size:
+            logger.warning(f"图片文件过大: {self.size} bytes > {max_size} bytes")
+            return False, f"文件大小超过限制 ({self.size / (1024*1024):.1f}MB > {max_size / (1024*1024):.1f}MB)"
+
+        allowed_formats = DEFAULT_CONFIG["allowed_image_formats"]
+        if self.format not in allowed_formats:
+            suffix = Path(self.name).suffix.lower().lstrip(".") or "未知"
+            logger.warning(f"不支持的图片格式: {suffix}, 支持格式: {allowed_formats}")
+            return False, f"不支持的文件格式 ({suffix}), 请使用: {', '.join(allowed_formats)}"
+
+        logger.debug(f"图片验证通过: {self.name}")
+        return True, "验证通过"
+
+    @cached_property
+    def prepared(self):
+        """
+        送入视觉模型的图片：(memoryview, MIME类型)
+
+        长边不超过 vision_max_px 时直接返回原始字节；超过时按EXIF方向摆正、缩放并重新压缩为JPEG
+        """
+        max_px = DEFAULT_CONFIG["vision_max_px"]
+        if not max_px or not PIL_AVAILABLE:
+            return self.view, self.mime
+
+        with Image.open(_ViewReader(self.view)) as original:
+            source_size = original.size
+            if max(source_size) <= max_px:
+                return self.view, self.mime
+            # JPEG 在解码时直接按DCT缩放，避免解码完整分辨率
+            original.draft("RGB", (max_px, max_px))
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((max_px, max_px))
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, "JPEG", quality=DEFAULT_CONFIG["vision_jpeg_quality"])
+
+        logger.info(f"图片已缩放: {self.name} {source_size} -> {image.size}，{self.size // 1024} KB -> "
+                    f"{buffer.getbuffer().nbytes // 1024} KB")
+        return buffer.getbuffer(), "image/jpeg"
+
+    def data_url(self):
+        """视觉模型输入的 data URL"""
+        view, mime = self.prepared
+        return encode_data_url(view, mime)
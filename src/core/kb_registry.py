@@ -0,0 +1,129 @@
+"""
+知识库版本注册表
+记录安全规范集各版本的构建参数与状态，以及当前生效版本和可回滚的上一版本
+版本0对应历史集合名（无后缀），其余版本的物理集合名为 "<分片集合>__v<版本号>"
+"""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from .config import KB_SHARDS
+from .logging import getLogger
+
+logger = getLogger(__name__)
+
+REGISTRY_FILE = "kb_registry.json"
+
+
+def physical_collection_name(base_name, version):
+    """分片集合在指定版本下的物理集合名"""
+    return base_name if not version else f"{base_name}__v{version}"
+
+
+class KBRegistry:
+    """知识库版本注册表，写入采用临时文件+原子替换"""
+
+    def __init__(self, persist_dir):
+        self.path = Path(persist_dir) / REGISTRY_FILE
+        self._lock = threading.Lock()
+        self._data = self._load()
+
+    def _load(self):
+        if self.path.exists():
+            try:
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                data["versions"] = {int(k): v for k, v in data.get("versions", {}).items()}
+                return data
+            except Exception as e:
+                logger.warning(f"知识库版本注册表读取失败，使用默认版本: {e}")
+        return {"active": 0, "previous": None, "versions": {0: {"status": "active"}}}
+
+    def _save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, ensure_ascii=False, indent=2)
+        tmp_path.replace(self.path)
+
+    @property
+    def active(self):
+        return self._data["active"]
+
+    @property
+    def previous(self):
+        return self._data["previous"]
+
+    def version_info(self, version):
+        return dict(self._data["versions"].get(version, {}))
+
+    def versions(self):
+        return {v: dict(info) for v, info in self._data["versions"].items()}
+
+    def physical_names(self, version):
+        """某版本下全部分片的物理集合名"""
+        return [
+            physical_collection_name(entry["collection"], version)
+            for entry in KB_SHARDS.values()
+        ]
+
+    def create_version(self, build_config):
+        """登记一个构建中的影子版本，返回版本号"""
+        with self._lock:
+            version = max(self._data["versions"]) + 1
+            self._data["versions"][version] = {
+                "status": "building",
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                **build_config,
+            }
+            self._save()
+            return version
+
+    def set_status(self, version, status, **extra):
+        with self._lock:
+            self._data["versions"].setdefault(version, {}).update(status=status, **extra)
+            self._save()
+
+    def activate(self, version):
+        """
+        切换生效版本，原生效版本保留为可回滚版本
+
+        Returns:
+            不再保留、可以删除的旧版本号（无则为None）
+        """
+        with self._lock:
+            retired = self._data["previous"]
+            old_active = self._data["active"]
+            self._data["previous"] = old_active if old_active != version else retired
+            self._data["active"] = version
+            self._data["versions"][version]["status"] = "active"
+            self._data["versions"][version]["activated_at"] = datetime.now().isoformat(timespec="seconds")
+            if old_active in self._data["versions"] and old_active != version:
+                self._data["versions"][old_active]["status"] = "standby"
+            if retired is not None and retired not in (version, self._data["previous"]):
+                self._data["versions"].pop(retired, None)
+            else:
+                retired = None
+            self._save()
+            return retired
+
+    def rollback(self):
+        """回滚到上一版本，返回新的生效版本号；无可回滚版本时返回None"""
+        with self._lock:
+            previous = self._data["previous"]
+            if previous is None:
+                return None
+            current = self._data["active"]
+            self._data["active"], self._data["previous"] = previous, current
+            self._data["versions"][previous]["status"] = "active"
+            self._data["versions"][current]["status"] = "standby"
+            self._save()
+            return previous
+
+    def discard(self, version):
+        """移除构建失败的版本记录"""
+        with self._lock:
+            if version not in (self._data["active"], self._data["previous"]):
+                self._data["versions"].pop(version, None)
+                self._save()
@@ -0,0 +1,85 @@
+"""
+知识库统计模块
+按物理集合维护片段总数、各来源文件的片段数与最近入库时间，
+由入库与清空操作增量更新，读取统计无需扫描集合
+"""
+
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from .logging import getLogger
+
+logger = getLogger(__name__)
+
+STATS_FILE = "kb_stats.json"
+
+
+class CollectionStats:
+    """集合统计计数器，持久化到持久化目录下的 kb_stats.json"""
+
+    def __init__(self, persist_dir):
+        self.path = Path(persist_dir) / STATS_FILE
+        self._lock = threading.Lock()
+        self._collections = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("collections", {})
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.warning(f"知识库统计读取失败，将重新统计: {e}")
+            return {}
+
+    def _save(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"collections": self._collections}, f, ensure_ascii=False)
+        tmp_path.replace(self.path)
+
+    def has(self, collection_name):
+        return collection_name in self._collections
+
+    def record_ingest(self, collection_name, sources, timestamp=None):
+        """
+        记录一次写入
+
+        Args:
+            sources: 本次写入片段的来源列表（每个片段一项）
+        """
+        with self._lock:
+            entry = self._collections.setdefault(
+                collection_name, {"total": 0, "sources": {}, "last_ingest_at": None}
+            )
+            for source in sources:
+                entry["sources"][source] = entry["sources"].get(source, 0) + 1
+            entry["total"] += len(sources)
+            if sources:
+                entry["last_ingest_at"] = timestamp or datetime.now().isoformat(timespec="seconds")
+            self._save()
+
+    def reset(self, collection_name):
+        """集合被清空或删除后移除统计"""
+        with self._lock:
+            if self._collections.pop(collection_name, None) is not None:
+                self._save()
+
+    def summary(self, collection_names):
+        """汇总多个物理集合的统计"""
+        shards, sources, last_ingest = {}, {}, None
+        for name in collection_names:
+            entry = self._collections.get(name) or {"total": 0, "sources": {}, "last_ingest_at": None}
+            shards[name] = entry["total"]
+            for source, count in entry["sources"].items():
+                sources[source] = sources.get(source, 0) + count
+            if entry["last_ingest_at"] and (last_ingest is None or entry["last_ingest_at"] > last_ingest):
+                last_ingest = entry["last_ingest_at"]
+        return {
+            "document_count": sum(shards.values()),
+            "shards": shards,
+            "sources": sources,
+            "last_ingest_at": last_ingest,
+        }
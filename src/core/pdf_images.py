@@ -0,0 +1,121 @@
+"""
+PDF现场照片
+原图缩放并重新压缩为JPEG后嵌入PDF；压缩结果按原图内容哈希与压缩参数缓存到磁盘，
+重复导出（包括渲染进程池中的各个工作进程）直接读取缓存，不再重新编码
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+from pathlib import Path
+
+try:
+    from PIL import Image, ImageOps
+
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.logging import getLogger
+
+logger = getLogger(__name__)
+
+
+def image_levels():
+    """
+    照片压缩档位，从高到低依次尝试
+
+    PDF超过大小上限时改用下一档重新渲染，最后一档为 None 表示不嵌入照片
+    """
+    max_px = DEFAULT_CONFIG["pdf_image_max_px"]
+    quality = DEFAULT_CONFIG["pdf_image_quality"]
+    return [
+        (max_px, quality),
+        (max_px * 2 // 3, max(quality - 15, 30)),
+        (max_px // 2, max(quality - 30, 30)),
+        None,
+    ]
+
+
+def compress_image(data, max_px, quality):
+    """
+    缩放并重新压缩为JPEG
+
+    Returns:
+        (JPEG字节, (宽, 高))
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        # 按EXIF方向摆正，手机竖拍的照片不会横躺在报告里
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_px, max_px))
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        image.save(buffer, "JPEG", quality=quality, optimize=True)
+        return buffer.getvalue(), image.size
+
+
+class CompressedImageCache:
+    """压缩后照片的磁盘缓存，键为原图SHA-256与压缩参数"""
+
+    # 原图 (路径, 修改时间, 大小) -> 内容哈希，进程内复用，缓存命中时无需重新读取原图
+    _digests = {}
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir or DEFAULT_CONFIG["pdf_image_cache_dir"])
+
+    def _cache_path(self, digest, max_px, quality):
+        return self.cache_dir / digest[:2] / f"{digest}_{max_px}_{quality}.jpg"
+
+    def get(self, image_path, max_px, quality):
+        """
+        读取照片的压缩版本，未缓存时压缩并写入缓存
+
+        Returns:
+            (JPEG字节, (宽, 高))；原图不存在或无法解码时返回None
+        """
+        if not PIL_AVAILABLE:
+            return None
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            logger.warning(f"报告照片不存在，已跳过: {image_path}")
+            return None
+
+        data = None
+        stat_key = (str(image_path), stat.st_mtime_ns, stat.st_size)
+        digest = self._digests.get(stat_key)
+        if digest is None:
+            data = Path(image_path).read_bytes()
+            digest = self._digests[stat_key] = hashlib.sha256(data).hexdigest()
+
+        cache_path = self._cache_path(digest, max_px, quality)
+        # 缓存文件可能随时被存储清理线程按配额删除，读取失败时重新压缩
+        try:
+            compressed = cache_path.read_bytes()
+        except OSError:
+            compressed = None
+        if compressed is not None:
+            with Image.open(io.BytesIO(compressed)) as image:
+                return compressed, image.size
+
+        if data is None:
+            data = Path(image_path).read_bytes()
+        try:
+            compressed, size = compress_image(data, max_px, quality)
+        except Exception as e:
+            logger.warning(f"报告照片无法解码，已跳过: {image_path}（{e}）")
+            return None
+
+        # 先写临时文件再替换，多个工作进程同时压缩同一张照片时不会读到不完整的文件
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, cache_path)
+        logger.info(
+            f"照片已压缩: {Path(image_path).name} {len(data) // 1024} KB -> {len(compressed) // 1024} KB"
+        )
+        return compressed, size
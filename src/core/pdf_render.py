@@ -0,0 +1,475 @@
+"""
+PDF渲染
+报告数据渲染为PDF字节，可在当前进程调用，也可提交到工作进程池执行；
+工作进程以spawn方式启动，只导入本模块及其依赖（不经过 src.tools 包的初始化）
+"""
+
+import io
+import multiprocessing
+import subprocess
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+
+try:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak, KeepTogether
+    from reportlab.platypus import Image as PDFImage
+    from reportlab.platypus.tableofcontents import TableOfContents
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    from reportlab.lib.fonts import addMapping
+    from reportlab.lib.enums import TA_LEFT, TA_CENTER
+
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.logging import getLogger
+from src.core.pdf_images import CompressedImageCache, image_levels
+
+logger = getLogger(__name__)
+
+if not REPORTLAB_AVAILABLE:
+    logger.warning("ReportLab未安装，PDF导出功能将不可用")
+
+
+# 常见中文字体文件 -> TTC集合中简体中文字形所在的子字体序号
+# （OpenType/CFF 轮廓的 .otf 字体 ReportLab 无法嵌入，不在候选之列）
+FONT_CANDIDATES = [
+    # Windows系统字体路径
+    ("C:/Windows/Fonts/simsun.ttc", 0),  # 宋体
+    ("C:/Windows/Fonts/msyh.ttc", 0),  # 微软雅黑
+    ("C:/Windows/Fonts/simhei.ttf", 0),  # 黑体
+    # Linux 常见发行版字体包
+    ("/usr/share/fonts/truetype/wqy/wqy-zenhei.ttc", 0),  # fonts-wqy-zenhei
+    ("/usr/share/fonts/truetype/wqy/wqy-microhei.ttc", 0),  # fonts-wqy-microhei
+    ("/usr/share/fonts/wqy-zenhei/wqy-zenhei.ttc", 0),
+    ("/usr/share/fonts/wqy-microhei/wqy-microhei.ttc", 0),
+    ("/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc", 2),  # fonts-noto-cjk，序号2为SC
+    ("/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc", 2),
+    ("/usr/share/fonts/truetype/arphic/uming.ttc", 0),  # fonts-arphic-uming
+    ("/usr/share/fonts/cjkuni-uming/uming.ttc", 0),
+    ("/usr/share/fonts/truetype/droid/DroidSansFallbackFull.ttf", 0),
+    # macOS
+    ("/System/Library/Fonts/STHeiti Light.ttc", 0),
+    ("/Library/Fonts/Arial Unicode.ttf", 0),
+]
+
+FONT_NAME = "ChineseFont"
+# 找不到可嵌入的TrueType字体时使用ReportLab内置的CID字体（不嵌入，由阅读器提供字形）
+CID_FALLBACK_FONT = "STSong-Light"
+
+_font_lock = threading.Lock()
+_font_name = None
+_styles = None
+
+
+def _fontconfig_candidates():
+    """通过 fc-match 查询系统中支持中文的字体，返回 [(路径, 子字体序号)]"""
+    try:
+        output = subprocess.run(
+            ["fc-match", "-s", "-f", "%{file}|%{index}\\n", ":lang=zh-cn"],
+            capture_output=True, text=True, timeout=5, check=True,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return []
+
+    candidates = []
+    for line in output.splitlines()[:20]:
+        path, _, index = line.partition("|")
+        if path.lower().endswith((".ttf", ".ttc")):
+            candidates.append((path, int(index or 0)))
+    return candidates
+
+
+def _font_candidates():
+    configured = DEFAULT_CONFIG.get("pdf_font_path")
+    if configured:
+        yield configured, DEFAULT_CONFIG.get("pdf_font_subfont_index", 0)
+    yield from FONT_CANDIDATES
+    yield from _fontconfig_candidates()
+
+
+def _try_register(font_path, subfont_index):
+    """注册字体并确认包含中文字形；ReportLab嵌入TrueType字体时只写入用到的字形子集"""
+    font = TTFont(FONT_NAME, font_path, subfontIndex=subfont_index)
+    if ord("中") not in font.face.charToGlyph:
+        logger.warning(f"字体不含中文字形，跳过: {font_path}")
+        return False
+    pdfmetrics.registerFont(font)
+    # 映射字体
+    addMapping(FONT_NAME, 0, 0, FONT_NAME)  # normal
+    addMapping(FONT_NAME, 0, 1, FONT_NAME)  # italic
+    addMapping(FONT_NAME, 1, 0, FONT_NAME)  # bold
+    addMapping(FONT_NAME, 1, 1, FONT_NAME)  # bold italic
+    return True
+
+
+def register_chinese_font():
+    """
+    注册中文字体，返回可用的字体名；每个进程只查找、注册一次
+
+    查找顺序：配置的 pdf_font_path -> 各系统常见字体路径 -> fontconfig（fc-match）
+    -> ReportLab内置CID字体 -> Helvetica
+    """
+    global _font_name
+    with _font_lock:
+        if _font_name is not None:
+            return _font_name
+
+        seen = set()
+        for font_path, subfont_index in _font_candidates():
+            if (font_path, subfont_index) in seen or not Path(font_path).exists():
+                continue
+            seen.add((font_path, subfont_index))
+            try:
+                if _try_register(font_path, subfont_index):
+                    logger.info(f"成功注册中文字体: {font_path}（子字体 {subfont_index}）")
+                    _font_name = FONT_NAME
+                    return _font_name
+            except Exception as e:
+                logger.warning(f"注册字体失败 {font_path}: {e}")
+
+        try:
+            pdfmetrics.registerFont(UnicodeCIDFont(CID_FALLBACK_FONT))
+            logger.warning(f"未找到可嵌入的中文字体，使用内置CID字体 {CID_FALLBACK_FONT}")
+            _font_name = CID_FALLBACK_FONT
+        except Exception as e:
+            logger.warning(f"未找到可用的中文字体，PDF可能无法正确显示中文: {e}")
+            _font_name = "Helvetica"
+        return _font_name
+
+
+def get_styles():
+    """进程内共享的中文样式表，首次使用时构建"""
+    global _styles
+    chinese_font = register_chinese_font()
+    with _font_lock:
+        if _styles is None:
+            _styles = build_styles(chinese_font)
+        return _styles
+
+
+def build_styles(chinese_font):
+    """获取支持中文的样式"""
+    styles = getSampleStyleSheet()
+
+    # 创建支持中文的样式
+    styles.add(
+        ParagraphStyle(
+            name="ChineseTitle",
+            fontName=chinese_font,
+            fontSize=24,
+            leading=28,
+            alignment=TA_CENTER,
+            spaceAfter=30,
+        )
+    )
+
+    styles.add(
+        ParagraphStyle(
+            name="ChineseHeading",
+            fontName=chinese_font,
+            fontSize=16,
+            leading=20,
+            alignment=TA_LEFT,
+            spaceBefore=20,
+            spaceAfter=10,
+        )
+    )
+
+    styles.add(
+        ParagraphStyle(
+            name="ChineseNormal",
+            fontName=chinese_font,
+            fontSize=12,
+            leading=16,
+            alignment=TA_LEFT,
+            spaceAfter=10,
+        )
+    )
+
+    styles.add(
+        ParagraphStyle(
+            name="ChineseCaption",
+            fontName=chinese_font,
+            fontSize=10,
+            leading=14,
+            alignment=TA_CENTER,
+            spaceBefore=4,
+            spaceAfter=14,
+        )
+    )
+
+    return styles
+
+
+def _add_title_section(story, styles, report_data):
+    """添加标题部分"""
+    title = report_data.get("title", "安全评估报告")
+    story.append(Paragraph(title, styles["ChineseTitle"]))
+    story.append(Spacer(1, 12))
+
+    meta_lines = [
+        f"报告编号: {report_data.get('report_id', '')}",
+        f"生成日期: {report_data.get('generate_date', datetime.now().strftime('%Y年%m月%d日'))}",
+    ]
+
+    if report_data.get("company"):
+        meta_lines.append(f"公司名称: {report_data.get('company')}")
+
+    for line in meta_lines:
+        story.append(Paragraph(line, styles["ChineseNormal"]))
+
+    story.append(Spacer(1, 20))
+
+
+def _add_section(story, styles, section_name, content):
+    """添加章节内容"""
+    story.append(Paragraph(section_name, styles["ChineseHeading"]))
+    story.append(Paragraph(content, styles["ChineseNormal"]))
+    story.append(Spacer(1, 10))
+
+
+# 照片在页面中的最大显示高度（pt），宽度不超过版心
+IMAGE_MAX_HEIGHT = 320
+
+
+def _add_evidence_images(story, styles, images, image_level):
+    """添加现场照片章节：每张照片为缩放压缩后的版本，下方注明照片中识别的隐患"""
+    max_px, quality = image_level
+    cache = CompressedImageCache()
+    frame_width = A4[0] - 144
+    flowables = []
+    for image in images:
+        compressed = cache.get(image["path"], max_px, quality)
+        if compressed is None:
+            continue
+        data, (width, height) = compressed
+        scale = min(frame_width / width, IMAGE_MAX_HEIGHT / height)
+        flowables.append(KeepTogether([
+            PDFImage(io.BytesIO(data), width=width * scale, height=height * scale),
+            Paragraph(image.get("caption", ""), styles["ChineseCaption"]),
+        ]))
+
+    if flowables:
+        story.append(Paragraph("现场照片", styles["ChineseHeading"]))
+        story.extend(flowables)
+
+
+def _new_document(buffer, doc_class=None):
+    return (doc_class or SimpleDocTemplate)(
+        buffer,
+        pagesize=A4,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72,
+    )
+
+
+def _add_report(story, styles, report_data, image_level=None):
+    _add_title_section(story, styles, report_data)
+
+    for section_name, content in report_data.get("sections", {}).items():
+        _add_section(story, styles, section_name, content)
+
+    if image_level and report_data.get("evidence_images"):
+        _add_evidence_images(story, styles, report_data["evidence_images"], image_level)
+
+
+def render_report_pdf(report_data, image_level=None):
+    """
+    渲染报告，返回PDF字节
+
+    Args:
+        image_level: 现场照片的 (长边像素, JPEG质量)，为None时不嵌入照片
+    """
+    buffer = io.BytesIO()
+    doc = _new_document(buffer)
+
+    story = []
+    styles = get_styles()
+    _add_report(story, styles, report_data, image_level)
+
+    doc.build(story)
+    return buffer.getvalue()
+
+
+if REPORTLAB_AVAILABLE:
+    class _CompendiumDocTemplate(SimpleDocTemplate):
+        """合订本文档：每份报告的标题登记到目录与PDF书签"""
+
+        def afterFlowable(self, flowable):
+            toc_key = getattr(flowable, "toc_key", None)
+            if toc_key is None:
+                return
+            text = flowable.toc_text
+            self.canv.bookmarkPage(toc_key)
+            self.canv.addOutlineEntry(text, toc_key, level=0)
+            self.notify("TOCEntry", (0, text, self.page, toc_key))
+
+
+def render_compendium_pdf(reports, title="安全评估报告汇编", image_level=None):
+    """将多份报告渲染为一个带目录的合订本，返回PDF字节"""
+    styles = get_styles()
+    toc = TableOfContents()
+    toc.levelStyles = [
+        ParagraphStyle(
+            name="CompendiumTOC",
+            parent=styles["ChineseNormal"],
+            leftIndent=0,
+            firstLineIndent=0,
+            spaceAfter=4,
+        )
+    ]
+
+    story = [
+        Paragraph(title, styles["ChineseTitle"]),
+        Paragraph(f"共 {len(reports)} 份报告", styles["ChineseNormal"]),
+        Spacer(1, 20),
+        Paragraph("目录", styles["ChineseHeading"]),
+        toc,
+    ]
+    for report_data in reports:
+        story.append(PageBreak())
+        start = len(story)
+        _add_report(story, styles, report_data, image_level)
+        # 报告标题段落作为目录条目
+        heading = story[start]
+        heading.toc_key = f"report-{report_data.get('report_id', start)}"
+        heading.toc_text = " ".join(
+            part for part in (
+                report_data.get("generate_date", ""),
+                report_data.get("title", "安全评估报告"),
+                report_data.get("site_id") or report_data.get("company", ""),
+            ) if part
+        )
+
+    buffer = io.BytesIO()
+    # 目录页码需要两遍排版才能确定
+    _new_document(buffer, _CompendiumDocTemplate).multiBuild(story)
+    return buffer.getvalue()
+
+
+def _render_within_limit(render, has_images, max_size_kb=None):
+    """
+    按大小上限渲染：超出时逐级降低照片分辨率与质量重新渲染，最后不嵌入照片
+
+    Args:
+        max_size_kb: 大小上限，默认为单份报告的 pdf_max_size_kb
+
+    Returns:
+        (PDF字节, 实际使用的照片档位)
+    """
+    limit = (max_size_kb or DEFAULT_CONFIG["pdf_max_size_kb"]) * 1024
+    levels = image_levels() if has_images else [None]
+    for image_level in levels:
+        data = render(image_level)
+        if len(data) <= limit:
+            break
+        logger.warning(f"PDF大小 {len(data) // 1024} KB 超出上限 {limit // 1024} KB（照片档位 {image_level}）")
+    return data, image_level
+
+
+def _run_export(render, filename, output_path=None, return_data=True, has_images=False, max_size_kb=None):
+    if not REPORTLAB_AVAILABLE:
+        return {
+            "success": False,
+            "error": "ReportLab未安装，请先安装: pip install reportlab",
+        }
+
+    try:
+        data, image_level = _render_within_limit(render, has_images, max_size_kb)
+        result = {
+            "success": True,
+            "filename": Path(output_path).name if output_path else filename,
+            "size": len(data),
+            "image_level": image_level,
+        }
+        if return_data:
+            result["data"] = data
+        if output_path:
+            Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+            Path(output_path).write_bytes(data)
+            result["output_path"] = str(output_path)
+        logger.info(f"PDF导出成功: {result['filename']}（{len(data) // 1024} KB）")
+        return result
+    except Exception as e:
+        logger.error(f"PDF导出失败: {str(e)}")
+        return {"success": False, "error": str(e), "filename": filename}
+
+
+def export_job(report_data, output_path=None, return_data=True):
+    """
+    导出任务（在工作进程中执行）
+
+    Args:
+        return_data: 为False时不回传PDF字节（批量写文件时减少进程间传输）
+
+    Returns:
+        {"success": True, "data": PDF字节, "filename": ..., "size": ...,
+         "image_level": 实际使用的照片档位（None表示未嵌入照片）, "output_path": 指定输出路径时的文件路径}
+        或 {"success": False, "error": ...}
+    """
+    return _run_export(
+        lambda image_level: render_report_pdf(report_data, image_level),
+        f"{report_data.get('report_id', 'report')}.pdf",
+        output_path,
+        return_data,
+        has_images=bool(report_data.get("evidence_images")),
+    )
+
+
+def compendium_job(reports, title="安全评估报告汇编", output_path=None, return_data=True):
+    """
+    合订本导出任务（在工作进程中执行），返回格式同 export_job
+
+    大小上限按报告份数放大（每份 pdf_max_size_kb），不超过 pdf_compendium_max_size_kb，
+    合订本不会因套用单份报告的上限而反复重新渲染并去掉全部照片
+    """
+    max_size_kb = min(
+        DEFAULT_CONFIG["pdf_max_size_kb"] * max(len(reports), 1),
+        DEFAULT_CONFIG["pdf_compendium_max_size_kb"],
+    )
+    return _run_export(
+        lambda image_level: render_compendium_pdf(reports, title, image_level),
+        f"{title}.pdf",
+        output_path,
+        return_data,
+        has_images=any(report.get("evidence_images") for report in reports),
+        max_size_kb=max_size_kb,
+    )
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool():
+    """进程内共享的PDF渲染进程池，首次使用时创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=DEFAULT_CONFIG["pdf_render_workers"],
+                mp_context=multiprocessing.get_context("spawn"),
+                # 工作进程启动时即完成字体查找与注册，首个导出任务无需等待
+                initializer=register_chinese_font,
+            )
+            logger.info(f"PDF渲染进程池已启动（{DEFAULT_CONFIG['pdf_render_workers']} 个工作进程）")
+        return _pool
+
+
+def reset_render_pool():
+    """丢弃失效的进程池，下次提交时重新创建"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
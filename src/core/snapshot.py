@@ -0,0 +1,259 @@
+"""
+知识库快照模块
+将持久化目录中的全部集合（向量、文本、元数据）导出为单个带校验和的版本化快照文件，
+并可直接批量导入到新的持久化目录，部署新实例时无需重新计算向量
+
+快照文件结构:
+  MAGIC(8字节) | 格式版本(uint16) | 头部长度(uint32) | 头部JSON | 数据段...
+头部记录每个数据段的偏移、长度与SHA-256，另有全部数据段的整体SHA-256
+"""
+
+import json
+import zlib
+import shutil
+import struct
+import hashlib
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import chromadb
+from chromadb.config import Settings
+
+from .config import DEFAULT_CONFIG
+from .kb_registry import KBRegistry, REGISTRY_FILE
+from .kb_stats import STATS_FILE
+from .logging import getLogger
+
+logger = getLogger(__name__)
+
+MAGIC = b"ZAJKBSNP"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sHI")
+_EXPORT_BATCH = 2000
+
+
+class SnapshotError(Exception):
+    """快照文件无效或与目标目录不兼容"""
+
+
+def _open_client(persist_dir):
+    return chromadb.PersistentClient(
+        path=str(persist_dir), settings=Settings(anonymized_telemetry=False)
+    )
+
+
+def _read_collection(collection):
+    """分页读取集合全部记录，避免一次性载入超大结果"""
+    ids, documents, metadatas, vectors = [], [], [], []
+    total = collection.count()
+    for offset in range(0, total, _EXPORT_BATCH):
+        batch = collection.get(
+            include=["embeddings", "documents", "metadatas"],
+            limit=_EXPORT_BATCH,
+            offset=offset,
+        )
+        ids.extend(batch["ids"])
+        documents.extend(batch["documents"])
+        metadatas.extend(batch["metadatas"])
+        vectors.append(np.asarray(batch["embeddings"], dtype="<f4"))
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype="<f4")
+    return ids, documents, metadatas, matrix
+
+
+def export_snapshot(output_path, persist_dir=None, compress_level=6):
+    """
+    导出快照
+
+    Returns:
+        快照头部信息（集合、记录数、校验和等）
+    """
+    persist_dir = Path(persist_dir or DEFAULT_CONFIG["persist_dir"])
+    client = _open_client(persist_dir)
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    payload_path = output_path.with_suffix(output_path.suffix + ".payload")
+    tmp_path = output_path.with_suffix(output_path.suffix + ".tmp")
+
+    sections = []
+    payload_digest = hashlib.sha256()
+
+    # 只导出当前生效版本，回滚用的旧版本与未完成的影子版本不进入快照
+    registry = KBRegistry(persist_dir)
+    active = registry.active
+    skipped = {
+        name
+        for version in registry.versions()
+        if version != active
+        for name in registry.physical_names(version)
+    }
+
+    # 数据段先写入临时文件，头部确定后再拼接，导出时内存只需容纳单个集合
+    with open(payload_path, "wb") as payload:
+        def add_section(kind, name, raw, **extra):
+            data = zlib.compress(raw, compress_level)
+            sections.append({
+                "kind": kind,
+                "name": name,
+                "offset": payload.tell(),
+                "length": len(data),
+                "raw_length": len(raw),
+                "sha256": hashlib.sha256(data).hexdigest(),
+                **extra,
+            })
+            payload_digest.update(data)
+            payload.write(data)
+
+        collections = []
+        for collection in client.list_collections():
+            if collection.name in skipped:
+                continue
+            ids, documents, metadatas, matrix = _read_collection(collection)
+            dim = int(matrix.shape[1]) if matrix.size else 0
+            records = json.dumps(
+                {"ids": ids, "documents": documents, "metadatas": metadatas},
+                ensure_ascii=False,
+            ).encode("utf-8")
+            add_section("records", collection.name, records)
+            add_section("vectors", collection.name, matrix.tobytes(), dim=dim)
+            collections.append({
+                "name": collection.name,
+                "count": len(ids),
+                "dim": dim,
+                "metadata": collection.metadata,
+            })
+            logger.info(f"导出集合 {collection.name}: {len(ids)} 条记录，维度 {dim}")
+
+        # 去重索引与知识库版本属于知识库状态的一部分，一并导出
+        state_files = sorted(persist_dir.glob("dedup/*.json")) + sorted(persist_dir.glob("kb_state.json"))
+        for state_file in state_files:
+            if state_file.stem in skipped:
+                continue
+            add_section("file", state_file.relative_to(persist_dir).as_posix(), state_file.read_bytes())
+
+        registry_data = {
+            "active": active,
+            "previous": None,
+            "versions": {active: registry.version_info(active)},
+        }
+        add_section("file", REGISTRY_FILE, json.dumps(registry_data, ensure_ascii=False, indent=2).encode("utf-8"))
+
+    header = {
+        "format_version": FORMAT_VERSION,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "embedding_model": registry.version_info(active).get("embedding_model") or DEFAULT_CONFIG["embedding_model"],
+        "collections": collections,
+        "sections": sections,
+        "payload_sha256": payload_digest.hexdigest(),
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    try:
+        with open(tmp_path, "wb") as f, open(payload_path, "rb") as payload:
+            f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            shutil.copyfileobj(payload, f, 1024 * 1024)
+        tmp_path.replace(output_path)
+    finally:
+        payload_path.unlink(missing_ok=True)
+
+    logger.info(
+        f"快照导出完成: {output_path} ({len(collections)} 个集合，"
+        f"{output_path.stat().st_size / (1024 * 1024):.2f}MB)"
+    )
+    return header
+
+
+def read_snapshot_header(snapshot_path):
+    """读取并校验快照头部，返回 (header, 数据段起始偏移)"""
+    with open(snapshot_path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+        if len(prefix) != _PREFIX.size:
+            raise SnapshotError("快照文件过短")
+        magic, version, header_len = _PREFIX.unpack(prefix)
+        if magic != MAGIC:
+            raise SnapshotError("不是知识库快照文件")
+        if version > FORMAT_VERSION:
+            raise SnapshotError(f"快照格式版本 {version} 高于当前支持的版本 {FORMAT_VERSION}")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    return header, _PREFIX.size + header_len
+
+
+def verify_snapshot(snapshot_path):
+    """校验快照完整性，返回头部信息"""
+    header, payload_offset = read_snapshot_header(snapshot_path)
+    digest = hashlib.sha256()
+    with open(snapshot_path, "rb") as f:
+        f.seek(payload_offset)
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    if digest.hexdigest() != header["payload_sha256"]:
+        raise SnapshotError("快照校验和不匹配，文件可能已损坏")
+    return header
+
+
+def import_snapshot(snapshot_path, persist_dir=None, overwrite=False):
+    """
+    将快照批量导入到持久化目录，直接写入已有向量，不调用嵌入模型
+
+    Args:
+        overwrite: 目标目录已存在同名非空集合时是否覆盖
+    """
+    persist_dir = Path(persist_dir or DEFAULT_CONFIG["persist_dir"])
+    header = verify_snapshot(snapshot_path)
+    _, payload_offset = read_snapshot_header(snapshot_path)
+
+    persist_dir.mkdir(parents=True, exist_ok=True)
+    client = _open_client(persist_dir)
+    existing = {c.name: c for c in client.list_collections()}
+
+    for info in header["collections"]:
+        collection = existing.get(info["name"])
+        if collection is not None and collection.count() and not overwrite:
+            raise SnapshotError(f"目标集合 {info['name']} 非空，如需覆盖请使用 overwrite")
+
+    with open(snapshot_path, "rb") as f:
+        def read_section(section):
+            f.seek(payload_offset + section["offset"])
+            data = f.read(section["length"])
+            if hashlib.sha256(data).hexdigest() != section["sha256"]:
+                raise SnapshotError(f"数据段 {section['kind']}:{section['name']} 校验失败")
+            return zlib.decompress(data)
+
+        sections = {(s["kind"], s["name"]): s for s in header["sections"]}
+        batch_size = min(client.get_max_batch_size(), 5000)
+
+        for info in header["collections"]:
+            name = info["name"]
+            if name in existing:
+                client.delete_collection(name)
+            collection = client.create_collection(name=name, metadata=info.get("metadata") or None)
+
+            records = json.loads(read_section(sections[("records", name)]).decode("utf-8"))
+            vectors = np.frombuffer(read_section(sections[("vectors", name)]), dtype="<f4")
+            if info["dim"]:
+                vectors = vectors.reshape(-1, info["dim"])
+
+            for start in range(0, len(records["ids"]), batch_size):
+                end = start + batch_size
+                collection.add(
+                    ids=records["ids"][start:end],
+                    documents=records["documents"][start:end],
+                    metadatas=records["metadatas"][start:end],
+                    embeddings=vectors[start:end],
+                )
+            logger.info(f"导入集合 {name}: {info['count']} 条记录")
+
+        for (kind, name), section in sections.items():
+            if kind != "file":
+                continue
+            target = persist_dir / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(read_section(section))
+
+        # 统计信息按导入后的集合重新生成，首次读取统计时补齐
+        (persist_dir / STATS_FILE).unlink(missing_ok=True)
+
+    logger.info(f"快照导入完成: {snapshot_path} -> {persist_dir}")
+    return header
@@ -0,0 +1,122 @@
+"""
+施工隐患分类匹配模块
+将隐患分类体系与分片关键词编译为前缀树匹配器，单次扫描即可得到
+文本涉及的规范隐患类别与专业分片
+"""
+
+import re
+
+from .config import HAZARD_TAXONOMY, KB_SHARDS
+
+
+class TrieMatcher:
+    """
+    多模式匹配器
+
+    将全部模式串组织成前缀树并编译为单个正则表达式，由正则引擎（C实现）
+    对文本做一次从左到右的扫描；同一位置优先匹配最长模式（如"塔式起重机"优先于"起重"）
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns: {模式串: 负载集合}，同一模式串可对应多个负载
+        """
+        self._payloads = {p: tuple(payloads) for p, payloads in patterns.items() if p}
+        trie = {}
+        for pattern in self._payloads:
+            node = trie
+            for ch in pattern:
+                node = node.setdefault(ch, {})
+            node[""] = True
+        self._regex = re.compile(self._to_regex(trie)) if trie else None
+
+    @classmethod
+    def _to_regex(cls, node):
+        branches = [
+            re.escape(ch) + cls._to_regex(child)
+            for ch, child in sorted(node.items())
+            if ch
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        # 当前节点本身是完整模式时，后续分支可选（贪婪匹配保证最长优先）
+        return f"(?:{body})?" if "" in node else body
+
+    def iter_matches(self, text):
+        """单次扫描文本，依次产出 (起始位置, 模式串, 负载)"""
+        if self._regex is None:
+            return
+        for match in self._regex.finditer(text):
+            pattern = match.group()
+            for payload in self._payloads[pattern]:
+                yield match.start(), pattern, payload
+
+    def count(self, text):
+        """统计各负载的命中次数，按首次出现顺序返回字典"""
+        counts = {}
+        for _, _, payload in self.iter_matches(text):
+            counts[payload] = counts.get(payload, 0) + 1
+        return counts
+
+
+class HazardTaxonomy:
+    """隐患分类匹配器：一次扫描同时得到规范隐患类别与专业分片"""
+
+    def __init__(self, taxonomy=None, shards=None):
+        self.taxonomy = taxonomy or HAZARD_TAXONOMY
+        self.shards = shards or KB_SHARDS
+
+        patterns = {}
+        for category, entry in self.taxonomy.items():
+            for term in [category] + list(entry["synonyms"]):
+                patterns.setdefault(term, set()).add(("category", category))
+        for shard, entry in self.shards.items():
+            for term in entry["keywords"]:
+                patterns.setdefault(term, set()).add(("shard", shard))
+        self.matcher = TrieMatcher(patterns)
+
+    def analyze(self, text):
+        """
+        扫描文本
+
+        Returns:
+            (categories, shards): 按命中次数降序的规范类别列表与专业分片列表，
+            分片列表不含general
+        """
+        if not text or not isinstance(text, str):
+            return [], []
+
+        category_hits, shard_hits = {}, {}
+        for (kind, name), count in self.matcher.count(text).items():
+            if kind == "category":
+                category_hits[name] = category_hits.get(name, 0) + count
+                shard = self.taxonomy[name].get("discipline", "general")
+            else:
+                shard = name
+            if shard != "general":
+                shard_hits[shard] = shard_hits.get(shard, 0) + count
+
+        categories = sorted(category_hits, key=lambda name: -category_hits[name])
+        shards = sorted(shard_hits, key=lambda name: -shard_hits[name])
+        return categories, shards
+
+    def categories(self, text):
+        """文本涉及的规范隐患类别"""
+        return self.analyze(text)[0]
+
+    def route(self, text):
+        """文本应路由到的分片，命中多的在前，general分片始终参与"""
+        return self.analyze(text)[1] + ["general"]
+
+
+_default_taxonomy = None
+
+
+def get_taxonomy():
+    """获取按默认配置编译的全局匹配器（首次调用时编译）"""
+    global _default_taxonomy
+    if _default_taxonomy is None:
+        _default_taxonomy = HazardTaxonomy()
+    return _default_taxonomy
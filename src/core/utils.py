@@ -12,6 +12,7 @@ from pathlib import Path
 from langchain_core.documents import Document
 
 from .config import DEFAULT_CONFIG
+from .taxonomy import get_taxonomy
 from .logging import getLogger
 
 logger = getLogger(__name__)
@@ -197,7 +198,7 @@ class RoutingUtils:
 
     @staticmethod
     def route_question(question):
-        """路由问题到相应的知识库集合"""
+        """路由问题到相应的知识库集合（专业分片的选择由 route_shards 负责）"""
         if not question or not isinstance(question, str):
             logger.warning("无效的问题输入")
             return "safe"
@@ -210,9 +211,23 @@ class RoutingUtils:
             logger.debug(f"问题路由到默认集合: {question}")
             return "safe"  # 默认返回安全集合
 
+    @staticmethod
+    def route_shards(text):
+        """按隐患分类体系将文本路由到知识库分片，命中多的分片在前，general分片始终参与"""
+        if not text or not isinstance(text, str):
+            return ["general"]
+        return get_taxonomy().route(text)
+
+    @staticmethod
+    def canonicalize_hazard(text):
+        """将隐患描述归一化为规范隐患类别列表"""
+        if not text or not isinstance(text, str):
+            return []
+        return get_taxonomy().categories(text)
+
     @staticmethod
     def extract_hazard_info(analysis_result):
-        """从分析结果中提取危险信息用于检索"""
+        """从分析结果中提取危险信息用于检索，能归类的隐患使用规范类别名以便命中缓存"""
         if not analysis_result or not isinstance(analysis_result, dict):
             logger.warning("无效的分析结果输入")
             return "施工安全"
@@ -221,11 +236,20 @@ class RoutingUtils:
         if not hazards:
             return "施工安全"
         
-        # 提取主要危险类型
-        hazard_types = [hazard.get("hazard_type", "") for hazard in hazards if hazard.get("hazard_type")]
-        if hazard_types:
-            # 返回前几个危险类型的组合
-            main_hazards = ", ".join(hazard_types[:3])
+        # 提取主要危险类型，同义表述归一到同一规范类别
+        terms = []
+        for hazard in hazards:
+            hazard_type = hazard.get("hazard_type", "")
+            if not hazard_type:
+                continue
+            categories = RoutingUtils.canonicalize_hazard(hazard_type)
+            for term in categories[:1] or [hazard_type]:
+                if term not in terms:
+                    terms.append(term)
+
+        if terms:
+            # 返回前几个危险类型的组合，排序保证同一组隐患得到同一查询
+            main_hazards = ", ".join(sorted(terms[:3]))
             logger.debug(f"提取的危险信息: {main_hazards}")
             return main_hazards
         
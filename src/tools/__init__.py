@@ -1,30 +1,46 @@
 """
 工具包
 包含多模态分析、知识库检索、报告生成、PDF导出等核心工具
+
+各工具按需导入：导入本包或其子模块（如 src.tools.retrieval）不会初始化全局工具实例，
+只有访问 analyze_image_tool 等智能体工具时才会加载 wrappers 并创建实例
 """
 
-# 使用绝对导入避免循环导入问题
-from .multimodal import MultimodalAnalyzer
-from .retrieval import KnowledgeRetriever
-from .report import ReportGenerator
-from .pdf import PDFExporter
-from .wrappers import (
-    analyze_image_tool,
-    retrieve_knowledge_tool,
-    generate_report_tool,
-    export_pdf_tool,
-)
-
-__all__ = [
-    "MultimodalAnalyzer",
-    "KnowledgeRetriever",
-    "ReportGenerator",
-    "PDFExporter",
-    "analyze_image_tool",
-    "retrieve_knowledge_tool",
-    "generate_report_tool",
-    "export_pdf_tool",
-]
+import importlib
+
+# 导出名 -> 所在子模块
+_EXPORTS = {
+    "MultimodalAnalyzer": "multimodal",
+    "KnowledgeRetriever": "retrieval",
+    "ReportGenerator": "report",
+    "HazardRegulationMap": "hazard_map",
+    "IngestionQueue": "ingest_queue",
+    "ReportStore": "report_store",
+    "UploadStore": "storage",
+    "StorageSweeper": "storage",
+    "PDFExporter": "pdf",
+    "analyze_image_tool": "wrappers",
+    "retrieve_knowledge_tool": "wrappers",
+    "generate_report_tool": "wrappers",
+    "export_pdf_tool": "wrappers",
+    "aanalyze_image_tool": "wrappers",
+    "aretrieve_knowledge_tool": "wrappers",
+    "agenerate_report_tool": "wrappers",
+}
+
+__all__ = list(_EXPORTS)
 
 # 工具包版本信息
 __version__ = "1.0.0"
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,208 @@
+"""
+近重复文档片段检测工具
+基于MinHash签名与LSH分桶，在入库阶段剔除近似重复的规范片段
+"""
+
+import json
+import re
+import hashlib
+import threading
+from pathlib import Path
+
+import numpy as np
+
+from src.core.logging import getLogger
+
+logger = getLogger(__name__)
+
+NUM_PERM = 64
+# 16段×4行：Jaccard相似度约0.5以上的片段才会进入候选，再按阈值精确校验
+NUM_BANDS = 16
+ROWS_PER_BAND = NUM_PERM // NUM_BANDS
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+class MinHasher:
+    """MinHash签名计算器"""
+
+    _normalize_pattern = re.compile(r"[\s\W_]+", re.UNICODE)
+
+    def __init__(self, shingle_size=3, num_perm=NUM_PERM, seed=20240501):
+        self.shingle_size = shingle_size
+        # 固定随机种子，保证签名跨进程、跨版本稳定
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+
+    def normalize(self, text):
+        """归一化文本，去除空白与标点，避免排版差异影响签名"""
+        if not text:
+            return ""
+        return self._normalize_pattern.sub("", text).lower()
+
+    def _shingles(self, text):
+        size = self.shingle_size
+        if len(text) <= size:
+            return {text} if text else set()
+        return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+    def signature(self, text):
+        """计算文本的MinHash签名"""
+        shingles = self._shingles(self.normalize(text))
+        if not shingles:
+            return np.zeros(len(self._a), dtype=np.uint32)
+
+        hashes = np.frombuffer(
+            b"".join(
+                hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest()
+                for s in shingles
+            ),
+            dtype="<u4",
+        ).astype(np.uint64)
+        # a、b与哈希值均小于2^32，乘积不会溢出uint64
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME & _MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    @staticmethod
+    def similarity(sig_a, sig_b):
+        """由签名估计Jaccard相似度"""
+        return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+
+class NearDuplicateIndex:
+    """近重复片段索引，记录规范片段签名及其全部来源"""
+
+    def __init__(self, index_path, similarity_threshold=0.8, shingle_size=3):
+        self.index_path = Path(index_path)
+        self.similarity_threshold = similarity_threshold
+        self.hasher = MinHasher(shingle_size)
+        self._lock = threading.Lock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self._entries = {}
+        self._bands = [{} for _ in range(NUM_BANDS)]
+
+    def _load(self):
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for chunk_id, entry in data.get("entries", {}).items():
+                signature = np.frombuffer(bytes.fromhex(entry["sig"]), dtype="<u4")
+                self._insert(chunk_id, signature, entry.get("sources", []))
+            logger.info(f"加载去重索引: {len(self._entries)} 个规范片段")
+        except Exception as e:
+            logger.warning(f"去重索引加载失败，将重新建立: {e}")
+            self._reset()
+
+    def save(self):
+        """持久化索引"""
+        with self._lock:
+            data = {
+                "version": 1,
+                "entries": {
+                    chunk_id: {
+                        "sig": entry["sig"].astype("<u4").tobytes().hex(),
+                        "sources": entry["sources"],
+                    }
+                    for chunk_id, entry in self._entries.items()
+                },
+            }
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        tmp_path.replace(self.index_path)
+
+    def reload(self):
+        """丢弃未持久化的修改（写入向量库失败时调用），恢复到磁盘状态"""
+        with self._lock:
+            self._reset()
+            self._load()
+
+    def clear(self):
+        """清空索引"""
+        with self._lock:
+            self._reset()
+        self.index_path.unlink(missing_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _band_keys(signature):
+        return [
+            signature[i * ROWS_PER_BAND:(i + 1) * ROWS_PER_BAND].tobytes()
+            for i in range(NUM_BANDS)
+        ]
+
+    def _insert(self, chunk_id, signature, sources):
+        self._entries[chunk_id] = {"sig": signature, "sources": list(sources)}
+        for band, key in zip(self._bands, self._band_keys(signature)):
+            band.setdefault(key, []).append(chunk_id)
+
+    def _find(self, signature):
+        """查找相似度不低于阈值的规范片段"""
+        best_id, best_score = None, self.similarity_threshold
+        seen = set()
+        for band, key in zip(self._bands, self._band_keys(signature)):
+            for chunk_id in band.get(key, ()):
+                if chunk_id in seen:
+                    continue
+                seen.add(chunk_id)
+                score = MinHasher.similarity(self._entries[chunk_id]["sig"], signature)
+                if score >= best_score:
+                    best_id, best_score = chunk_id, score
+        return best_id
+
+    def deduplicate(self, docs):
+        """
+        对一批文档片段去重
+
+        Returns:
+            (kept_docs, kept_ids, updated_ids): 需写入的规范片段、其ID，
+            以及来源列表发生变化的已入库规范片段ID
+        """
+        kept_docs, kept_ids = [], []
+        pending = {}
+        updated_ids = set()
+
+        with self._lock:
+            for doc in docs:
+                source_ref = self._source_ref(doc.metadata)
+                signature = self.hasher.signature(doc.page_content)
+                canonical_id = self._find(signature)
+
+                if canonical_id is None:
+                    chunk_id = hashlib.sha1(doc.page_content.encode("utf-8")).hexdigest()
+                    self._insert(chunk_id, signature, [source_ref])
+                    pending[chunk_id] = doc
+                    kept_docs.append(doc)
+                    kept_ids.append(chunk_id)
+                    continue
+
+                sources = self._entries[canonical_id]["sources"]
+                if source_ref not in sources:
+                    sources.append(source_ref)
+                    if canonical_id not in pending:
+                        updated_ids.add(canonical_id)
+
+            for chunk_id, doc in pending.items():
+                doc.metadata["duplicate_sources"] = self.sources_json(chunk_id)
+
+        return kept_docs, kept_ids, sorted(updated_ids)
+
+    def sources_json(self, chunk_id):
+        """规范片段的全部来源（Chroma元数据仅支持标量，序列化为JSON字符串）"""
+        return json.dumps(self._entries[chunk_id]["sources"], ensure_ascii=False)
+
+    @staticmethod
+    def _source_ref(metadata):
+        source = str(metadata.get("source", "unknown"))
+        if "page" in metadata:
+            return f"{source}#p{metadata['page']}"
+        return source
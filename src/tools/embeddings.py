@@ -0,0 +1,131 @@
+"""
+嵌入模型后端
+由 DEFAULT_CONFIG["embedding_model"] 选择后端:
+  "bge-m3:latest" 或 "ollama:bge-m3:latest"   通过本机Ollama服务计算（默认）
+  "onnx:<模型目录>"                           进程内CPU推理，目录中包含 model.onnx 与 tokenizer.json
+                                              （如导出为ONNX的 bge-small-zh-v1.5 / bge-m3）
+"""
+
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.logging import getLogger
+
+logger = getLogger(__name__)
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    进程内ONNX嵌入模型
+
+    文本按长度排序后分批编码以减少填充，算子内并行由onnxruntime线程池完成；
+    池化方式默认取[CLS]向量（bge系列的用法），输出L2归一化
+    """
+
+    def __init__(self, model_dir, batch_size=32, num_threads=0, max_length=512,
+                 pooling="cls", normalize=True):
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("ONNX嵌入后端需要安装 onnxruntime 与 tokenizers") from e
+
+        model_dir = Path(model_dir)
+        model_path = model_dir / "model.onnx"
+        tokenizer_path = model_dir / "tokenizer.json"
+        if not model_path.exists() or not tokenizer_path.exists():
+            raise FileNotFoundError(f"模型目录缺少 model.onnx 或 tokenizer.json: {model_dir}")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            str(model_path), options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {item.name for item in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(tokenizer_path))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        pad_token = "<pad>" if self.tokenizer.token_to_id("<pad>") is not None else "[PAD]"
+        self.tokenizer.enable_padding(
+            pad_id=self.tokenizer.token_to_id(pad_token) or 0, pad_token=pad_token
+        )
+
+        self.batch_size = batch_size
+        self.pooling = pooling
+        self.normalize = normalize
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        feeds = {name: value for name, value in feeds.items() if name in self._input_names}
+
+        hidden = self.session.run(None, feeds)[0]
+        if hidden.ndim == 3:
+            if self.pooling == "mean":
+                mask = attention_mask[..., None].astype(hidden.dtype)
+                hidden = (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+            else:
+                hidden = hidden[:, 0]
+        if self.normalize:
+            hidden = hidden / np.maximum(np.linalg.norm(hidden, axis=1, keepdims=True), 1e-12)
+        return hidden
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            for index, vector in zip(batch, self._embed_batch([texts[i] for i in batch])):
+                vectors[index] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
+
+
+def _create_ollama(target, config):
+    from langchain_ollama import OllamaEmbeddings
+
+    return OllamaEmbeddings(model=target)
+
+
+def _create_onnx(target, config):
+    return OnnxEmbeddings(
+        target,
+        batch_size=config["embedding_batch_size"],
+        num_threads=config["embedding_num_threads"],
+        max_length=config["embedding_max_length"],
+        pooling=config["embedding_pooling"],
+    )
+
+
+EMBEDDING_BACKENDS = {
+    "ollama": _create_ollama,
+    "onnx": _create_onnx,
+}
+
+
+def parse_embedding_spec(spec):
+    """解析 "后端:目标" 形式的嵌入模型配置，未注明后端时视为Ollama模型名"""
+    backend, sep, target = spec.partition(":")
+    if sep and backend in EMBEDDING_BACKENDS:
+        return backend, target
+    return "ollama", spec
+
+
+def create_embeddings(spec, config=None):
+    """按配置创建嵌入模型实例"""
+    config = dict(DEFAULT_CONFIG, **(config or {}))
+    backend, target = parse_embedding_spec(spec)
+    return EMBEDDING_BACKENDS[backend](target, config)
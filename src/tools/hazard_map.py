@@ -0,0 +1,198 @@
+"""
+隐患类别-法规映射表
+预先为常见隐患类别检索相关规范片段，知识库版本变化时在后台重建，
+评估与报告生成时直接查表，无需在请求路径上计算查询向量
+创建映射表不会触发重建：知识库内容变更或首次查表发现版本落后时才在后台重建
+"""
+
+import json
+import threading
+import time
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+from src.core.config import DEFAULT_CONFIG, HAZARD_TAXONOMY
+from src.core.utils import RoutingUtils
+from src.core.logging import getLogger
+
+logger = getLogger(__name__)
+
+# 重建未得到任何规范片段（嵌入模型不可用或知识库为空）后，同一版本再次尝试的最短间隔
+RETRY_INTERVAL_SECONDS = 300
+
+
+class HazardRegulationMap:
+    """隐患类别到规范片段的物化映射表"""
+
+    def __init__(self, knowledge_retriever, k=None, table_path=None):
+        self.retriever = knowledge_retriever
+        self.k = k or DEFAULT_CONFIG["retrieval_k"]
+        self.table_path = Path(
+            table_path
+            or Path(knowledge_retriever.config["persist_dir"]) / "hazard_regulation_map.json"
+        )
+
+        self._table = {}
+        self._version = None
+        self._lock = threading.Lock()
+        self._rebuild_thread = None
+        self._rebuild_pending = False
+        self._last_attempt = None
+
+        self._load()
+        knowledge_retriever.add_version_listener(lambda version: self.refresh())
+
+    @property
+    def is_current(self):
+        """映射表是否与当前知识库版本一致"""
+        return self._version == self.retriever.kb_version
+
+    def _load(self):
+        if not self.table_path.exists():
+            return
+        try:
+            with open(self.table_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._table = {
+                category: [Document(**doc) for doc in docs]
+                for category, docs in data.get("table", {}).items()
+                if docs
+            }
+            # 没有任何规范片段的表不可信（生成时检索失败），按未构建处理
+            self._version = data.get("kb_version") if self._table else None
+            logger.info(f"加载隐患法规映射表: {len(self._table)} 个类别，版本 {self._version}")
+        except Exception as e:
+            logger.warning(f"隐患法规映射表加载失败，将重新构建: {e}")
+            self._table, self._version = {}, None
+
+    def _save(self, table, version):
+        data = {
+            "kb_version": version,
+            "table": {
+                category: [
+                    {"page_content": doc.page_content, "metadata": doc.metadata}
+                    for doc in docs
+                ]
+                for category, docs in table.items()
+            },
+        }
+        tmp_path = self.table_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        tmp_path.replace(self.table_path)
+
+    def refresh(self):
+        """在后台线程中重建映射表，重建期间继续提供旧表"""
+        with self._lock:
+            if self._rebuild_thread and self._rebuild_thread.is_alive():
+                # 合并重建请求，当前重建结束后再执行一次
+                self._rebuild_pending = True
+                return
+            self._rebuild_thread = threading.Thread(
+                target=self._rebuild_loop, name="hazard-map-rebuild", daemon=True
+            )
+            self._rebuild_thread.start()
+
+    def _ensure_current(self):
+        """
+        查表时发现映射表落后于知识库版本则在后台重建，本次查询继续使用旧表与实时检索
+
+        同一版本的上次重建未得到任何片段时，间隔 RETRY_INTERVAL_SECONDS 后才再次尝试
+        """
+        version = self.retriever.kb_version
+        if self._version == version:
+            return
+        if self._last_attempt and self._last_attempt[0] == version \
+                and time.monotonic() - self._last_attempt[1] < RETRY_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            if self._rebuild_thread and self._rebuild_thread.is_alive():
+                return
+        self.refresh()
+
+    def _rebuild_loop(self):
+        while True:
+            self._rebuild()
+            with self._lock:
+                if not self._rebuild_pending:
+                    self._rebuild_thread = None
+                    return
+                self._rebuild_pending = False
+
+    def _rebuild(self):
+        version = self.retriever.kb_version
+        self._last_attempt = (version, time.monotonic())
+        if self.retriever.embeddings is None:
+            logger.warning("嵌入模型不可用，暂不重建隐患法规映射表")
+            return
+        logger.info(f"开始重建隐患法规映射表（知识库版本 {version}）")
+
+        table = {}
+        for category, entry in HAZARD_TAXONOMY.items():
+            # 优先取入库时已标注为该类别的片段，不足k条时用语义检索补齐
+            docs = list(self.retriever.retrieve(
+                entry["query"], "safe", k=self.k, filter={"hazard_category": category}
+            ))
+            if len(docs) < self.k:
+                seen = {doc.page_content for doc in docs}
+                for doc in self.retriever.retrieve(entry["query"], "safe", k=self.k):
+                    if len(docs) >= self.k:
+                        break
+                    if doc.page_content not in seen:
+                        seen.add(doc.page_content)
+                        docs.append(doc)
+            if docs:
+                table[category] = docs
+
+        # 检索失败或知识库为空时不覆盖现有的表，也不标记为当前版本，查表时回退到实时检索
+        if not table:
+            logger.warning(f"隐患法规映射表重建未得到任何规范片段（知识库版本 {version}），保留现有映射表")
+            return
+
+        # 整表替换，读者始终看到完整的一版
+        self._table, self._version = table, version
+        try:
+            self._save(table, version)
+        except Exception as e:
+            logger.warning(f"隐患法规映射表保存失败: {e}")
+        logger.info(f"隐患法规映射表重建完成: {len(table)}/{len(HAZARD_TAXONOMY)} 个类别有规范片段")
+
+    def lookup(self, category):
+        """查询单个隐患类别的规范片段，未命中（含没有片段的类别）返回None"""
+        return self._table.get(category) or None
+
+    def lookup_for_analysis(self, analysis_result):
+        """
+        根据图片分析结果查表获取规范片段
+
+        已归类的隐患直接读取映射表；无法归类、类别在表中没有片段或映射表尚未就绪时回退到实时检索
+        """
+        self._ensure_current()
+        hazards = (analysis_result or {}).get("hazards", [])
+        table = self._table
+
+        docs, seen = [], set()
+        unmatched = not hazards
+        for hazard in hazards:
+            categories = RoutingUtils.canonicalize_hazard(hazard.get("hazard_type", ""))
+            hits = [table[c] for c in categories if table.get(c)]
+            # 任一类别在表中没有片段都视为未命中，由实时检索补足
+            if not hits or len(hits) < len(categories):
+                unmatched = True
+            for category_docs in hits:
+                for doc in category_docs:
+                    if doc.page_content not in seen:
+                        seen.add(doc.page_content)
+                        docs.append(doc)
+
+        if unmatched:
+            query = RoutingUtils.extract_hazard_info(analysis_result)
+            for doc in self.retriever.retrieve(query, "safe"):
+                if doc.page_content not in seen:
+                    seen.add(doc.page_content)
+                    docs.append(doc)
+        else:
+            logger.info(f"从隐患法规映射表获取 {len(docs)} 个规范片段")
+
+        return docs
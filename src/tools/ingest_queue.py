@@ -0,0 +1,194 @@
+"""
+知识库入库任务队列
+上传的文档先登记为入库任务，由后台工作线程依次解析、切分、嵌入并写入知识库；
+任务状态持久化在SQLite中，页面重新运行或进程重启后队列仍然保留，未完成的任务会重新执行
+
+任务状态: queued（排队） -> parsing（解析） -> embedding（嵌入写入） -> done（完成）/ failed（失败）
+"""
+
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.logging import getLogger
+
+logger = getLogger(__name__)
+
+JOB_STATUS_LABELS = {
+    "queued": "排队中",
+    "parsing": "解析中",
+    "embedding": "嵌入写入中",
+    "done": "已完成",
+    "failed": "失败",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file_path TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    collection TEXT NOT NULL,
+    status TEXT NOT NULL,
+    num_input_chunks INTEGER NOT NULL DEFAULT 0,
+    num_chunks INTEGER NOT NULL DEFAULT 0,
+    num_duplicates INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs (status, id);
+"""
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+class IngestionQueue:
+    """持久化入库任务队列，单个后台工作线程按提交顺序处理"""
+
+    def __init__(self, knowledge_retriever, db_path=None):
+        self.knowledge_retriever = knowledge_retriever
+        self.db_path = Path(db_path or DEFAULT_CONFIG["ingest_queue_db"])
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._worker = None
+
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            # 上次进程退出时仍在处理的任务重新排队
+            recovered = conn.execute(
+                "UPDATE ingest_jobs SET status = 'queued', updated_at = ? "
+                "WHERE status IN ('parsing', 'embedding')",
+                (_now(),),
+            ).rowcount
+        if recovered:
+            logger.info(f"恢复 {recovered} 个未完成的入库任务")
+
+        self._ensure_worker()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _update(self, job_id, **fields):
+        fields["updated_at"] = _now()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                f"UPDATE ingest_jobs SET {assignments} WHERE id = ?",
+                (*fields.values(), job_id),
+            )
+
+    def submit(self, file_path, collection_name="safe"):
+        """登记入库任务并立即返回任务ID"""
+        now = _now()
+        with self._lock, self._connect() as conn:
+            job_id = conn.execute(
+                "INSERT INTO ingest_jobs (file_path, file_name, collection, status, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?)",
+                (str(file_path), Path(file_path).name, collection_name, now, now),
+            ).lastrowid
+        logger.info(f"入库任务 #{job_id} 已排队: {file_path}")
+        self._ensure_worker()
+        self._wakeup.set()
+        return job_id
+
+    def get_job(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_jobs(self, limit=10):
+        """最近的入库任务，新任务在前"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT * FROM ingest_jobs ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def has_active_jobs(self):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM ingest_jobs WHERE status IN ('queued', 'parsing', 'embedding') LIMIT 1"
+            ).fetchone()
+        return row is not None
+
+    def active_files(self):
+        """尚未完成（排队或处理中）的入库任务的源文件路径"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT file_path FROM ingest_jobs WHERE status IN ('queued', 'parsing', 'embedding')"
+            ).fetchall()
+        return [row["file_path"] for row in rows]
+
+    def _ensure_worker(self):
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="kb-ingest-worker", daemon=True
+                )
+                self._worker.start()
+
+    def _claim_next(self):
+        """
+        领取最早排队的任务
+
+        多个进程可能共用同一个队列数据库，线程锁无法覆盖；以带状态条件的UPDATE领取，
+        影响行数为0说明任务已被其他进程抢先领取，继续尝试下一个
+        """
+        with self._lock, self._connect() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM ingest_jobs WHERE status = 'queued' ORDER BY id LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    return None
+                claimed = conn.execute(
+                    "UPDATE ingest_jobs SET status = 'parsing', updated_at = ? "
+                    "WHERE id = ? AND status = 'queued'",
+                    (_now(), row["id"]),
+                ).rowcount
+                conn.commit()
+                if claimed:
+                    return dict(row)
+
+    def _run(self):
+        while True:
+            job = self._claim_next()
+            if job is None:
+                self._wakeup.wait()
+                self._wakeup.clear()
+                continue
+            self._process(job)
+
+    def _process(self, job):
+        job_id = job["id"]
+
+        def on_progress(stage, **counts):
+            self._update(job_id, status=stage, **counts)
+
+        try:
+            result = self.knowledge_retriever.add_documents(
+                job["file_path"], job["collection"], progress_callback=on_progress
+            )
+        except Exception as e:
+            result = {"success": False, "error": str(e)}
+
+        if result.get("success"):
+            self._update(
+                job_id,
+                status="done",
+                num_input_chunks=result["num_input_chunks"],
+                num_chunks=result["num_chunks"],
+                num_duplicates=result["num_duplicates"],
+            )
+            logger.info(f"入库任务 #{job_id} 完成: {result['num_chunks']} 个文档片段")
+        else:
+            self._update(job_id, status="failed", error=result.get("error"))
+            logger.error(f"入库任务 #{job_id} 失败: {result.get('error')}")
@@ -0,0 +1,242 @@
+"""
+巡检轮次汇总
+一轮巡检的多张照片分别分析后合并为一份分析结果：同类隐患跨照片去重，
+每张照片的位置、描述与置信度作为证据保留，报告按去重后的隐患生成一次；
+复查时与用户选定的同一工地、同一范围的基准报告对比，区分新增、等级变化、仍存在与已整改的隐患；
+本次照片不完整时，基准报告中本次未出现的隐患记为“未覆盖”，不判定为已整改
+"""
+
+from src.core.config import RISK_LEVELS
+from src.core.utils import RoutingUtils
+
+SEVERITY_SCORES = {"high": 3, "medium": 2, "low": 1}
+
+# 检查范围：单张照片评估与巡检轮次，复查只在相同范围之间对比
+SCOPE_LABELS = {"single": "单张照片评估", "round": "巡检轮次"}
+
+
+def report_scope(report):
+    """报告或分析结果的检查范围；早期保存的报告没有 scope 字段，按是否带 photo_count 判断"""
+    return report.get("scope") or ("round" if report.get("photo_count") else "single")
+
+
+def covers_baseline(previous, analysis_result):
+    """
+    本次检查的照片是否完整覆盖基准报告
+
+    单张照片对单张照片视为完整；巡检轮次要求没有分析失败的照片，且有效照片数不少于基准轮次
+    """
+    if report_scope(previous) != report_scope(analysis_result):
+        return False
+    if analysis_result.get("failed_photos"):
+        return False
+    return analysis_result.get("photo_count", 1) >= (previous.get("photo_count") or 1)
+
+
+def hazard_key(hazard):
+    """
+    跨照片去重使用的隐患键：能归入规范类别的按类别，否则按去除空白后的原始类型
+
+    合并后的隐患已带有 category 字段，直接使用
+    """
+    if hazard.get("category"):
+        return hazard["category"]
+    hazard_type = (hazard.get("hazard_type") or "").strip()
+    categories = RoutingUtils.canonicalize_hazard(hazard_type)
+    return categories[0] if categories else "".join(hazard_type.split()) or "未知隐患"
+
+
+def risk_score(hazards):
+    """
+    按照片数加权的平均严重程度（1~3）
+
+    合并后的隐患以出现的照片数为权重，多张照片中反复出现的隐患对整体风险影响更大；
+    单张照片的分析结果中每个隐患权重为1，与逐项平均一致
+    """
+    total_weight = total_score = 0
+    for hazard in hazards:
+        weight = hazard.get("photo_count", 1)
+        total_weight += weight
+        total_score += SEVERITY_SCORES.get(hazard.get("severity", "low"), 1) * weight
+    return round(total_score / total_weight, 2) if total_weight else 0.0
+
+
+def merge_analyses(analyses):
+    """
+    合并一轮巡检中多张照片的分析结果
+
+    Args:
+        analyses: {照片标识: analyze_image 的返回结果}，按拍摄/上传顺序
+
+    Returns:
+        与单张照片分析结果格式一致的字典，hazards 为去重后的隐患，每项附带
+        category（去重键，见 hazard_key）、evidence（各照片的证据）与 photo_count；
+        另含 photo_count、failed_photos、risk_score
+        隐患的 hazard_type 保留模型的原始表述，取置信度最高的一条证据
+    """
+    merged, failed = {}, []
+    for photo_id, analysis in analyses.items():
+        if not analysis or not analysis.get("success"):
+            failed.append(photo_id)
+            continue
+        for hazard in analysis.get("hazards", []):
+            key = hazard_key(hazard)
+            severity = hazard.get("severity") if hazard.get("severity") in SEVERITY_SCORES else "low"
+            evidence = {
+                "photo": photo_id,
+                "hazard_type": hazard.get("hazard_type") or key,
+                "severity": severity,
+                "location": hazard.get("location", ""),
+                "description": hazard.get("description", ""),
+                "confidence": hazard.get("confidence"),
+            }
+            entry = merged.get(key)
+            if entry is None:
+                merged[key] = {
+                    "hazard_type": evidence["hazard_type"],
+                    "category": key,
+                    "severity": severity,
+                    "location": evidence["location"],
+                    "description": evidence["description"],
+                    "confidence": evidence["confidence"],
+                    "evidence": [evidence],
+                }
+                continue
+
+            entry["evidence"].append(evidence)
+            if SEVERITY_SCORES[severity] > SEVERITY_SCORES[entry["severity"]]:
+                entry["severity"] = severity
+            # 类型表述、描述与位置取置信度最高的一条证据
+            if (evidence["confidence"] or 0) > (entry["confidence"] or 0):
+                entry.update(
+                    hazard_type=evidence["hazard_type"],
+                    location=evidence["location"],
+                    description=evidence["description"],
+                    confidence=evidence["confidence"],
+                )
+
+    hazards = list(merged.values())
+    for hazard in hazards:
+        hazard["photo_count"] = len({evidence["photo"] for evidence in hazard["evidence"]})
+    hazards.sort(key=lambda h: (-SEVERITY_SCORES[h["severity"]], -h["photo_count"]))
+
+    photo_count = len(analyses) - len(failed)
+    result = {
+        "success": photo_count > 0,
+        "hazards": hazards,
+        "summary": f"本轮巡检共分析照片 {photo_count} 张，发现 {len(hazards)} 类安全隐患",
+        "photo_count": photo_count,
+        "failed_photos": failed,
+        "risk_score": risk_score(hazards),
+    }
+    if not photo_count:
+        result["error"] = "所有照片分析均失败"
+    return result
+
+
+def format_evidence_section(hazards):
+    """隐患照片索引章节：每类隐患列出出现的照片及位置"""
+    lines = []
+    for i, hazard in enumerate(hazards, 1):
+        severity = RISK_LEVELS.get(hazard["severity"], RISK_LEVELS["low"])["label"]
+        photos = "；".join(
+            f"{evidence['photo']}" + (f"（{evidence['location']}）" if evidence.get("location") else "")
+            for evidence in hazard.get("evidence", [])
+        )
+        lines.append(f"{i}. **{hazard['hazard_type']}**（{severity}，{hazard.get('photo_count', 1)} 张照片）：{photos}")
+    return "\n".join(lines)
+
+
+def evidence_images(photo_paths, analysis):
+    """
+    PDF中嵌入的现场照片及图注
+
+    Args:
+        photo_paths: {照片标识: 文件路径}
+        analysis: 单张照片的分析结果或 merge_analyses 的合并结果
+
+    Returns:
+        [{"photo", "path", "caption"}]，图注列出该照片中识别的隐患
+    """
+    hazards = analysis.get("hazards", [])
+    images = []
+    for photo_id, path in photo_paths.items():
+        # 单张照片的分析结果没有 evidence，其中的隐患均属于这张照片；
+        # 合并结果按该照片自己的证据（模型对这张照片的表述与等级）生成图注
+        found = [
+            f"{item.get('hazard_type') or hazard.get('hazard_type', '未知隐患')}"
+            f"（{RISK_LEVELS.get(item.get('severity'), RISK_LEVELS['low'])['label']}）"
+            for hazard in hazards
+            for item in (
+                [hazard] if "evidence" not in hazard
+                else [evidence for evidence in hazard["evidence"] if evidence["photo"] == photo_id][:1]
+            )
+        ]
+        caption = f"{photo_id}：{'、'.join(found)}" if found else f"{photo_id}：未识别到明显安全隐患"
+        images.append({"photo": photo_id, "path": path, "caption": caption})
+    return images
+
+
+def _index_hazards(hazards):
+    """按隐患键归并，同类隐患取最高严重程度"""
+    indexed = {}
+    for hazard in hazards:
+        key = hazard_key(hazard)
+        severity = hazard.get("severity") if hazard.get("severity") in SEVERITY_SCORES else "low"
+        current = indexed.get(key)
+        if current is None or SEVERITY_SCORES[severity] > SEVERITY_SCORES[current["severity"]]:
+            indexed[key] = dict(hazard, severity=severity)
+    return indexed
+
+
+def diff_hazards(previous_hazards, current_hazards, complete=True):
+    """
+    对比基准报告与本次检查的隐患
+
+    Args:
+        complete: 本次照片是否完整覆盖基准报告（见 covers_baseline）；不完整时本次未出现的
+            隐患无法确认已整改，记为 unverified
+
+    Returns:
+        {"new": 新增, "changed": 等级变化（附 previous_severity）, "carried": 仍存在且等级不变,
+         "resolved": 已整改, "unverified": 本次未覆盖（后两项为基准报告的隐患）}，均为隐患列表
+    """
+    previous = _index_hazards(previous_hazards)
+    current = _index_hazards(current_hazards)
+    diff = {"new": [], "changed": [], "carried": [], "resolved": [], "unverified": []}
+    for key, hazard in current.items():
+        if key not in previous:
+            diff["new"].append(hazard)
+        elif previous[key]["severity"] != hazard["severity"]:
+            diff["changed"].append(dict(hazard, previous_severity=previous[key]["severity"]))
+        else:
+            diff["carried"].append(hazard)
+    unseen = [hazard for key, hazard in previous.items() if key not in current]
+    diff["resolved" if complete else "unverified"] = unseen
+    return diff
+
+
+def format_diff_section(diff, previous):
+    """复查对比章节：已整改、新增、等级变化、仍未整改与本次未覆盖的隐患"""
+    def label(hazard):
+        return f"{hazard_key(hazard)}（{RISK_LEVELS[hazard['severity']]['label']}）"
+
+    def join(items):
+        return "、".join(items) or "无"
+
+    lines = [
+        f"对比基准检查（报告 {previous['report_id']}，{previous['report_date']}，"
+        f"{SCOPE_LABELS[report_scope(previous)]}）：",
+        f"- **已整改**：{join(label(h) for h in diff['resolved'])}",
+        f"- **新增隐患**：{join(label(h) for h in diff['new'])}",
+        "- **风险等级变化**：" + join(
+            f"{hazard_key(h)}（{RISK_LEVELS[h['previous_severity']]['label']}→{RISK_LEVELS[h['severity']]['label']}）"
+            for h in diff["changed"]
+        ),
+        f"- **仍未整改**：{join(label(h) for h in diff['carried'])}",
+    ]
+    if diff.get("unverified"):
+        lines.append(
+            f"- **本次未覆盖**（照片不完整，无法确认是否整改）：{join(label(h) for h in diff['unverified'])}"
+        )
+    return "\n".join(lines)
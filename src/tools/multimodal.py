@@ -4,14 +4,15 @@
 """
 
 import os
-from pathlib import Path
+import asyncio
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 
 from src.core.config import MODELS
-from src.core.utils import FileUtils, CacheUtils
+from src.core.image_pipeline import ImagePayload
+from src.core.utils import CacheUtils
 from src.core.logging import getLogger
 
 logger = getLogger(__name__)
@@ -23,6 +24,7 @@ class MultimodalAnalyzer:
     def __init__(self, model_name="qwen_vision"):
         self.model_config = MODELS.get(model_name, MODELS["qwen_vision"])
         self._init_model()
+        self._vision_chain = self._build_vision_chain()
         logger.info("多模态分析器初始化完成")
 
     def _init_model(self):
@@ -42,26 +44,76 @@ class MultimodalAnalyzer:
             max_tokens=2000,
         )
 
+    def _cache_key(self, payload):
+        # 按内容哈希缓存，同名或重新上传的相同图片都能命中
+        return f"multimodal_{payload.digest}"
+
     def analyze_image(self, image_path, use_cache=True):
-        cache_key = (
-            f"multimodal_{Path(image_path).stat().st_mtime}_{Path(image_path).name}"
-        )
+        try:
+            payload = ImagePayload.from_path(image_path)
+        except OSError as e:
+            logger.error(f"图片读取失败: {str(e)}")
+            return {"success": False, "error": "文件不存在" if isinstance(e, FileNotFoundError) else str(e)}
+        return self.analyze_payload(payload, use_cache=use_cache)
+
+    async def aanalyze_image(self, image_path, use_cache=True):
+        """analyze_image 的异步版本，图片读取放到线程中，模型调用使用 ainvoke"""
+        try:
+            payload = await asyncio.to_thread(ImagePayload.from_path, image_path)
+        except OSError as e:
+            logger.error(f"图片读取失败: {str(e)}")
+            return {"success": False, "error": "文件不存在" if isinstance(e, FileNotFoundError) else str(e)}
+        return await self.aanalyze_payload(payload, use_cache=use_cache)
+
+    def analyze_payload(self, payload, use_cache=True):
+        """
+        分析内存中的图片（ImagePayload），校验、哈希、预处理与编码均不经过磁盘
+        """
+        try:
+            cache_key = self._cache_key(payload)
+
+            if use_cache:
+                cached_result = CacheUtils.get(cache_key)
+                if cached_result:
+                    logger.info("从缓存获取分析结果")
+                    return cached_result
+
+            logger.info(f"开始分析图片: {payload.name}")
+
+            is_valid, message = payload.validate()
+            if not is_valid:
+                return {"success": False, "error": message}
+
+            analysis_result = self._call_vision_model(payload.data_url())
+
+            CacheUtils.set(cache_key, analysis_result)
+            logger.info("图片分析完成")
+
+            return analysis_result
 
-        if use_cache:
-            cached_result = CacheUtils.get(cache_key)
-            if cached_result:
-                logger.info("从缓存获取分析结果")
-                return cached_result
+        except Exception as e:
+            logger.error(f"图片分析失败: {str(e)}")
+            return {"success": False, "error": str(e)}
 
+    async def aanalyze_payload(self, payload, use_cache=True):
+        """analyze_payload 的异步版本，哈希与编码放到线程中，模型调用使用 ainvoke"""
         try:
-            logger.info(f"开始分析图片: {image_path}")
+            cache_key = await asyncio.to_thread(self._cache_key, payload)
+
+            if use_cache:
+                cached_result = CacheUtils.get(cache_key)
+                if cached_result:
+                    logger.info("从缓存获取分析结果")
+                    return cached_result
+
+            logger.info(f"开始分析图片: {payload.name}")
 
-            is_valid, message = FileUtils.validate_image(image_path)
+            is_valid, message = payload.validate()
             if not is_valid:
                 return {"success": False, "error": message}
 
-            image_base64 = FileUtils.image_to_base64(image_path)
-            analysis_result = self._call_vision_model(image_base64)
+            image_url = await asyncio.to_thread(payload.data_url)
+            analysis_result = await self._acall_vision_model(image_url)
 
             CacheUtils.set(cache_key, analysis_result)
             logger.info("图片分析完成")
@@ -72,7 +124,7 @@ class MultimodalAnalyzer:
             logger.error(f"图片分析失败: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def _call_vision_model(self, image_base64):
+    def _build_vision_chain(self):
         system_prompt = """你是一位专业的建筑施工安全检查员。请分析这张施工现场图片，识别其中的安全隐患。
 
 请以JSON格式返回分析结果，格式如下：
@@ -100,9 +152,8 @@ class MultimodalAnalyzer:
                     [
                         {
                             "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/jpeg;base64,{image_base64}"
-                            },
+                            # 图片以变量传入，提示词模板只构建一次，不随图片内容重新解析
+                            "image_url": {"url": "{image_url}"},
                         },
                         {
                             "type": "text",
@@ -114,29 +165,42 @@ class MultimodalAnalyzer:
         )
 
         parser = JsonOutputParser()
-        chain = prompt | self.model | parser
+        return prompt | self.model | parser
+
+    def _check_result(self, result):
+        if result is None:
+            logger.warning("模型返回结果为None")
+            raise ValueError("模型未返回有效结果")
+        logger.info("模型调用成功")
+        return result
+
+    def _fallback_result(self, error):
+        logger.error(f"模型调用失败: {str(error)}")
+        logger.warning(f"JSON解析失败: {error}")
+        return {
+            "success": True,
+            "hazards": [
+                {
+                    "hazard_type": "待分析",
+                    "location": "图片中",
+                    "severity": "medium",
+                    "description": "需要进一步分析",
+                    "confidence": 0.5,
+                }
+            ],
+            "summary": "图片已接收",
+        }
+
+    def _call_vision_model(self, image_url):
+        logger.info("调用视觉模型...")
+        try:
+            return self._check_result(self._vision_chain.invoke({"image_url": image_url}))
+        except Exception as e:
+            return self._fallback_result(e)
 
+    async def _acall_vision_model(self, image_url):
         logger.info("调用视觉模型...")
         try:
-            result = chain.invoke({})
-            if result is None:
-                logger.warning("模型返回结果为None")
-                raise ValueError("模型未返回有效结果")
-            logger.info("模型调用成功")
-            return result
+            return self._check_result(await self._vision_chain.ainvoke({"image_url": image_url}))
         except Exception as e:
-            logger.error(f"模型调用失败: {str(e)}")
-            logger.warning(f"JSON解析失败: {e}")
-            return {
-                "success": True,
-                "hazards": [
-                    {
-                        "hazard_type": "待分析",
-                        "location": "图片中",
-                        "severity": "medium",
-                        "description": "需要进一步分析",
-                        "confidence": 0.5,
-                    }
-                ],
-                "summary": "图片已接收",
-            }
+            return self._fallback_result(e)
@@ -1,188 +1,163 @@
+import time
 from pathlib import Path
-from datetime import datetime
+from concurrent.futures import Future, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
 # 添加项目根目录到Python路径
 import sys
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
-try:
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-    from reportlab.pdfbase import pdfmetrics
-    from reportlab.pdfbase.ttfonts import TTFont
-    from reportlab.lib.fonts import addMapping
-    from reportlab.lib.enums import TA_LEFT, TA_CENTER
-
-    REPORTLAB_AVAILABLE = True
-except ImportError:
-    REPORTLAB_AVAILABLE = False
-    # 先导入日志模块
-    from src.core.logging import getLogger
-    temp_logger = getLogger(__name__)
-    temp_logger.warning("ReportLab未安装，PDF导出功能将不可用")
-
+from src.core import pdf_render
+from src.core.pdf_render import REPORTLAB_AVAILABLE, compendium_job, export_job
 from src.core.logging import getLogger
 logger = getLogger(__name__)
 
 
 class PDFExporter:
-    """PDF导出器类"""
+    """
+    PDF导出器类
+
+    export_to_pdf / export_to_bytes 在当前线程渲染；
+    submit_export 将渲染提交到工作进程池，立即返回 Future，页面线程不被阻塞；
+    export_batch 将多份报告分发到进程池并行渲染，可附带一份带目录的合订本
+    """
 
     def __init__(self, output_dir=None):
         self.output_dir = Path(output_dir) if output_dir else Path.cwd() / "output"
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.chinese_font = "Helvetica"
-        if REPORTLAB_AVAILABLE:
-            self._register_fonts()
         logger.info("PDF导出器初始化完成")
 
-    def _register_fonts(self):
-        """注册中文字体"""
-        try:
-            # 尝试注册常见的中文字体
-            font_paths = [
-                # Windows系统字体路径
-                "C:/Windows/Fonts/simsun.ttc",  # 宋体
-                "C:/Windows/Fonts/msyh.ttc",  # 微软雅黑
-                "C:/Windows/Fonts/simhei.ttf",  # 黑体
-            ]
-
-            font_registered = False
-            for font_path in font_paths:
-                try:
-                    if Path(font_path).exists():
-                        # 注册字体
-                        pdfmetrics.registerFont(TTFont("ChineseFont", font_path))
-                        # 映射字体
-                        addMapping("ChineseFont", 0, 0, "ChineseFont")  # normal
-                        addMapping("ChineseFont", 0, 1, "ChineseFont")  # italic
-                        addMapping("ChineseFont", 1, 0, "ChineseFont")  # bold
-                        addMapping("ChineseFont", 1, 1, "ChineseFont")  # bold italic
-                        font_registered = True
-                        logger.info(f"成功注册中文字体: {font_path}")
-                        break
-                except Exception as e:
-                    logger.warning(f"注册字体失败 {font_path}: {e}")
-                    continue
-
-            if not font_registered:
-                logger.warning("未找到可用的中文字体，PDF可能无法正确显示中文")
-                self.chinese_font = "Helvetica"  # fallback to default
-            else:
-                self.chinese_font = "ChineseFont"
-
-        except Exception as e:
-            logger.error(f"字体注册失败: {e}")
-            self.chinese_font = "Helvetica"
+    def _output_path(self, report_data, output_path=None, to_file=True):
+        if output_path is not None:
+            return str(output_path)
+        if to_file:
+            return str(self.output_dir / f"{report_data['report_id']}.pdf")
+        return None
 
     def export_to_pdf(self, report_data, output_path=None):
-        if not REPORTLAB_AVAILABLE:
-            return {
-                "success": False,
-                "error": "ReportLab未安装，请先安装: pip install reportlab",
-            }
+        """渲染并写入文件，返回 {"success", "output_path", "filename"}（同时附带PDF字节 data）"""
+        logger.info("开始导出PDF")
+        return export_job(report_data, self._output_path(report_data, output_path))
 
-        try:
-            logger.info("开始导出PDF")
-
-            if output_path is None:
-                filename = f"{report_data['report_id']}.pdf"
-                output_path = str(self.output_dir / filename)
-
-            doc = SimpleDocTemplate(
-                output_path,
-                pagesize=A4,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72,
-            )
-
-            story = []
-            styles = self._get_chinese_styles()
-
-            self._add_title_section(story, styles, report_data)
-
-            for section_name, content in report_data.get("sections", {}).items():
-                self._add_section(story, styles, section_name, content)
-
-            doc.build(story)
-
-            logger.info(f"PDF导出成功: {output_path}")
-            return {
-                "success": True,
-                "output_path": output_path,
-                "filename": Path(output_path).name,
-            }
-
-        except Exception as e:
-            logger.error(f"PDF导出失败: {str(e)}")
-            return {"success": False, "error": str(e)}
-
-    def _get_chinese_styles(self):
-        """获取支持中文的样式"""
-        styles = getSampleStyleSheet()
-
-        # 创建支持中文的样式
-        styles.add(
-            ParagraphStyle(
-                name="ChineseTitle",
-                fontName=self.chinese_font,
-                fontSize=24,
-                leading=28,
-                alignment=TA_CENTER,
-                spaceAfter=30,
-            )
-        )
+    def export_to_bytes(self, report_data):
+        """只在内存中渲染，返回 {"success", "data", "filename"}，不写文件"""
+        logger.info("开始导出PDF")
+        return export_job(report_data)
 
-        styles.add(
-            ParagraphStyle(
-                name="ChineseHeading",
-                fontName=self.chinese_font,
-                fontSize=16,
-                leading=20,
-                alignment=TA_LEFT,
-                spaceBefore=20,
-                spaceAfter=10,
-            )
-        )
+    def submit_export(self, report_data, output_path=None, to_file=False):
+        """
+        提交导出任务到渲染进程池
 
-        styles.add(
-            ParagraphStyle(
-                name="ChineseNormal",
-                fontName=self.chinese_font,
-                fontSize=12,
-                leading=16,
-                alignment=TA_LEFT,
-                spaceAfter=10,
-            )
-        )
+        Args:
+            to_file: 为True时同时写入输出目录（或 output_path），否则只返回PDF字节
 
-        return styles
-
-    def _add_title_section(self, story, styles, report_data):
-        """添加标题部分"""
-        title = report_data.get("title", "安全评估报告")
-        story.append(Paragraph(title, styles["ChineseTitle"]))
-        story.append(Spacer(1, 12))
-
-        meta_lines = [
-            f"报告编号: {report_data.get('report_id', '')}",
-            f"生成日期: {report_data.get('generate_date', datetime.now().strftime('%Y年%m月%d日'))}",
-        ]
+        Returns:
+            concurrent.futures.Future，结果格式同 export_to_bytes / export_to_pdf
+        """
+        if not REPORTLAB_AVAILABLE:
+            future = Future()
+            future.set_result(export_job(report_data))
+            return future
 
-        if report_data.get("company"):
-            meta_lines.append(f"公司名称: {report_data.get('company')}")
+        path = self._output_path(report_data, output_path, to_file)
+        return self._submit(export_job, report_data, path)
 
-        for line in meta_lines:
-            story.append(Paragraph(line, styles["ChineseNormal"]))
+    def submit_compendium(self, reports, title="安全评估报告汇编", output_path=None):
+        """
+        提交合订本导出任务：多份报告合并为一个PDF，首页为目录
 
-        story.append(Spacer(1, 20))
+        Returns:
+            concurrent.futures.Future，结果格式同 export_to_bytes
+        """
+        if not REPORTLAB_AVAILABLE:
+            future = Future()
+            future.set_result(compendium_job(reports, title))
+            return future
+        return self._submit(compendium_job, reports, title, output_path)
+
+    def export_batch(self, reports, output_dir=None, compendium=False,
+                     compendium_title="安全评估报告汇编"):
+        """
+        批量导出报告，每份报告在进程池中并行渲染并写入输出目录
+
+        工作进程直接写文件，不回传PDF字节，减少进程间传输
+
+        Args:
+            reports: 报告数据列表（如 ReportStore.get() 的结果）
+            compendium: 为True时另外生成一份带目录的合订本
+
+        Returns:
+            {"success", "files": 成功导出的文件路径, "failed": [{"report_id", "error"}],
+             "compendium": 合订本文件路径或None, "compendium_elapsed_s": 合订本耗时或None,
+             "elapsed_s", "pdfs_per_s": 仅统计单份报告}
+        """
+        if not REPORTLAB_AVAILABLE:
+            return {"success": False, "error": "ReportLab未安装，请先安装: pip install reportlab"}
+
+        output_dir = Path(output_dir) if output_dir else self.output_dir
+        reports = [report for report in reports if report]
+        logger.info(f"开始批量导出PDF: {len(reports)} 份报告")
+
+        started = time.perf_counter()
+        futures = {
+            self._submit(
+                export_job, report, str(output_dir / f"{report['report_id']}.pdf"), False
+            ): report["report_id"]
+            for report in reports
+        }
+
+        files, failed = [], []
+        for future in as_completed(futures):
+            report_id = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            if result["success"]:
+                files.append(result["output_path"])
+            else:
+                failed.append({"report_id": report_id, "error": result["error"]})
+        # 吞吐量只统计单份报告：合订本在单份报告全部完成后再提交，不与其争用工作进程
+        elapsed = time.perf_counter() - started
+
+        compendium_path, compendium_elapsed = None, None
+        if compendium and reports:
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            compendium_started = time.perf_counter()
+            try:
+                result = self._submit(
+                    compendium_job, reports, compendium_title,
+                    str(output_dir / f"{compendium_title}-{stamp}.pdf"), False,
+                ).result()
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            if result["success"]:
+                compendium_path = result["output_path"]
+            else:
+                failed.append({"report_id": "compendium", "error": result["error"]})
+            compendium_elapsed = round(time.perf_counter() - compendium_started, 3)
 
-    def _add_section(self, story, styles, section_name, content):
-        """添加章节内容"""
-        story.append(Paragraph(section_name, styles["ChineseHeading"]))
-        story.append(Paragraph(content, styles["ChineseNormal"]))
-        story.append(Spacer(1, 10))
+        pdfs_per_s = round(len(files) / elapsed, 2) if elapsed > 0 else 0.0
+        logger.info(
+            f"批量导出完成: 成功 {len(files)} 份，失败 {len(failed)} 份，"
+            f"耗时 {elapsed:.2f}s（{pdfs_per_s} 份/秒）"
+        )
+        return {
+            "success": not failed,
+            "files": sorted(files),
+            "failed": failed,
+            "compendium": compendium_path,
+            "compendium_elapsed_s": compendium_elapsed,
+            "elapsed_s": round(elapsed, 3),
+            "pdfs_per_s": pdfs_per_s,
+        }
+
+    def _submit(self, fn, *args):
+        try:
+            return pdf_render.get_render_pool().submit(fn, *args)
+        except BrokenProcessPool:
+            # 工作进程异常退出后进程池不可再用，重建后重试一次
+            logger.warning("PDF渲染进程池已失效，正在重建")
+            pdf_render.reset_render_pool()
+            return pdf_render.get_render_pool().submit(fn, *args)
@@ -1,19 +1,31 @@
 """
 报告生成工具
 实现结构化报告模板管理与动态内容填充
+混合模式下可由规则确定的章节直接生成，其余章节调用大模型，每个章节记录生成路径（rule/cache/snippet/history/llm）
+整改建议、预防措施由按隐患类型+严重程度缓存的措施片段拼装
 """
 
 import os
+import time
+import asyncio
+import threading
+import uuid
 from datetime import datetime
 from pathlib import Path
 
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
 
-from src.core.config import MODELS, REPORT_TEMPLATE, RISK_LEVELS
+from src.core.config import DEFAULT_CONFIG, MODELS, REPORT_TEMPLATE, REPORT_GENERATION_POLICY, RISK_LEVELS
 from src.core.utils import CacheUtils
 from src.core.logging import getLogger
+from src.tools.report_rules import ReportRuleEngine
+from src.tools.inspection import (
+    SCOPE_LABELS, covers_baseline, diff_hazards, format_diff_section, format_evidence_section,
+    hazard_key, report_scope, risk_score,
+)
+from src.tools.report_context import ReportContextBuilder, estimate_tokens
+from src.tools.report_snippets import SnippetCache, SNIPPET_SECTIONS, SNIPPET_PROMPTS
 
 logger = getLogger(__name__)
 
@@ -21,40 +33,358 @@ logger = getLogger(__name__)
 class ReportGenerator:
     """报告生成器类"""
 
-    def __init__(self, model_name="qwen"):
-        self.model_config = MODELS.get(model_name, MODELS["qwen"])
+    def __init__(self, model_name="qwen", regulation_map=None, mode=None):
+        self.model_name = model_name if model_name in MODELS else "qwen"
+        self.model_config = MODELS[self.model_name]
         self.report_template = REPORT_TEMPLATE
+        self.regulation_map = regulation_map
+        self.mode = mode or DEFAULT_CONFIG["report_mode"]
+        self.rule_engine = ReportRuleEngine()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            source: {"sections": 0, "total_ms": 0.0}
+            for source in ("rule", "cache", "snippet", "history", "llm")
+        }
+        self.snippets = SnippetCache()
+        self.context_builder = ReportContextBuilder()
+        self._cache_stats = {
+            "section": {"hits": 0, "misses": 0},
+            "snippet": {"hits": 0, "misses": 0},
+        }
+        self._tier_stats = {}
         self._init_model()
-        logger.info("报告生成器初始化完成")
+        logger.info(f"报告生成器初始化完成（{self.mode}模式）")
 
     def _init_model(self):
-        api_key = os.getenv(self.model_config["api_key_env"])
-        self.model = ChatOpenAI(
-            model=self.model_config["model"],
-            base_url=self.model_config["api_base"],
-            api_key=api_key,
-            temperature=0.3,
-            max_tokens=3000,
+        self._models = {}
+        self.model = self._get_model(self.model_name)
+
+    def _get_model(self, tier):
+        """按模型档位获取客户端，同一档位的各章节共用一个客户端"""
+        if tier not in self._models:
+            model_config = MODELS.get(tier, self.model_config)
+            self._models[tier] = ChatOpenAI(
+                model=model_config["model"],
+                base_url=model_config["api_base"],
+                api_key=os.getenv(model_config["api_key_env"]),
+                temperature=0.3,
+                max_tokens=3000,
+                stream_usage=True,
+            )
+        return self._models[tier]
+
+    def _generation_policy(self, policy_name, num_hazards):
+        """
+        按章节生成策略选择模型档位并绑定 max_tokens 与 temperature
+
+        Returns:
+            (模型档位, 绑定参数后的模型)
+        """
+        policy = dict(REPORT_GENERATION_POLICY["default"], **REPORT_GENERATION_POLICY.get(policy_name, {}))
+        tier = policy["tier"] or self.model_name
+        max_tokens = min(policy["max_tokens"], policy["base_tokens"] + policy["tokens_per_hazard"] * num_hazards)
+        model = self._get_model(tier).bind(max_tokens=max_tokens, temperature=policy["temperature"])
+        return tier, model
+
+    def _record_llm_call(self, tier, started, input_tokens, output_tokens, calls=1):
+        with self._stats_lock:
+            entry = self._tier_stats.setdefault(
+                tier, {"calls": 0, "total_ms": 0.0, "input_tokens": 0, "output_tokens": 0}
+            )
+            entry["calls"] += calls
+            entry["total_ms"] += (time.perf_counter() - started) * 1000
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+
+    def _message_usage(self, message, content, estimated_input):
+        """取模型返回的token用量，接口未返回用量时按本地估算"""
+        usage = getattr(message, "usage_metadata", None) or {}
+        return (
+            usage.get("input_tokens") or estimated_input,
+            usage.get("output_tokens") or estimate_tokens(content),
+        )
+
+    def get_tier_stats(self):
+        """各模型档位的调用次数、平均延迟与token用量（措施片段批量生成时按批次耗时计）"""
+        with self._stats_lock:
+            return {
+                tier: {
+                    "model": MODELS.get(tier, self.model_config)["model"],
+                    "calls": entry["calls"],
+                    "avg_ms": round(entry["total_ms"] / entry["calls"], 1) if entry["calls"] else 0.0,
+                    "input_tokens": entry["input_tokens"],
+                    "output_tokens": entry["output_tokens"],
+                }
+                for tier, entry in self._tier_stats.items()
+            }
+
+    def _new_report_data(self, metadata):
+        now = datetime.now()
+        # 同一秒内生成的报告以随机后缀区分，报告存储以 report_id 为主键
+        report_id = f"REPORT-{now.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:4].upper()}"
+        return {
+            "report_id": report_id,
+            "title": metadata.get("title", self.report_template["title"]),
+            "company": metadata.get("company", ""),
+            "site_id": metadata.get("site_id", ""),
+            "scope": metadata.get("scope", "single"),
+            "generated_at": now.isoformat(timespec="seconds"),
+            "generate_date": metadata.get(
+                "date", datetime.now().strftime("%Y年%m月%d日")
+            ),
+            "sections": {},
+            "section_sources": {},
+            "section_latency_ms": {},
+            "section_input_tokens": {},
+            "section_tiers": {},
+        }
+
+    def _rule_section(self, section_name, analysis_result, overall_risk):
+        """混合模式下尝试用规则生成章节，无法确定时返回None"""
+        if self.mode != "hybrid":
+            return None
+        return self.rule_engine.build_section(
+            section_name, analysis_result.get("hazards", []), overall_risk
+        )
+
+    def _record_section(self, report_data, section_name, trace, started):
+        """记录章节的生成路径、耗时、估算的输入token数与模型档位，并累计到全局统计"""
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        source = trace["source"]
+        report_data["section_sources"][section_name] = source
+        if "input_tokens" in trace:
+            report_data["section_input_tokens"][section_name] = trace["input_tokens"]
+        if "tier" in trace:
+            report_data["section_tiers"][section_name] = trace["tier"]
+        report_data["section_latency_ms"][section_name] = round(elapsed_ms, 1)
+        with self._stats_lock:
+            self._stats[source]["sections"] += 1
+            self._stats[source]["total_ms"] += elapsed_ms
+
+    def _order_section_trace(self, report_data, sections):
+        """并发生成时章节按完成顺序记录，统一调整为模板顺序"""
+        for key in ("section_sources", "section_latency_ms", "section_input_tokens", "section_tiers"):
+            trace = report_data[key]
+            report_data[key] = {section: trace[section] for section in sections if section in trace}
+
+    def get_generation_stats(self):
+        """
+        各生成路径的章节数与平均耗时；
+        estimated_saved_ms 按大模型章节平均耗时估算规则、缓存、片段拼装与沿用上次检查章节节省的时间
+        """
+        with self._stats_lock:
+            stats = {
+                source: {
+                    "sections": entry["sections"],
+                    "avg_ms": round(entry["total_ms"] / entry["sections"], 1) if entry["sections"] else 0.0,
+                }
+                for source, entry in self._stats.items()
+            }
+        llm_avg = stats["llm"]["avg_ms"]
+        saved = ("rule", "cache", "snippet", "history")
+        skipped = sum(stats[source]["sections"] for source in saved)
+        stats["llm_calls_saved"] = skipped
+        stats["estimated_saved_ms"] = round(
+            skipped * llm_avg - sum(stats[s]["sections"] * stats[s]["avg_ms"] for s in saved), 1
+        ) if llm_avg else 0.0
+        return stats
+
+    def _count_cache(self, layer, hit):
+        with self._stats_lock:
+            self._cache_stats[layer]["hits" if hit else "misses"] += 1
+
+    def get_cache_stats(self):
+        """整章节缓存与单项隐患措施片段缓存的命中率，分别统计"""
+        with self._stats_lock:
+            return {
+                layer: {
+                    **counts,
+                    "hit_rate": round(counts["hits"] / (counts["hits"] + counts["misses"]), 4)
+                    if counts["hits"] + counts["misses"] else 0.0,
+                }
+                for layer, counts in self._cache_stats.items()
+            }
+
+    def _precomputed_section(self, section_name, analysis_result, report_data, trace):
+        """无需调用大模型即可得到的章节：规则引擎优先，其次整章节缓存"""
+        content = self._rule_section(section_name, analysis_result, report_data["overall_risk"])
+        if content is not None:
+            trace["source"] = "rule"
+            return content
+
+        cached_content = CacheUtils.get(self._section_cache_key(section_name, analysis_result))
+        self._count_cache("section", bool(cached_content))
+        if cached_content:
+            trace["source"] = "cache"
+            return cached_content
+        return None
+
+    def _snippet_plan(self, section_name, analysis_result):
+        """
+        按“规范隐患类型 + 严重程度”归并隐患并查询片段缓存
+
+        Returns:
+            (entries, texts, missing, inputs)：归并后的隐患 {键: (类型, 严重程度, 隐患)}、
+            已缓存的片段、缺失片段的键及对应的生成输入
+        """
+        kind = SNIPPET_SECTIONS[section_name]
+        entries = {}
+        for hazard in analysis_result.get("hazards", []):
+            label = self.rule_engine.canonical_category(hazard) or (hazard.get("hazard_type") or "未知隐患").strip()
+            severity = hazard.get("severity", "low")
+            if severity not in RISK_LEVELS:
+                severity = "low"
+            entries.setdefault(SnippetCache.make_key(kind, label, severity), (label, severity, hazard))
+
+        texts, missing, inputs = {}, [], []
+        for key, (label, severity, hazard) in entries.items():
+            text = self.snippets.get(key)
+            self._count_cache("snippet", text is not None)
+            if text is None:
+                missing.append(key)
+                inputs.append({
+                    "hazard_type": label,
+                    "severity": RISK_LEVELS[severity]["label"],
+                    "description": str(hazard.get("description") or "")[:self.context_builder.description_chars],
+                })
+            else:
+                texts[key] = text
+        return entries, texts, missing, inputs
+
+    def _compose_snippet_section(self, section_name, analysis_result, entries, texts, trace, generated):
+        if generated:
+            self.snippets.set_many(generated)
+            texts.update(generated)
+        trace["source"] = "llm" if generated else "snippet"
+
+        content = "\n".join(
+            f"{i}. **{label}**（{RISK_LEVELS[severity]['label']}）：{texts[key].strip()}"
+            for i, (key, (label, severity, _)) in enumerate(entries.items(), 1)
         )
+        CacheUtils.set(self._section_cache_key(section_name, analysis_result), content)
+        return content
+
+    def _build_snippet_chain(self, section_name):
+        prompt = ChatPromptTemplate.from_template(SNIPPET_PROMPTS[SNIPPET_SECTIONS[section_name]])
+        tier, model = self._generation_policy("措施片段", 1)
+        return tier, prompt | model
+
+    def _trace_snippet_tokens(self, section_name, inputs, trace):
+        template = SNIPPET_PROMPTS[SNIPPET_SECTIONS[section_name]]
+        trace["input_tokens"] = sum(
+            estimate_tokens(template) + sum(estimate_tokens(value) for value in item.values())
+            for item in inputs
+        )
+        logger.info(f"章节 {section_name} 生成 {len(inputs)} 个措施片段，输入约 {trace['input_tokens']} tokens")
+
+    def _finish_snippet_batch(self, section_name, tier, started, missing, inputs, messages, trace):
+        self._trace_snippet_tokens(section_name, inputs, trace)
+        outputs = [message.content for message in messages]
+        estimated_input = trace["input_tokens"] // len(inputs)
+        usage = [self._message_usage(m, text, estimated_input) for m, text in zip(messages, outputs)]
+        self._record_llm_call(
+            tier, started, sum(u[0] for u in usage), sum(u[1] for u in usage), calls=len(messages)
+        )
+        trace["tier"] = tier
+        return dict(zip(missing, outputs))
+
+    def _compose_from_snippets(self, section_name, analysis_result, trace):
+        """由措施片段拼装章节，缺失的片段批量生成；生成失败时返回None，回退到整章节生成"""
+        entries, texts, missing, inputs = self._snippet_plan(section_name, analysis_result)
+        if not entries:
+            return None
+        generated = {}
+        if missing:
+            tier, chain = self._build_snippet_chain(section_name)
+            started = time.perf_counter()
+            try:
+                messages = chain.batch(inputs)
+            except Exception as e:
+                logger.warning(f"生成 {section_name} 措施片段失败: {e}")
+                return None
+            generated = self._finish_snippet_batch(section_name, tier, started, missing, inputs, messages, trace)
+        return self._compose_snippet_section(section_name, analysis_result, entries, texts, trace, generated)
+
+    async def _acompose_from_snippets(self, section_name, analysis_result, trace):
+        entries, texts, missing, inputs = self._snippet_plan(section_name, analysis_result)
+        if not entries:
+            return None
+        generated = {}
+        if missing:
+            tier, chain = self._build_snippet_chain(section_name)
+            started = time.perf_counter()
+            try:
+                messages = await chain.abatch(inputs)
+            except Exception as e:
+                logger.warning(f"生成 {section_name} 措施片段失败: {e}")
+                return None
+            generated = self._finish_snippet_batch(section_name, tier, started, missing, inputs, messages, trace)
+        return self._compose_snippet_section(section_name, analysis_result, entries, texts, trace, generated)
+
+    def _resolve_section(self, section_name, analysis_result, chunks, report_data):
+        started, trace = time.perf_counter(), {}
+        content = self._precomputed_section(section_name, analysis_result, report_data, trace)
+        if content is None and section_name in SNIPPET_SECTIONS:
+            content = self._compose_from_snippets(section_name, analysis_result, trace)
+        if content is None:
+            content = self._generate_section_content(
+                section_name, analysis_result, chunks, trace
+            )
+        self._record_section(report_data, section_name, trace, started)
+        return content
+
+    async def _aresolve_section(self, section_name, analysis_result, chunks, report_data):
+        started, trace = time.perf_counter(), {}
+        content = self._precomputed_section(section_name, analysis_result, report_data, trace)
+        if content is None and section_name in SNIPPET_SECTIONS:
+            content = await self._acompose_from_snippets(section_name, analysis_result, trace)
+        if content is None:
+            content = await self._agenerate_section_content(
+                section_name, analysis_result, chunks, trace
+            )
+        self._record_section(report_data, section_name, trace, started)
+        return content
+
+    def _stream_resolved_section(self, section_name, analysis_result, chunks, report_data):
+        started, trace = time.perf_counter(), {}
+        content = self._precomputed_section(section_name, analysis_result, report_data, trace)
+        if content is None and section_name in SNIPPET_SECTIONS:
+            content = self._compose_from_snippets(section_name, analysis_result, trace)
+        if content is not None:
+            yield content
+        else:
+            yield from self._stream_section_content(
+                section_name, analysis_result, chunks, trace
+            )
+        self._record_section(report_data, section_name, trace, started)
+
+    async def _astream_resolved_section(self, section_name, analysis_result, chunks, report_data):
+        started, trace = time.perf_counter(), {}
+        content = self._precomputed_section(section_name, analysis_result, report_data, trace)
+        if content is None and section_name in SNIPPET_SECTIONS:
+            content = await self._acompose_from_snippets(section_name, analysis_result, trace)
+        if content is not None:
+            yield content
+        else:
+            async for chunk in self._astream_section_content(
+                section_name, analysis_result, chunks, trace
+            ):
+                yield chunk
+        self._record_section(report_data, section_name, trace, started)
 
-    def generate_report(self, analysis_result, retrieved_docs, metadata=None):
+    def generate_report(self, analysis_result, retrieved_docs=None, metadata=None):
         try:
             logger.info("开始生成安全评估报告")
 
             if metadata is None:
                 metadata = {}
 
-            report_id = f"REPORT-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            # 未传入检索结果时直接读取预计算的隐患法规映射表
+            if retrieved_docs is None and self.regulation_map is not None:
+                retrieved_docs = self.regulation_map.lookup_for_analysis(analysis_result)
 
-            report_data = {
-                "report_id": report_id,
-                "title": metadata.get("title", self.report_template["title"]),
-                "company": metadata.get("company", ""),
-                "generate_date": metadata.get(
-                    "date", datetime.now().strftime("%Y年%m月%d日")
-                ),
-                "sections": {},
-            }
+            report_data = self._new_report_data(metadata)
+            chunks = self.context_builder.dedupe_chunks(retrieved_docs)
 
             hazards = analysis_result.get("hazards", [])
             if not hazards:
@@ -65,8 +395,8 @@ class ReportGenerator:
                 report_data["overall_risk"] = overall_risk
 
                 for section in self.report_template["sections"]:
-                    content = self._generate_section_content(
-                        section, analysis_result, retrieved_docs
+                    content = self._resolve_section(
+                        section, analysis_result, chunks, report_data
                     )
                     report_data["sections"][section] = content
 
@@ -77,15 +407,296 @@ class ReportGenerator:
             logger.error(f"报告生成失败: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def _calculate_overall_risk(self, hazards):
-        risk_scores = {"high": 3, "medium": 2, "low": 1}
-        total_score = 0
+    async def agenerate_report(self, analysis_result, retrieved_docs=None, metadata=None):
+        """generate_report 的异步版本，各章节通过 ainvoke 并发生成，章节顺序与模板一致"""
+        try:
+            logger.info("开始生成安全评估报告")
 
-        for hazard in hazards:
-            severity = hazard.get("severity", "low")
-            total_score += risk_scores.get(severity, 1)
+            if metadata is None:
+                metadata = {}
 
-        avg_score = total_score / len(hazards) if hazards else 0
+            if retrieved_docs is None and self.regulation_map is not None:
+                retrieved_docs = await asyncio.to_thread(
+                    self.regulation_map.lookup_for_analysis, analysis_result
+                )
+
+            report_data = self._new_report_data(metadata)
+            chunks = self.context_builder.dedupe_chunks(retrieved_docs)
+
+            hazards = analysis_result.get("hazards", [])
+            if not hazards:
+                report_data["sections"]["隐患概述"] = "未检测到明显安全隐患"
+                report_data["overall_risk"] = "low"
+            else:
+                report_data["overall_risk"] = self._calculate_overall_risk(hazards)
+
+                sections = self.report_template["sections"]
+                contents = await asyncio.gather(*[
+                    self._aresolve_section(section, analysis_result, chunks, report_data)
+                    for section in sections
+                ])
+                report_data["sections"] = dict(zip(sections, contents))
+                self._order_section_trace(report_data, sections)
+
+            logger.info("报告生成完成")
+            return report_data
+
+        except Exception as e:
+            logger.error(f"报告生成失败: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def stream_report(self, analysis_result, retrieved_docs=None, metadata=None):
+        """
+        流式生成报告，按模板顺序逐章节产出事件:
+          {"event": "start", "report": 报告数据}            报告头与整体风险，章节为空
+          {"event": "token", "section": 章节名, "content": 文本片段}
+          {"event": "section", "section": 章节名, "content": 完整章节内容}
+          {"event": "done", "report": 报告数据}
+        出错时产出 {"event": "error", "error": 错误信息}
+        """
+        try:
+            logger.info("开始流式生成安全评估报告")
+
+            if metadata is None:
+                metadata = {}
+
+            if retrieved_docs is None and self.regulation_map is not None:
+                retrieved_docs = self.regulation_map.lookup_for_analysis(analysis_result)
+
+            report_data = self._new_report_data(metadata)
+            chunks = self.context_builder.dedupe_chunks(retrieved_docs)
+            hazards = analysis_result.get("hazards", [])
+            report_data["overall_risk"] = self._calculate_overall_risk(hazards) if hazards else "low"
+            yield {"event": "start", "report": report_data}
+
+            if not hazards:
+                content = "未检测到明显安全隐患"
+                report_data["sections"]["隐患概述"] = content
+                yield {"event": "section", "section": "隐患概述", "content": content}
+            else:
+                for section in self.report_template["sections"]:
+                    parts = []
+                    for chunk in self._stream_resolved_section(
+                        section, analysis_result, chunks, report_data
+                    ):
+                        parts.append(chunk)
+                        yield {"event": "token", "section": section, "content": chunk}
+                    content = "".join(parts)
+                    report_data["sections"][section] = content
+                    yield {"event": "section", "section": section, "content": content}
+
+            logger.info("报告生成完成")
+            yield {"event": "done", "report": report_data}
+
+        except Exception as e:
+            logger.error(f"报告生成失败: {str(e)}")
+            yield {"event": "error", "error": str(e)}
+
+    async def astream_report(self, analysis_result, retrieved_docs=None, metadata=None):
+        """
+        stream_report 的异步版本：各章节并发生成，token 事件按到达顺序交错产出
+        （以 section 字段区分章节），最终报告中的章节顺序与模板一致
+        """
+        try:
+            logger.info("开始流式生成安全评估报告")
+
+            if metadata is None:
+                metadata = {}
+
+            if retrieved_docs is None and self.regulation_map is not None:
+                retrieved_docs = await asyncio.to_thread(
+                    self.regulation_map.lookup_for_analysis, analysis_result
+                )
+
+            report_data = self._new_report_data(metadata)
+            chunks = self.context_builder.dedupe_chunks(retrieved_docs)
+            hazards = analysis_result.get("hazards", [])
+            report_data["overall_risk"] = self._calculate_overall_risk(hazards) if hazards else "low"
+            yield {"event": "start", "report": report_data}
+
+            if not hazards:
+                content = "未检测到明显安全隐患"
+                report_data["sections"]["隐患概述"] = content
+                yield {"event": "section", "section": "隐患概述", "content": content}
+            else:
+                sections = self.report_template["sections"]
+                queue = asyncio.Queue()
+                contents = {}
+
+                async def run_section(section):
+                    parts = []
+                    try:
+                        async for chunk in self._astream_resolved_section(
+                            section, analysis_result, chunks, report_data
+                        ):
+                            parts.append(chunk)
+                            await queue.put({"event": "token", "section": section, "content": chunk})
+                    except Exception as e:
+                        # 交给消费方抛出，与同步版本一样以 error 事件结束，不产出残缺章节
+                        await queue.put({"event": "failed", "section": section, "exception": e})
+                        return
+                    contents[section] = "".join(parts)
+                    await queue.put({"event": "section", "section": section, "content": contents[section]})
+
+                tasks = [asyncio.create_task(run_section(section)) for section in sections]
+                try:
+                    finished = 0
+                    while finished < len(sections):
+                        event = await queue.get()
+                        if event["event"] == "failed":
+                            raise event["exception"]
+                        if event["event"] == "section":
+                            finished += 1
+                        yield event
+                finally:
+                    for task in tasks:
+                        task.cancel()
+
+                report_data["sections"] = {section: contents[section] for section in sections}
+                self._order_section_trace(report_data, sections)
+
+            logger.info("报告生成完成")
+            yield {"event": "done", "report": report_data}
+
+        except Exception as e:
+            logger.error(f"报告生成失败: {str(e)}")
+            yield {"event": "error", "error": str(e)}
+
+    def _finish_batch_report(self, report_data, merged_analysis):
+        if report_data.get("success") is False:
+            return report_data
+        report_data["photo_count"] = merged_analysis.get("photo_count", 0)
+        report_data["risk_score"] = merged_analysis.get("risk_score", 0.0)
+        if merged_analysis.get("hazards"):
+            report_data["sections"]["隐患照片索引"] = format_evidence_section(merged_analysis["hazards"])
+        return report_data
+
+    def generate_batch_report(self, merged_analysis, retrieved_docs=None, metadata=None, previous=None):
+        """
+        为一轮巡检生成汇总报告
+
+        Args:
+            merged_analysis: inspection.merge_analyses 合并后的分析结果，
+                各章节按去重后的隐患生成一次，大模型调用量与照片数无关
+            previous: 用户选定的同一工地巡检轮次基准报告，提供时按复查报告生成
+
+        Returns:
+            报告数据，附加 photo_count、risk_score 与“隐患照片索引”章节
+        """
+        if not merged_analysis.get("success"):
+            return {"success": False, "error": merged_analysis.get("error", "巡检照片分析失败")}
+        metadata = dict(metadata or {}, scope="round")
+        if previous:
+            report_data = self.generate_reinspection_report(merged_analysis, previous, retrieved_docs, metadata)
+        else:
+            report_data = self.generate_report(merged_analysis, retrieved_docs, metadata)
+        return self._finish_batch_report(report_data, merged_analysis)
+
+    async def agenerate_batch_report(self, merged_analysis, retrieved_docs=None, metadata=None):
+        """generate_batch_report 的异步版本"""
+        if not merged_analysis.get("success"):
+            return {"success": False, "error": merged_analysis.get("error", "巡检照片分析失败")}
+        metadata = dict(metadata or {}, scope="round")
+        report_data = await self.agenerate_report(merged_analysis, retrieved_docs, metadata)
+        return self._finish_batch_report(report_data, merged_analysis)
+
+    def generate_reinspection_report(self, analysis_result, previous, retrieved_docs=None, metadata=None):
+        """
+        复查报告：与用户选定的基准报告对比，只为新增或等级变化的隐患调用大模型
+
+        规则章节与措施片段章节按本次全部隐患生成（仍存在的隐患命中片段缓存）；
+        其余章节只针对新增/变化的隐患生成，并注明仍存在的隐患；没有新增/变化时沿用上次的章节内容
+        （有隐患已整改时改为列出仍存在的隐患）。
+        报告末尾附“复查对比”章节，列出已整改与新增的隐患
+
+        基准报告须与本次检查范围相同（单张照片对单张照片、巡检轮次对巡检轮次）；
+        本次照片不完整时，基准报告中本次未出现的隐患列为“本次未覆盖”，不判定为已整改
+
+        Args:
+            previous: ReportStore.reinspection_baseline 返回的基准报告
+        """
+        try:
+            scope = (metadata or {}).get("scope", "single")
+            if report_scope(previous) != scope:
+                return {
+                    "success": False,
+                    "error": f"基准报告为{SCOPE_LABELS[report_scope(previous)]}，"
+                             f"与本次{SCOPE_LABELS[scope]}范围不一致，无法复查对比",
+                }
+            logger.info(f"开始生成复查报告（对比 {previous['report_id']}）")
+
+            if retrieved_docs is None and self.regulation_map is not None:
+                retrieved_docs = self.regulation_map.lookup_for_analysis(analysis_result)
+
+            report_data = self._new_report_data(metadata or {})
+            chunks = self.context_builder.dedupe_chunks(retrieved_docs)
+            hazards = analysis_result.get("hazards", [])
+            report_data["overall_risk"] = self._calculate_overall_risk(hazards) if hazards else "low"
+            report_data["previous_report_id"] = previous["report_id"]
+
+            complete = covers_baseline(previous, analysis_result)
+            diff = diff_hazards(previous.get("hazards", []), hazards, complete=complete)
+            report_data["reinspection_complete"] = complete
+            report_data["inspection_diff"] = {kind: len(items) for kind, items in diff.items()}
+            delta = dict(analysis_result, hazards=diff["new"] + diff["changed"])
+            carried_note = ""
+            if diff["carried"]:
+                carried_note = (
+                    f"\n\n**仍未整改的隐患**（详见上次检查报告 {previous['report_id']}）："
+                    + "、".join(hazard_key(hazard) for hazard in diff["carried"])
+                )
+            # 只有整改、没有新增时，上次的章节内容会提到已整改的隐患，改为列出仍存在的隐患
+            carried_summary = (
+                f"本次复查未发现新增或等级变化的隐患，以下隐患仍未整改（详见上次检查报告 {previous['report_id']}）：\n"
+                + "\n".join(
+                    f"{i}. **{hazard_key(hazard)}**（{RISK_LEVELS[hazard['severity']]['label']}）"
+                    + (f"：{hazard.get('location', '')} {hazard.get('description', '')}".rstrip()
+                       if hazard.get("location") or hazard.get("description") else "")
+                    for i, hazard in enumerate(diff["carried"], 1)
+                )
+                + (
+                    "\n\n以下隐患本次照片未覆盖，无法确认是否整改："
+                    + "、".join(hazard_key(hazard) for hazard in diff["unverified"])
+                    if diff["unverified"] else ""
+                )
+            )
+
+            if hazards:
+                for section in self.report_template["sections"]:
+                    previous_content = previous.get("sections", {}).get(section)
+                    full_analysis = (
+                        section in SNIPPET_SECTIONS
+                        or self._rule_section(section, analysis_result, report_data["overall_risk"]) is not None
+                    )
+                    if full_analysis:
+                        content = self._resolve_section(section, analysis_result, chunks, report_data)
+                    elif delta["hazards"]:
+                        content = self._resolve_section(section, delta, chunks, report_data) + carried_note
+                    elif diff["resolved"] or diff["unverified"] or (
+                        previous_content and not previous_content.endswith("生成失败")
+                    ):
+                        started = time.perf_counter()
+                        content = carried_summary if diff["resolved"] or diff["unverified"] else previous_content
+                        self._record_section(report_data, section, {"source": "history"}, started)
+                    else:
+                        content = self._resolve_section(section, analysis_result, chunks, report_data)
+                    report_data["sections"][section] = content
+            else:
+                report_data["sections"]["隐患概述"] = "未检测到明显安全隐患"
+
+            report_data["sections"]["复查对比"] = format_diff_section(diff, previous)
+            logger.info(
+                f"复查报告生成完成：新增 {len(diff['new'])}，变化 {len(diff['changed'])}，"
+                f"仍存在 {len(diff['carried'])}，已整改 {len(diff['resolved'])}，未覆盖 {len(diff['unverified'])}"
+            )
+            return report_data
+
+        except Exception as e:
+            logger.error(f"报告生成失败: {str(e)}")
+            return {"success": False, "error": str(e)}
+
+    def _calculate_overall_risk(self, hazards):
+        avg_score = risk_score(hazards)
 
         if avg_score >= 2.5:
             return "high"
@@ -94,22 +705,59 @@ class ReportGenerator:
         else:
             return "low"
 
-    def _generate_section_content(self, section_name, analysis_result, retrieved_docs):
-        cache_key = f"report_section_{hash(section_name)}_{hash(str(analysis_result))}"
-        cached_content = CacheUtils.get(cache_key)
-        if cached_content:
-            return cached_content
+    def _section_cache_key(self, section_name, analysis_result):
+        return f"report_section_{hash(section_name)}_{hash(str(analysis_result))}"
+
+    def _prepare_section(self, section_name, analysis_result, chunks, trace):
+        """构建章节的提示词输入与调用链，记录估算的输入token数与所用模型档位"""
+        inputs, context_stats = self.context_builder.build(section_name, analysis_result, chunks)
+        template = self._get_section_prompt(section_name)
+        if inputs["regulations"]:
+            template += "\n\n参考规范条文：\n{regulations}"
+        input_tokens = context_stats["input_tokens"] + estimate_tokens(template)
+        tier, model = self._generation_policy(section_name, len(analysis_result.get("hazards", [])))
+        trace["input_tokens"] = input_tokens
+        trace["tier"] = tier
+        logger.info(
+            f"章节 {section_name} 输入约 {input_tokens} tokens"
+            f"（法规片段 {context_stats['regulation_chunks']}/{len(chunks)} 个，模型档位 {tier}）"
+        )
+        chain = ChatPromptTemplate.from_template(template) | model
+        return chain, inputs
 
-        hazards = analysis_result.get("hazards", [])
-        summary = analysis_result.get("summary", "")
+    def _generate_section_content(self, section_name, analysis_result, chunks, trace=None):
+        cache_key = self._section_cache_key(section_name, analysis_result)
+        trace = {} if trace is None else trace
+        trace["source"] = "llm"
+        chain, inputs = self._prepare_section(section_name, analysis_result, chunks, trace)
 
-        prompt_template = self._get_section_prompt(section_name)
+        started = time.perf_counter()
+        try:
+            message = chain.invoke(inputs)
+            content = message.content
+            self._record_llm_call(
+                trace["tier"], started, *self._message_usage(message, content, trace["input_tokens"])
+            )
 
-        prompt = ChatPromptTemplate.from_template(prompt_template)
-        chain = prompt | self.model | StrOutputParser()
+            CacheUtils.set(cache_key, content)
+            return content
+        except Exception as e:
+            logger.warning(f"生成章节 {section_name} 失败: {e}")
+            return f"{section_name}生成失败"
 
+    async def _agenerate_section_content(self, section_name, analysis_result, chunks, trace=None):
+        cache_key = self._section_cache_key(section_name, analysis_result)
+        trace = {} if trace is None else trace
+        trace["source"] = "llm"
+        chain, inputs = self._prepare_section(section_name, analysis_result, chunks, trace)
+
+        started = time.perf_counter()
         try:
-            content = chain.invoke({"hazards": hazards, "summary": summary})
+            message = await chain.ainvoke(inputs)
+            content = message.content
+            self._record_llm_call(
+                trace["tier"], started, *self._message_usage(message, content, trace["input_tokens"])
+            )
 
             CacheUtils.set(cache_key, content)
             return content
@@ -117,14 +765,65 @@ class ReportGenerator:
             logger.warning(f"生成章节 {section_name} 失败: {e}")
             return f"{section_name}生成失败"
 
+    def _stream_section_content(self, section_name, analysis_result, chunks, trace=None):
+        """调用大模型逐段产出章节文本"""
+        cache_key = self._section_cache_key(section_name, analysis_result)
+        trace = {} if trace is None else trace
+        trace["source"] = "llm"
+        chain, inputs = self._prepare_section(section_name, analysis_result, chunks, trace)
+        started = time.perf_counter()
+        message, parts = None, []
+        try:
+            for chunk in chain.stream(inputs):
+                message = chunk if message is None else message + chunk
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            logger.warning(f"生成章节 {section_name} 失败: {e}")
+            if not parts:
+                yield f"{section_name}生成失败"
+            return
+
+        content = "".join(parts)
+        self._record_llm_call(
+            trace["tier"], started, *self._message_usage(message, content, trace["input_tokens"])
+        )
+        CacheUtils.set(cache_key, content)
+
+    async def _astream_section_content(self, section_name, analysis_result, chunks, trace=None):
+        cache_key = self._section_cache_key(section_name, analysis_result)
+        trace = {} if trace is None else trace
+        trace["source"] = "llm"
+        chain, inputs = self._prepare_section(section_name, analysis_result, chunks, trace)
+        started = time.perf_counter()
+        message, parts = None, []
+        try:
+            async for chunk in chain.astream(inputs):
+                message = chunk if message is None else message + chunk
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield chunk.content
+        except Exception as e:
+            logger.warning(f"生成章节 {section_name} 失败: {e}")
+            if not parts:
+                yield f"{section_name}生成失败"
+            return
+
+        content = "".join(parts)
+        self._record_llm_call(
+            trace["tier"], started, *self._message_usage(message, content, trace["input_tokens"])
+        )
+        CacheUtils.set(cache_key, content)
+
     def _get_section_prompt(self, section_name):
         prompts = {
-            "隐患概述": "请根据以下隐患信息，生成简洁的隐患概述，不超过300字。\n\n隐患信息：{hazards}",
-            "风险等级评估": "请根据以下隐患信息，进行风险等级评估。\n\n隐患列表：{hazards}",
-            "隐患详细描述": "请详细描述以下安全隐患。\n\n隐患信息：{hazards}",
-            "整改建议": "请根据以下隐患信息，提出整改建议。\n\n隐患信息：{hazards}",
-            "预防措施": "请根据以下隐患信息，提出预防措施。\n\n隐患信息：{hazards}",
-            "相关法规依据": "请列出与以下隐患相关的建筑施工安全法规。\n\n隐患信息：{hazards}",
+            "隐患概述": "请根据以下隐患信息，生成简洁的隐患概述，不超过300字。\n\n隐患信息：\n{hazards}",
+            "风险等级评估": "请根据以下隐患信息，进行风险等级评估。\n\n隐患列表：\n{hazards}",
+            "隐患详细描述": "请详细描述以下安全隐患。\n\n隐患信息：\n{hazards}",
+            "整改建议": "请根据以下隐患信息，提出整改建议。\n\n隐患信息：\n{hazards}",
+            "预防措施": "请根据以下隐患信息，提出预防措施。\n\n隐患信息：\n{hazards}",
+            "相关法规依据": "请列出与以下隐患相关的建筑施工安全法规。\n\n隐患信息：\n{hazards}",
         }
         return prompts.get(section_name, "请根据以下信息生成内容：\n{hazards}")
 
@@ -0,0 +1,130 @@
+"""
+报告章节提示词上下文
+将隐患列表压缩为紧凑的文本行，法规片段去重后按各章节的token预算装填，
+token数由本地估算，不依赖模型的分词器
+"""
+
+import math
+import os
+import re
+
+from src.core.config import DEFAULT_CONFIG, RISK_LEVELS
+
+_CJK_PATTERN = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uff00-\uffef]")
+_SPACE_PATTERN = re.compile(r"\s+")
+
+
+def estimate_tokens(text):
+    """
+    估算文本的token数
+
+    中日韩字符及全角标点每字计1个token（通义千问分词器下为偏保守的上界），
+    其余非空白字符按每4个字符1个token计
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK_PATTERN.findall(text))
+    others = len(_SPACE_PATTERN.sub("", text)) - cjk
+    return cjk + math.ceil(others / 4)
+
+
+def serialize_hazards(hazards, description_chars=None):
+    """隐患列表序列化为每条一行：序号. [风险等级] 类型｜位置｜描述（｜巡检汇总时的照片数）"""
+    description_chars = description_chars or DEFAULT_CONFIG["report_hazard_description_chars"]
+    lines = []
+    for i, hazard in enumerate(hazards, 1):
+        severity = RISK_LEVELS.get(hazard.get("severity"), RISK_LEVELS["low"])["label"]
+        fields = [(hazard.get("hazard_type") or "未知隐患").strip()]
+        if hazard.get("location"):
+            fields.append(str(hazard["location"]).strip())
+        description = _SPACE_PATTERN.sub(" ", str(hazard.get("description") or "")).strip()
+        if description:
+            if len(description) > description_chars:
+                description = description[:description_chars] + "…"
+            fields.append(description)
+        if hazard.get("photo_count", 1) > 1:
+            fields.append(f"见于{hazard['photo_count']}张照片")
+        lines.append(f"{i}. [{severity}] " + "｜".join(fields))
+    return "\n".join(lines) or "未发现隐患"
+
+
+def _doc_text_and_source(doc):
+    if isinstance(doc, dict):
+        return doc.get("page_content") or doc.get("content", ""), doc.get("metadata", {}).get("source", "")
+    if isinstance(doc, str):
+        return doc, ""
+    return doc.page_content, (getattr(doc, "metadata", None) or {}).get("source", "")
+
+
+class ReportContextBuilder:
+    """按章节构建提示词输入，法规片段按检索顺序（相关度）装填直到用完预算"""
+
+    def __init__(self, budgets=None, default_budget=None, description_chars=None):
+        self.budgets = budgets if budgets is not None else DEFAULT_CONFIG["report_context_budgets"]
+        self.default_budget = (
+            default_budget if default_budget is not None else DEFAULT_CONFIG["report_context_default_budget"]
+        )
+        self.description_chars = description_chars or DEFAULT_CONFIG["report_hazard_description_chars"]
+
+    def budget_for(self, section_name):
+        return self.budgets.get(section_name, self.default_budget)
+
+    @staticmethod
+    def dedupe_chunks(retrieved_docs):
+        """
+        去除重复的规范片段：空白归一化后内容相同，或被已保留片段完整包含的片段
+
+        Returns:
+            [(片段文本, 来源文件名), ...]，保持原有顺序
+        """
+        chunks = []
+        for doc in retrieved_docs or []:
+            text, source = _doc_text_and_source(doc)
+            text = _SPACE_PATTERN.sub(" ", text or "").strip()
+            if not text:
+                continue
+            if any(text in kept for kept, _ in chunks):
+                continue
+            # 新片段包含已保留的较短片段时以新片段替换
+            chunks = [(kept, kept_source) for kept, kept_source in chunks if kept not in text]
+            chunks.append((text, os.path.basename(source) if source else ""))
+        return chunks
+
+    def pack_chunks(self, chunks, budget):
+        """
+        在预算内装填片段，放不下的片段跳过，继续尝试后续较短的片段
+
+        Returns:
+            (法规文本, 使用的片段数)
+        """
+        if budget <= 0:
+            return "", 0
+        lines, used = [], 0
+        for text, source in chunks:
+            line = f"- {text}（{source}）" if source else f"- {text}"
+            tokens = estimate_tokens(line)
+            if used + tokens > budget:
+                continue
+            lines.append(line)
+            used += tokens
+        return "\n".join(lines), len(lines)
+
+    def build(self, section_name, analysis_result, chunks):
+        """
+        构建章节提示词的输入
+
+        Args:
+            chunks: dedupe_chunks 的结果，同一份报告的各章节共用
+
+        Returns:
+            (提示词输入, {"input_tokens": 估算的输入token数, "regulation_chunks": 使用的法规片段数})
+        """
+        hazards = serialize_hazards(analysis_result.get("hazards", []), self.description_chars)
+        regulations, num_chunks = self.pack_chunks(chunks, self.budget_for(section_name))
+        # 只包含章节模板实际引用的变量，token估算与发送给模型的内容一致
+        inputs = {"hazards": hazards, "regulations": regulations}
+        stats = {
+            "input_tokens": sum(estimate_tokens(value) for value in inputs.values()),
+            "regulation_chunks": num_chunks,
+        }
+        return inputs, stats
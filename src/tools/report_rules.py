@@ -0,0 +1,111 @@
+"""
+报告规则引擎
+可由确定性规则回答的报告章节直接生成，无需调用大模型:
+  风险等级评估  由整体风险计算结果与风险等级配置生成
+  整改建议      全部隐患均可归入常见隐患类别时，由整改要求库生成
+  相关法规依据  全部隐患均可归入常见隐患类别时，由法规依据库生成
+"""
+
+from src.core.config import HAZARD_REMEDIATION, RISK_LEVELS
+from src.core.utils import RoutingUtils
+
+
+class ReportRuleEngine:
+    """报告章节规则引擎"""
+
+    def __init__(self, library=None):
+        self.library = library or HAZARD_REMEDIATION
+        self._builders = {
+            "风险等级评估": self._risk_assessment,
+            "整改建议": self._remediation,
+            "相关法规依据": self._regulations,
+        }
+
+    def canonical_category(self, hazard):
+        """
+        隐患的规范类别（取隐患类型命中的第一个类别），无法归类时返回None
+
+        巡检合并后的隐患优先按其 category 归类，与跨照片去重的结果一致
+        """
+        categories = RoutingUtils.canonicalize_hazard(hazard.get("category") or hazard.get("hazard_type", ""))
+        return categories[0] if categories else None
+
+    def _library_entries(self, hazards):
+        """全部隐患均能在库中找到时返回 [(隐患, 类别)]，否则返回None"""
+        entries = []
+        for hazard in hazards:
+            category = self.canonical_category(hazard)
+            if category not in self.library:
+                return None
+            entries.append((hazard, category))
+        return entries
+
+    def build_section(self, section_name, hazards, overall_risk):
+        """
+        尝试用规则生成章节
+
+        Returns:
+            章节内容；规则无法确定时返回None，由大模型生成
+        """
+        builder = self._builders.get(section_name)
+        if builder is None or not hazards:
+            return None
+        return builder(hazards, overall_risk)
+
+    def _risk_assessment(self, hazards, overall_risk):
+        overall = RISK_LEVELS.get(overall_risk, RISK_LEVELS["low"])
+        counts = {}
+        for hazard in hazards:
+            severity = hazard.get("severity", "low")
+            counts[severity] = counts.get(severity, 0) + 1
+
+        lines = [
+            f"本次检查共发现安全隐患 {len(hazards)} 项，整体风险等级为**{overall['label']}**，"
+            f"处置要求：{overall['description']}。",
+            "",
+            "风险分布：" + "，".join(
+                f"{info['label']} {counts[level]} 项"
+                for level, info in RISK_LEVELS.items()
+                if counts.get(level)
+            ),
+            "",
+        ]
+        for i, hazard in enumerate(hazards, 1):
+            info = RISK_LEVELS.get(hazard.get("severity", "low"), RISK_LEVELS["low"])
+            lines.append(
+                f"{i}. {hazard.get('hazard_type', '未知隐患')}（{hazard.get('location', '位置未注明')}）"
+                f"：{info['label']}，{info['description']}"
+            )
+        return "\n".join(lines)
+
+    def _remediation(self, hazards, overall_risk):
+        entries = self._library_entries(hazards)
+        if entries is None:
+            return None
+
+        # 同一类别多处出现时按最高严重程度确定整改时限
+        rank = {level: i for i, level in enumerate(RISK_LEVELS)}
+        severities = {}
+        for hazard, category in entries:
+            severity = hazard.get("severity", "low")
+            if severity not in rank:
+                severity = "low"
+            if category not in severities or rank[severity] < rank[severities[category]]:
+                severities[category] = severity
+
+        return "\n".join(
+            f"{i}. **{category}**（{RISK_LEVELS[severity]['description']}）：{self.library[category]['remediation']}"
+            for i, (category, severity) in enumerate(severities.items(), 1)
+        )
+
+    def _regulations(self, hazards, overall_risk):
+        entries = self._library_entries(hazards)
+        if entries is None:
+            return None
+
+        regulations = []
+        for _, category in entries:
+            for regulation in self.library[category]["regulations"]:
+                if regulation not in regulations:
+                    regulations.append(regulation)
+        return "\n".join(f"{i}. {regulation}" for i, regulation in enumerate(regulations, 1))
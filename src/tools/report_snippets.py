@@ -0,0 +1,90 @@
+"""
+隐患措施片段缓存
+按“规范隐患类型 + 严重程度”缓存单项隐患的整改措施与预防措施，
+报告中的整改建议、预防措施章节由这些片段拼装，不同报告之间可复用
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.logging import getLogger
+
+logger = getLogger(__name__)
+
+# 由片段拼装的章节 -> 片段类型
+SNIPPET_SECTIONS = {
+    "整改建议": "remediation",
+    "预防措施": "prevention",
+}
+
+SNIPPET_PROMPTS = {
+    "remediation": (
+        "请针对以下一类建筑施工安全隐患，给出通用的整改措施，100字以内，直接输出措施内容，不要编号和标题。\n\n"
+        "隐患类型：{hazard_type}\n严重程度：{severity}\n示例描述：{description}"
+    ),
+    "prevention": (
+        "请针对以下一类建筑施工安全隐患，给出通用的预防措施，100字以内，直接输出措施内容，不要编号和标题。\n\n"
+        "隐患类型：{hazard_type}\n严重程度：{severity}\n示例描述：{description}"
+    ),
+}
+
+
+class SnippetCache:
+    """措施片段缓存，超过上限时淘汰最久未使用的片段，内容持久化到JSON文件"""
+
+    def __init__(self, path=None, max_entries=None):
+        self.path = Path(path or DEFAULT_CONFIG["report_snippet_cache"])
+        self.max_entries = max_entries or DEFAULT_CONFIG["report_snippet_max_entries"]
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._load()
+
+    @staticmethod
+    def make_key(kind, hazard_type, severity):
+        return f"{kind}|{hazard_type}|{severity}"
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._entries.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"措施片段缓存读取失败: {e}")
+
+    def _save(self):
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(".tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False)
+            tmp_path.replace(self.path)
+        except Exception as e:
+            logger.warning(f"措施片段缓存写入失败: {e}")
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def set_many(self, items):
+        """批量写入片段并持久化一次"""
+        if not items:
+            return
+        with self._lock:
+            for key, text in items.items():
+                self._entries[key] = text
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._save()
@@ -0,0 +1,239 @@
+"""
+报告存储
+生成的报告写入SQLite后不再改动，历史报告的查看与导出直接读取存储，无需重新生成；
+按工地/项目编号、公司、日期、整体风险等级和隐患类型建立索引，供历史报告查询使用
+"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.logging import getLogger
+from src.core.utils import RoutingUtils
+from src.tools.inspection import report_scope
+
+logger = getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS reports (
+    report_id TEXT PRIMARY KEY,
+    site_id TEXT NOT NULL DEFAULT '',
+    company TEXT NOT NULL DEFAULT '',
+    title TEXT NOT NULL,
+    report_date TEXT NOT NULL,
+    overall_risk TEXT NOT NULL,
+    hazard_count INTEGER NOT NULL DEFAULT 0,
+    report_json TEXT NOT NULL,
+    hazards_json TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_reports_site ON reports (site_id, report_date);
+CREATE INDEX IF NOT EXISTS idx_reports_company ON reports (company, report_date);
+CREATE INDEX IF NOT EXISTS idx_reports_risk ON reports (overall_risk, report_date);
+CREATE INDEX IF NOT EXISTS idx_reports_date ON reports (report_date);
+
+CREATE TABLE IF NOT EXISTS report_hazards (
+    report_id TEXT NOT NULL REFERENCES reports (report_id) ON DELETE CASCADE,
+    hazard_type TEXT NOT NULL,
+    severity TEXT NOT NULL,
+    PRIMARY KEY (report_id, hazard_type, severity)
+);
+CREATE INDEX IF NOT EXISTS idx_report_hazards_type ON report_hazards (hazard_type, report_id);
+"""
+
+_SUMMARY_COLUMNS = "report_id, site_id, company, title, report_date, overall_risk, hazard_count, created_at"
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _hazard_types(hazard_type):
+    """隐患类型索引值：能归入规范类别的按类别索引，否则按原始类型"""
+    hazard_type = (hazard_type or "").strip()
+    return RoutingUtils.canonicalize_hazard(hazard_type) or ([hazard_type] if hazard_type else [])
+
+
+class ReportStore:
+    """报告存储，报告按 report_id 只写入一次"""
+
+    def __init__(self, db_path=None):
+        self.db_path = Path(db_path or DEFAULT_CONFIG["report_store_db"])
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    def save(self, report_data, analysis_result=None):
+        """
+        保存报告及其隐患列表
+
+        Returns:
+            {"success": True, "report_id": ...}；报告已存在时不覆盖，返回 {"success": False, "error": ...}
+        """
+        if report_data.get("success") is False:
+            return {"success": False, "error": "报告生成失败，不保存"}
+
+        hazards = (analysis_result or {}).get("hazards", [])
+        report_id = report_data["report_id"]
+        generated_at = report_data.get("generated_at") or _now()
+        # 巡检合并后的隐患 hazard_type 为模型原始表述，另按其 category 建索引
+        index_rows = {
+            (hazard_type, hazard.get("severity", "low"))
+            for hazard in hazards
+            for hazard_type in _hazard_types(hazard.get("hazard_type")) + [hazard.get("category")]
+            if hazard_type
+        }
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    f"INSERT INTO reports ({_SUMMARY_COLUMNS}, report_json, hazards_json) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        report_id,
+                        report_data.get("site_id", ""),
+                        report_data.get("company", ""),
+                        report_data.get("title", ""),
+                        generated_at[:10],
+                        report_data.get("overall_risk", "low"),
+                        len(hazards),
+                        _now(),
+                        json.dumps(report_data, ensure_ascii=False),
+                        json.dumps(hazards, ensure_ascii=False),
+                    ),
+                )
+                conn.executemany(
+                    "INSERT INTO report_hazards (report_id, hazard_type, severity) VALUES (?, ?, ?)",
+                    [(report_id, hazard_type, severity) for hazard_type, severity in sorted(index_rows)],
+                )
+        except sqlite3.IntegrityError:
+            return {"success": False, "error": f"报告 {report_id} 已存在"}
+
+        logger.info(f"报告已保存: {report_id}")
+        return {"success": True, "report_id": report_id}
+
+    def get(self, report_id):
+        """读取完整报告数据，不存在时返回None"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT report_json FROM reports WHERE report_id = ?", (report_id,)
+            ).fetchone()
+        return json.loads(row["report_json"]) if row else None
+
+    def get_hazards(self, report_id):
+        """读取报告对应的隐患列表"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT hazards_json FROM reports WHERE report_id = ?", (report_id,)
+            ).fetchone()
+        return json.loads(row["hazards_json"]) if row else []
+
+    def query(self, site_id=None, company=None, date_from=None, date_to=None,
+              overall_risk=None, hazard_type=None, limit=50):
+        """
+        按条件查询报告摘要，新报告在前
+
+        Args:
+            date_from/date_to: "YYYY-MM-DD"，包含边界
+            overall_risk: high/medium/low
+            hazard_type: 隐患类型，先归入规范类别再匹配
+
+        Returns:
+            报告摘要列表（不含章节内容），完整报告用 get() 读取
+        """
+        conditions, params = [], []
+        if site_id:
+            conditions.append("r.site_id = ?")
+            params.append(site_id)
+        if company:
+            conditions.append("r.company = ?")
+            params.append(company)
+        if date_from:
+            conditions.append("r.report_date >= ?")
+            params.append(str(date_from))
+        if date_to:
+            conditions.append("r.report_date <= ?")
+            params.append(str(date_to))
+        if overall_risk:
+            conditions.append("r.overall_risk = ?")
+            params.append(overall_risk)
+        types = _hazard_types(hazard_type)
+        if types:
+            conditions.append(
+                "r.report_id IN (SELECT report_id FROM report_hazards "
+                f"WHERE hazard_type IN ({', '.join('?' * len(types))}))"
+            )
+            params.extend(types)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        columns = ", ".join(f"r.{name.strip()}" for name in _SUMMARY_COLUMNS.split(","))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {columns} FROM reports r {where} "
+                "ORDER BY r.report_date DESC, r.created_at DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def list_for_site(self, site_id, scope=None, limit=20):
+        """
+        工地的历史报告摘要，供用户选择复查基准，新报告在前
+
+        Args:
+            scope: "single"/"round"，只列出该检查范围的报告（复查只在相同范围之间对比）
+
+        Returns:
+            报告摘要列表，附 scope 与 photo_count
+        """
+        if not site_id:
+            return []
+        results = []
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS}, report_json FROM reports "
+                "WHERE site_id = ? ORDER BY created_at DESC, rowid DESC",
+                (site_id,),
+            )
+            for row in rows:
+                report = json.loads(row["report_json"])
+                row_scope = report_scope(report)
+                if scope and row_scope != scope:
+                    continue
+                summary = {name: row[name] for name in row.keys() if name != "report_json"}
+                summary.update(scope=row_scope, photo_count=report.get("photo_count") or 1)
+                results.append(summary)
+                if len(results) >= limit:
+                    break
+        return results
+
+    def reinspection_baseline(self, report_id):
+        """
+        读取用户选定的复查基准报告
+
+        Returns:
+            报告摘要字段 + scope、photo_count + sections（章节内容）+ hazards（隐患列表），
+            报告不存在时返回None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT {_SUMMARY_COLUMNS}, report_json, hazards_json FROM reports WHERE report_id = ?",
+                (report_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        report = json.loads(row["report_json"])
+        baseline = {name: row[name] for name in row.keys() if not name.endswith("_json")}
+        baseline["scope"] = report_scope(report)
+        baseline["photo_count"] = report.get("photo_count") or 1
+        baseline["sections"] = report.get("sections", {})
+        baseline["hazards"] = json.loads(row["hazards_json"])
+        return baseline
@@ -1,18 +1,31 @@
 """
 知识库检索工具
 处理检索请求、优化查询向量、管理ChromaDB连接
-仅保留安全文件规范集作为唯一知识来源
+安全规范集按专业分片存储，查询时并行检索相关分片后合并结果
+安全规范集支持版本化重建：新版本在后台写入影子集合，完成后原子切换，旧版本保留用于回滚
 """
 
+import json
+import asyncio
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-from langchain_ollama import OllamaEmbeddings
+import chromadb
+from chromadb.config import Settings
 from langchain_chroma import Chroma
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-from src.core.config import DEFAULT_CONFIG
-from src.core.utils import FileUtils, CacheUtils
+from src.core.config import DEFAULT_CONFIG, KB_SHARDS
+from src.core.utils import FileUtils, CacheUtils, RoutingUtils
+from src.core.taxonomy import get_taxonomy
+from src.core.kb_registry import KBRegistry, physical_collection_name
+from src.core.kb_stats import CollectionStats
 from src.core.logging import getLogger
+from src.tools.dedup import NearDuplicateIndex
+from src.tools.embeddings import create_embeddings
 
 logger = getLogger(__name__)
 
@@ -23,133 +36,625 @@ class KnowledgeRetriever:
     def __init__(self, config=None):
         self.config = dict(DEFAULT_CONFIG, **(config or {}))
         self._init_components()
-        logger.info("知识库检索器初始化完成（仅保留安全规范集）")
+        logger.info("知识库检索器初始化完成（安全规范集按专业分片）")
 
     def _init_components(self):
         FileUtils.ensure_dir(self.config["persist_dir"])
 
+        # 当前生效版本、对应嵌入模型与切分参数作为一个整体替换，读者一次取用即可拿到一致的状态
+        self.registry = KBRegistry(self.config["persist_dir"])
+        self.stats = CollectionStats(self.config["persist_dir"])
+        version = self.registry.active
+        build_config = self._build_config(self.registry.version_info(version))
+        self._active = (version, self._create_embeddings(build_config["embedding_model"]), build_config)
+
+        # 所有分片共享同一个客户端，由Chroma按LRU策略限制已加载索引占用的内存
+        settings = Settings(anonymized_telemetry=False)
+        if self.config["chroma_memory_limit_bytes"]:
+            settings.chroma_segment_cache_policy = "LRU"
+            settings.chroma_memory_limit_bytes = self.config["chroma_memory_limit_bytes"]
+        self.client = chromadb.PersistentClient(
+            path=self.config["persist_dir"], settings=settings
+        )
+
+        self.vectorstores = OrderedDict()
+        self._vectorstore_lock = threading.Lock()
+        self._search_executor = None
+        self.dedup_indexes = {}
+        self._version_listeners = []
+        self._version_lock = threading.Lock()
+        self.kb_version = self._load_kb_version()
+
+        self._ingest_lock = threading.RLock()
+        self._rebuild_state = None
+
+    def _build_config(self, overrides=None):
+        """版本构建参数：版本记录中的值优先，缺省时取当前配置"""
+        overrides = overrides or {}
+        return {
+            key: overrides.get(key) or self.config[key]
+            for key in ("embedding_model", "chunk_size", "chunk_overlap")
+        }
+
+    def _create_embeddings(self, model_name):
+        """按 embedding_model 配置创建嵌入模型（Ollama或进程内ONNX后端）"""
         try:
-            self.embeddings = OllamaEmbeddings(model=self.config["embedding_model"])
-            logger.info("嵌入模型初始化成功")
+            embeddings = create_embeddings(model_name, self.config)
+            logger.info(f"嵌入模型初始化成功: {model_name}")
+            return embeddings
         except Exception as e:
-            logger.warning(f"Ollama嵌入模型初始化失败: {e}")
-            self.embeddings = None
+            logger.error(f"嵌入模型初始化失败 ({model_name}): {e}")
+            return None
+
+    @property
+    def embeddings(self):
+        return self._active[1]
 
-        self.vectorstores = {}
-        self._init_default_collections()
+    @property
+    def active_version(self):
+        return self._active[0]
 
-    def _init_default_collections(self):
-        """仅初始化安全规范集合"""
-        for collection_name in ["safe"]:
-            self._get_or_create_vectorstore(collection_name)
+    def _resolve_collections(self, collection_name, query=None, version=None):
+        """
+        将逻辑集合名解析为物理集合列表
 
-    def _get_or_create_vectorstore(self, collection_name):
-        if collection_name in self.vectorstores:
-            return self.vectorstores[collection_name]
+        "safe"表示整个安全规范集：查询语句命中专业关键词时只检索相关分片，
+        否则覆盖全部分片；分片名解析为对应物理集合；其他名称（如项目专属集合）原样使用
+        安全规范集的物理集合名随版本变化，未指定版本时使用当前生效版本
+        """
+        if version is None:
+            version = self.active_version
+        if collection_name == "safe":
+            shards = RoutingUtils.route_shards(query) if query else ["general"]
+            if shards == ["general"]:
+                shards = list(KB_SHARDS)
+            return [
+                physical_collection_name(KB_SHARDS[shard]["collection"], version)
+                for shard in shards
+            ]
+        if collection_name in KB_SHARDS:
+            return [physical_collection_name(KB_SHARDS[collection_name]["collection"], version)]
+        return [collection_name]
+
+    @staticmethod
+    def _is_versioned(collection_name):
+        """集合是否属于安全规范集（整体或单个分片），这些集合随重建切换版本"""
+        return collection_name == "safe" or collection_name in KB_SHARDS
+
+    def _is_building(self):
+        state = self._rebuild_state
+        return bool(state and state["status"] == "building")
+
+    def _get_or_create_vectorstore(self, collection_name, embeddings=None):
+        """按需加载集合，超过上限时淘汰最久未使用的集合"""
+        with self._vectorstore_lock:
+            if collection_name in self.vectorstores:
+                self.vectorstores.move_to_end(collection_name)
+                return self.vectorstores[collection_name]
 
-        if self.embeddings:
             vectorstore = Chroma(
                 collection_name=collection_name,
-                embedding_function=self.embeddings,
-                persist_directory=self.config["persist_dir"],
+                embedding_function=embeddings or self.embeddings,
+                client=self.client,
             )
-        else:
-            vectorstore = Chroma(
-                collection_name=collection_name,
-                persist_directory=self.config["persist_dir"],
+            self.vectorstores[collection_name] = vectorstore
+
+            while len(self.vectorstores) > self.config["max_open_collections"]:
+                evicted, _ = self.vectorstores.popitem(last=False)
+                logger.debug(f"淘汰最久未使用的集合: {evicted}")
+
+            return vectorstore
+
+    def _kb_state_path(self):
+        return Path(self.config["persist_dir"]) / "kb_state.json"
+
+    def _load_kb_version(self):
+        try:
+            with open(self._kb_state_path(), "r", encoding="utf-8") as f:
+                return int(json.load(f).get("version", 0))
+        except FileNotFoundError:
+            return 0
+        except Exception as e:
+            logger.warning(f"知识库版本读取失败: {e}")
+            return 0
+
+    def add_version_listener(self, callback):
+        """注册知识库版本变更回调，回调参数为新版本号"""
+        self._version_listeners.append(callback)
+
+    def _bump_version(self):
+        """知识库内容变更后递增版本号并通知监听者"""
+        with self._version_lock:
+            self.kb_version += 1
+            version = self.kb_version
+            try:
+                state_path = self._kb_state_path()
+                tmp_path = state_path.with_suffix(".tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"version": version}, f)
+                tmp_path.replace(state_path)
+            except Exception as e:
+                logger.warning(f"知识库版本写入失败: {e}")
+
+        for callback in list(self._version_listeners):
+            try:
+                callback(version)
+            except Exception as e:
+                logger.warning(f"知识库版本回调执行失败: {e}")
+
+    def _get_dedup_index(self, collection_name):
+        if collection_name not in self.dedup_indexes:
+            index_path = Path(self.config["persist_dir"]) / "dedup" / f"{collection_name}.json"
+            self.dedup_indexes[collection_name] = NearDuplicateIndex(
+                index_path,
+                similarity_threshold=self.config["dedup_similarity_threshold"],
             )
+        return self.dedup_indexes[collection_name]
+
+    def _ensure_stats(self, collection_name):
+        """
+        统计中缺少该集合时（如升级前已入库的数据）一次性分页扫描元数据补齐，
+        之后只做增量更新
+        """
+        if self.stats.has(collection_name):
+            return
+        sources = []
+        existing = {collection.name for collection in self.client.list_collections()}
+        if collection_name in existing:
+            collection = self.client.get_collection(collection_name)
+            total = collection.count()
+            for offset in range(0, total, 2000):
+                batch = collection.get(include=["metadatas"], limit=2000, offset=offset)
+                sources.extend((metadata or {}).get("source", "") for metadata in batch["metadatas"])
+            logger.info(f"补齐集合 {collection_name} 的统计信息: {len(sources)} 个片段")
+        self.stats.record_ingest(collection_name, sources)
 
-        self.vectorstores[collection_name] = vectorstore
-        return vectorstore
+    def _record_stats(self, collection_name, docs):
+        self.stats.record_ingest(
+            collection_name, [doc.metadata.get("source", "") for doc in docs]
+        )
 
-    def add_documents(self, file_path, collection_name="safe"):
-        """添加文档到知识库，仅支持安全规范集合"""
+    def _write_chunks(self, vectorstore, collection_name, split_docs):
+        """写入文档片段，启用去重时仅写入规范片段并回写重复来源"""
+        self._ensure_stats(collection_name)
+        if not self.config["dedup_enabled"]:
+            vectorstore.add_documents(split_docs)
+            self._record_stats(collection_name, split_docs)
+            return len(split_docs)
+
+        dedup_index = self._get_dedup_index(collection_name)
+        kept_docs, kept_ids, updated_ids = dedup_index.deduplicate(split_docs)
+        try:
+            if kept_docs:
+                vectorstore.add_documents(kept_docs, ids=kept_ids)
+            if updated_ids:
+                # 仅更新元数据中的来源列表，无需重新计算向量
+                vectorstore._collection.update(
+                    ids=updated_ids,
+                    metadatas=[
+                        {"duplicate_sources": dedup_index.sources_json(chunk_id)}
+                        for chunk_id in updated_ids
+                    ],
+                )
+        except Exception:
+            dedup_index.reload()
+            raise
+        dedup_index.save()
+        self._record_stats(collection_name, kept_docs)
+        return len(kept_docs)
+
+    def _group_by_shard(self, split_docs, collection_name, version=None):
+        """按物理集合分组；写入整个安全规范集时按片段内容路由到专业分片"""
+        if version is None:
+            version = self.active_version
+        if collection_name != "safe":
+            target = self._resolve_collections(collection_name, version=version)[0]
+            return {target: split_docs}
+
+        taxonomy = get_taxonomy()
+        groups = {}
+        for doc in split_docs:
+            # 单次扫描同时得到专业分片与主要隐患类别，类别写入元数据供检索过滤
+            categories, shards = taxonomy.analyze(doc.page_content)
+            shard = shards[0] if shards else "general"
+            doc.metadata["discipline"] = shard
+            if categories:
+                doc.metadata["hazard_category"] = categories[0]
+            physical_name = physical_collection_name(KB_SHARDS[shard]["collection"], version)
+            groups.setdefault(physical_name, []).append(doc)
+        return groups
+
+    def _ingest_file(self, file_path, collection_name, version, embeddings, build_config,
+                     progress_callback=None):
+        """切分文件并写入指定版本的物理集合，返回 (输入片段数, 各集合写入数)"""
+        if progress_callback:
+            progress_callback("parsing")
+        docs = FileUtils.load_file(file_path)
+        if not docs:
+            return None, {}
+
+        text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=build_config["chunk_size"],
+            chunk_overlap=build_config["chunk_overlap"],
+        )
+        split_docs = text_splitter.split_documents(docs)
+        if progress_callback:
+            progress_callback("embedding", num_input_chunks=len(split_docs))
+
+        shard_counts = {}
+        for physical_name, shard_docs in self._group_by_shard(
+            split_docs, collection_name, version
+        ).items():
+            vectorstore = self._get_or_create_vectorstore(physical_name, embeddings)
+            shard_counts[physical_name] = self._write_chunks(vectorstore, physical_name, shard_docs)
+        return len(split_docs), shard_counts
+
+    def add_documents(self, file_path, collection_name="safe", progress_callback=None):
+        """
+        添加文档到知识库，写入"safe"时自动按专业分片
+
+        Args:
+            progress_callback: 进度回调 callback(stage, **counts)，stage为 "parsing" / "embedding"
+        """
         try:
-            if collection_name != "safe":
-                logger.warning(f"仅支持安全规范集合，忽略集合: {collection_name}")
-                return {"success": False, "error": "仅支持安全规范集合"}
+            with self._ingest_lock:
+                version, embeddings, build_config = self._active
+                num_input, shard_counts = self._ingest_file(
+                    file_path, collection_name, version, embeddings, build_config,
+                    progress_callback,
+                )
+                # 重建进行中时记录新文件及其目标集合，切换前按原集合补写到影子版本，避免切换后丢失
+                if num_input and self._is_versioned(collection_name) and self._is_building():
+                    self._rebuild_state["pending_files"].append((str(file_path), collection_name))
 
-            docs = FileUtils.load_file(file_path)
-            if not docs:
+            if num_input is None:
                 return {
                     "success": False,
                     "error": "无法加载文档，请检查文件是否存在且格式正确",
                 }
 
-            text_splitter = RecursiveCharacterTextSplitter(
-                chunk_size=self.config["chunk_size"],
-                chunk_overlap=self.config["chunk_overlap"],
-            )
-            split_docs = text_splitter.split_documents(docs)
-
-            vectorstore = self._get_or_create_vectorstore(collection_name)
-            vectorstore.add_documents(split_docs)
+            num_kept = sum(shard_counts.values())
+            num_duplicates = num_input - num_kept
+            self._bump_version()
 
-            logger.info(f"成功添加 {len(split_docs)} 个文档片段到安全规范集")
+            logger.info(
+                f"成功添加 {num_kept} 个文档片段到安全规范集，"
+                f"剔除近重复片段 {num_duplicates} 个，分片分布: {shard_counts}"
+            )
             return {
                 "success": True,
-                "num_chunks": len(split_docs),
+                "num_chunks": num_kept,
+                "num_input_chunks": num_input,
+                "num_duplicates": num_duplicates,
+                "dedup_ratio": num_duplicates / num_input if num_input else 0.0,
+                "shards": shard_counts,
                 "collection": collection_name,
             }
         except Exception as e:
             logger.error(f"添加文档失败: {str(e)}")
             return {"success": False, "error": str(e)}
 
-    def retrieve(self, query, collection_name="safe", k=None):
-        """从知识库检索相关文档，仅使用安全规范集合"""
+    def _get_search_executor(self):
+        if self._search_executor is None:
+            self._search_executor = ThreadPoolExecutor(
+                max_workers=self.config["shard_search_workers"],
+                thread_name_prefix="shard-search",
+            )
+        return self._search_executor
+
+    def _search_collection(self, physical_name, query_embedding, k, filter=None):
+        vectorstore = self._get_or_create_vectorstore(physical_name)
+        return vectorstore.similarity_search_by_vector_with_relevance_scores(
+            query_embedding, k=k, filter=filter
+        )
+
+    def _retrieve_cache_key(self, query, collection_name, k, filter):
+        filter_key = json.dumps(filter, ensure_ascii=False, sort_keys=True) if filter else ""
+        return f"retrieve_{collection_name}_{self.kb_version}_{k}_{hash(query)}_{hash(filter_key)}"
+
+    def _active_embeddings(self):
+        """一次取出生效版本与嵌入模型，重建切换不会让单次查询跨版本"""
+        version, embeddings, build_config = self._active
+        if not embeddings:
+            logger.error(
+                f"嵌入模型不可用，无法检索，请检查 embedding_model 配置: {build_config['embedding_model']}"
+            )
+        return version, embeddings
+
+    def _merge_results(self, scored, k, cache_key, num_collections):
+        scored.sort(key=lambda item: item[1])
+        results = [doc for doc, _ in scored[:k]]
+
+        CacheUtils.set(cache_key, list(results))
+        logger.info(f"从 {num_collections} 个分片检索到 {len(results)} 个相关文档")
+        return results
+
+    def retrieve(self, query, collection_name="safe", k=None, filter=None):
+        """
+        从知识库检索相关文档，多个分片并行检索后按距离合并
+
+        Args:
+            filter: Chroma元数据过滤条件，如 {"hazard_category": "未佩戴安全帽"}
+        """
         if k is None:
             k = self.config["retrieval_k"]
 
-        cache_key = f"retrieve_{collection_name}_{k}_{hash(query)}"
+        cache_key = self._retrieve_cache_key(query, collection_name, k, filter)
         cached_result = CacheUtils.get(cache_key)
         if cached_result:
             logger.info("从缓存获取检索结果")
-            return cached_result
+            # 返回副本，调用方修改结果不会污染缓存
+            return list(cached_result)
 
         try:
-            vectorstore = self._get_or_create_vectorstore(collection_name)
+            version, embeddings = self._active_embeddings()
+            if not embeddings:
+                return []
+
+            physical_names = self._resolve_collections(collection_name, query, version)
+            # 查询向量只计算一次，各分片复用
+            query_embedding = embeddings.embed_query(query)
 
-            if self.embeddings:
-                results = vectorstore.similarity_search(query, k=k)
+            if len(physical_names) == 1:
+                scored = self._search_collection(physical_names[0], query_embedding, k, filter)
             else:
-                results = []
-                logger.warning("嵌入模型不可用")
+                executor = self._get_search_executor()
+                futures = [
+                    executor.submit(self._search_collection, name, query_embedding, k, filter)
+                    for name in physical_names
+                ]
+                scored = [item for future in futures for item in future.result()]
 
-            CacheUtils.set(cache_key, results)
-            logger.info(f"从安全规范集检索到 {len(results)} 个相关文档")
-            return results
+            return self._merge_results(scored, k, cache_key, len(physical_names))
         except Exception as e:
             logger.error(f"检索失败: {str(e)}")
             return []
 
-    def get_collection_stats(self, collection_name="safe"):
-        """获取集合统计信息，仅支持安全规范集合"""
+    async def aretrieve(self, query, collection_name="safe", k=None, filter=None):
+        """
+        retrieve 的异步版本
+
+        查询向量通过嵌入模型的异步接口计算；本地Chroma客户端没有原生异步接口，
+        各分片检索交给分片检索线程池，事件循环本身不被阻塞
+        """
+        if k is None:
+            k = self.config["retrieval_k"]
+
+        cache_key = self._retrieve_cache_key(query, collection_name, k, filter)
+        cached_result = CacheUtils.get(cache_key)
+        if cached_result:
+            logger.info("从缓存获取检索结果")
+            # 返回副本，调用方修改结果不会污染缓存
+            return list(cached_result)
+
         try:
-            if collection_name != "safe":
-                return {"collection": collection_name, "error": "仅支持安全规范集合"}
+            version, embeddings = self._active_embeddings()
+            if not embeddings:
+                return []
+
+            physical_names = self._resolve_collections(collection_name, query, version)
+            query_embedding = await embeddings.aembed_query(query)
+
+            loop = asyncio.get_running_loop()
+            executor = self._get_search_executor()
+            batches = await asyncio.gather(*[
+                loop.run_in_executor(
+                    executor, self._search_collection, name, query_embedding, k, filter
+                )
+                for name in physical_names
+            ])
+            scored = [item for batch in batches for item in batch]
+
+            return self._merge_results(scored, k, cache_key, len(physical_names))
+        except Exception as e:
+            logger.error(f"检索失败: {str(e)}")
+            return []
 
-            vectorstore = self._get_or_create_vectorstore(collection_name)
-            count = len(vectorstore.get()["ids"])
-            return {"collection": collection_name, "document_count": count}
+    def get_collection_stats(self, collection_name="safe"):
+        """
+        获取集合统计信息，"safe"汇总全部分片
+
+        统计由入库与清空操作增量维护，读取开销与知识库规模无关
+        """
+        try:
+            physical_names = self._resolve_collections(collection_name)
+            for physical_name in physical_names:
+                self._ensure_stats(physical_name)
+            return {
+                "collection": collection_name,
+                "version": self.active_version,
+                **self.stats.summary(physical_names),
+            }
         except Exception as e:
             logger.error(f"获取统计信息失败: {str(e)}")
             return {"collection": collection_name, "error": str(e)}
 
     def clear_collection(self, collection_name="safe"):
-        """清空集合，仅支持安全规范集合"""
+        """
+        清空集合，"safe"清空全部分片
+
+        重建进行中时不允许清空安全规范集：影子版本由清空前的源文件构建，切换后清空会被撤销
+        """
         try:
-            if collection_name != "safe":
-                return {"success": False, "error": "仅支持安全规范集合"}
+            with self._ingest_lock:
+                if self._is_versioned(collection_name) and self._is_building():
+                    return {
+                        "success": False,
+                        "error": f"知识库版本 v{self._rebuild_state['version']} 正在重建，请在切换完成后再清空",
+                    }
+                self._drop_collections(self._resolve_collections(collection_name))
+            self._bump_version()
+            logger.info(f"已清空知识库集合: {collection_name}")
+            return {"success": True, "collection": collection_name}
+        except Exception as e:
+            logger.error(f"清空集合失败: {str(e)}")
+            return {"success": False, "error": str(e)}
 
-            vectorstore = self._get_or_create_vectorstore(collection_name)
+    def _drop_collections(self, physical_names):
+        """删除物理集合及其去重索引"""
+        for physical_name in physical_names:
+            vectorstore = self._get_or_create_vectorstore(physical_name)
             vectorstore.delete_collection()
 
-            if collection_name in self.vectorstores:
-                del self.vectorstores[collection_name]
+            with self._vectorstore_lock:
+                self.vectorstores.pop(physical_name, None)
+            self._get_dedup_index(physical_name).clear()
+            self.dedup_indexes.pop(physical_name, None)
+            self.stats.reset(physical_name)
 
-            self._get_or_create_vectorstore(collection_name)
-            logger.info(f"已清空安全规范集合")
-            return {"success": True, "collection": collection_name}
+    def _collect_sources(self, version):
+        """
+        收集指定版本中全部片段引用的源文件（含去重合并的来源），仅保留仍存在的文件
+
+        Returns:
+            [(源文件, 入库集合)]：自动分片写入的片段带有 discipline 元数据，记为"safe"；
+            指定分片写入的片段没有该元数据，记为所在分片，重建时按原方式写入
+        """
+        sources = set()
+        for shard in KB_SHARDS:
+            physical_name = physical_collection_name(KB_SHARDS[shard]["collection"], version)
+            collection = self._get_or_create_vectorstore(physical_name)._collection
+            total = collection.count()
+            for offset in range(0, total, 2000):
+                batch = collection.get(include=["metadatas"], limit=2000, offset=offset)
+                for metadata in batch["metadatas"]:
+                    metadata = metadata or {}
+                    target = "safe" if metadata.get("discipline") else shard
+                    if metadata.get("source"):
+                        sources.add((metadata["source"], target))
+                    for ref in json.loads(metadata.get("duplicate_sources") or "[]"):
+                        sources.add((ref.rsplit("#p", 1)[0], target))
+        return sorted(source for source in sources if Path(source[0]).exists())
+
+    def rebuild(self, file_paths=None, chunk_size=None, chunk_overlap=None,
+                embedding_model=None, background=True):
+        """
+        版本化重建安全规范集
+
+        新版本写入影子集合，期间查询继续走当前版本；全部写入成功后原子切换，
+        原版本保留为可回滚版本，更早的版本随之删除
+
+        Args:
+            file_paths: 重建使用的源文件，元素为文件路径（自动分片写入）或 (文件路径, 集合名)，
+                默认取当前版本已入库的全部源文件及其入库集合
+            chunk_size / chunk_overlap / embedding_model: 新版本的构建参数，缺省沿用当前配置
+            background: 是否在后台线程中执行
+        """
+        with self._ingest_lock:
+            if self._rebuild_state and self._rebuild_state["status"] == "building":
+                return {"success": False, "error": "已有重建任务在进行中"}
+
+            build_config = self._build_config({
+                "embedding_model": embedding_model,
+                "chunk_size": chunk_size,
+                "chunk_overlap": chunk_overlap,
+            })
+            if file_paths is None:
+                file_paths = self._collect_sources(self.active_version)
+            file_paths = [
+                (str(item), "safe") if isinstance(item, (str, Path)) else (str(item[0]), item[1])
+                for item in file_paths
+            ]
+            version = self.registry.create_version(build_config)
+            self._rebuild_state = {
+                "status": "building",
+                "version": version,
+                "build_config": build_config,
+                "total_files": len(file_paths),
+                "processed_files": 0,
+                "num_chunks": 0,
+                "pending_files": [],
+                "started_at": datetime.now().isoformat(timespec="seconds"),
+                "error": None,
+            }
+
+        logger.info(f"开始重建知识库版本 v{version}: {len(file_paths)} 个文件，参数 {build_config}")
+        if not background:
+            self._run_rebuild(version, file_paths, build_config)
+            return self.get_rebuild_status()
+
+        threading.Thread(
+            target=self._run_rebuild,
+            args=(version, file_paths, build_config),
+            name=f"kb-rebuild-v{version}",
+            daemon=True,
+        ).start()
+        return {"success": True, "version": version, "total_files": len(file_paths)}
+
+    def _run_rebuild(self, version, file_paths, build_config):
+        state = self._rebuild_state
+        embeddings = self._create_embeddings(build_config["embedding_model"])
+        try:
+            if embeddings is None:
+                raise RuntimeError(f"嵌入模型不可用: {build_config['embedding_model']}")
+
+            for file_path, collection_name in file_paths:
+                _, shard_counts = self._ingest_file(
+                    file_path, collection_name, version, embeddings, build_config
+                )
+                state["num_chunks"] += sum(shard_counts.values())
+                state["processed_files"] += 1
+
+            # 补写重建期间新增的文件，直到队列为空后在入库锁内完成切换
+            while True:
+                with self._ingest_lock:
+                    pending, state["pending_files"] = state["pending_files"], []
+                    if not pending:
+                        self._activate(version, embeddings, build_config)
+                        state["status"] = "done"
+                        break
+                for file_path, collection_name in pending:
+                    _, shard_counts = self._ingest_file(
+                        file_path, collection_name, version, embeddings, build_config
+                    )
+                    state["num_chunks"] += sum(shard_counts.values())
         except Exception as e:
-            logger.error(f"清空集合失败: {str(e)}")
-            return {"success": False, "error": str(e)}
+            logger.error(f"知识库版本 v{version} 重建失败: {e}")
+            state["status"] = "failed"
+            state["error"] = str(e)
+            try:
+                self._drop_collections(self._resolve_collections("safe", version=version))
+            finally:
+                self.registry.discard(version)
+            return
+
+        state["finished_at"] = datetime.now().isoformat(timespec="seconds")
+        self._bump_version()
+        logger.info(f"知识库已切换到版本 v{version}，共 {state['num_chunks']} 个文档片段")
+
+    def _activate(self, version, embeddings, build_config):
+        """原子切换生效版本，并删除不再保留的旧版本"""
+        self.registry.set_status(version, "ready", num_chunks=self._rebuild_state["num_chunks"])
+        retired = self.registry.activate(version)
+        self._active = (version, embeddings, build_config)
+        if retired is not None:
+            try:
+                self._drop_collections(self._resolve_collections("safe", version=retired))
+                logger.info(f"已删除旧知识库版本 v{retired}")
+            except Exception as e:
+                logger.warning(f"删除旧知识库版本 v{retired} 失败: {e}")
+
+    def rollback(self):
+        """回滚到上一版本"""
+        with self._ingest_lock:
+            version = self.registry.rollback()
+            if version is None:
+                return {"success": False, "error": "没有可回滚的知识库版本"}
+            build_config = self._build_config(self.registry.version_info(version))
+            self._active = (version, self._create_embeddings(build_config["embedding_model"]), build_config)
+
+        self._bump_version()
+        logger.info(f"知识库已回滚到版本 v{version}")
+        return {"success": True, "version": version}
+
+    def get_rebuild_status(self):
+        """当前（或最近一次）重建任务的进度"""
+        state = self._rebuild_state
+        status = {
+            "active_version": self.active_version,
+            "previous_version": self.registry.previous,
+        }
+        if state:
+            status.update({k: v for k, v in state.items() if k != "pending_files"})
+            status["success"] = state["status"] != "failed"
+        return status
@@ -0,0 +1,346 @@
+"""
+存储生命周期管理
+上传文件按内容SHA-256寻址存储，不同会话上传同名文件不会相互覆盖，相同内容只保存一份；
+会话、报告、知识库对文件的使用登记为引用，引用到期或释放后文件进入回收，
+后台清理线程按年龄与配额回收上传文件、导出的PDF与照片压缩缓存
+
+上传文件路径: <upload_dir>/objects/<哈希前两位>/<哈希>/<原文件名>
+"""
+
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from src.core.config import DEFAULT_CONFIG
+from src.core.logging import getLogger
+
+logger = getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    digest TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    last_used_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_last_used ON uploads (last_used_at);
+
+CREATE TABLE IF NOT EXISTS upload_refs (
+    digest TEXT NOT NULL REFERENCES uploads (digest) ON DELETE CASCADE,
+    owner TEXT NOT NULL,
+    expires_at TEXT,
+    PRIMARY KEY (digest, owner)
+);
+CREATE INDEX IF NOT EXISTS idx_upload_refs_owner ON upload_refs (owner);
+CREATE INDEX IF NOT EXISTS idx_upload_refs_expires ON upload_refs (expires_at);
+"""
+
+
+def _now(offset_seconds=0):
+    return (datetime.now() + timedelta(seconds=offset_seconds)).isoformat(timespec="seconds")
+
+
+def _safe_name(filename):
+    name = Path(filename or "").name.strip()
+    return name or "upload"
+
+
+def sweep_directory(directory, max_bytes=None, max_age_seconds=None):
+    """
+    按年龄与配额清理目录中的文件：先删除超过保留期限的文件，
+    总大小仍超出配额时按修改时间从旧到新继续删除
+
+    Returns:
+        {"removed": 删除的文件数, "freed_bytes": 释放的字节数, "remaining_bytes": 剩余总大小}
+    """
+    directory = Path(directory)
+    files = []
+    for path in directory.rglob("*") if directory.exists() else []:
+        try:
+            stat = path.stat()
+        except OSError:
+            continue
+        if path.is_file():
+            files.append((stat.st_mtime, stat.st_size, path))
+    files.sort()
+
+    removed = freed = 0
+    total = sum(size for _, size, _ in files)
+    cutoff = time.time() - max_age_seconds if max_age_seconds else None
+    for mtime, size, path in files:
+        expired = cutoff is not None and mtime < cutoff
+        over_quota = max_bytes is not None and total > max_bytes
+        if not (expired or over_quota):
+            continue
+        try:
+            path.unlink(missing_ok=True)
+        except OSError as e:
+            logger.warning(f"清理文件失败 {path}: {e}")
+            continue
+        removed += 1
+        freed += size
+        total -= size
+
+    if removed:
+        logger.info(f"已清理 {directory}: {removed} 个文件，释放 {freed // 1024} KB")
+    return {"removed": removed, "freed_bytes": freed, "remaining_bytes": total}
+
+
+class UploadStore:
+    """内容寻址的上传文件存储，文件在没有任何有效引用后才会被回收"""
+
+    def __init__(self, upload_dir=None, db_path=None):
+        self.objects_dir = Path(upload_dir or DEFAULT_CONFIG["upload_dir"]) / "objects"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = Path(db_path or DEFAULT_CONFIG["upload_store_db"])
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writer = None
+        # 引用方 -> 尚未完成的后台写入数；写入期间被 release_owner 释放的引用方 -> 保留的文件
+        self._pending = {}
+        self._deferred_releases = {}
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+    @staticmethod
+    def _add_ref(conn, digest, owner, ttl_seconds):
+        expires_at = _now(ttl_seconds) if ttl_seconds else None
+        conn.execute(
+            "INSERT INTO upload_refs (digest, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (digest, owner) DO UPDATE SET expires_at = excluded.expires_at",
+            (digest, owner, expires_at),
+        )
+        conn.execute("UPDATE uploads SET last_used_at = ? WHERE digest = ?", (_now(), digest))
+
+    def put(self, data, filename, owner, ttl_seconds=None, digest=None):
+        """
+        保存上传内容并登记引用
+
+        Args:
+            data: 文件内容（bytes 或 memoryview）
+            owner: 引用方，如 "session:<id>"、"report:<report_id>"、"kb"
+            ttl_seconds: 引用有效期，None 表示一直有效直到释放
+            digest: 调用方已计算的内容SHA-256，避免重复哈希
+
+        Returns:
+            {"success": True, "digest", "path", "size", "existing": 相同内容是否已存在}
+        """
+        digest = digest or hashlib.sha256(data).hexdigest()
+        with self._lock, self._connect() as conn:
+            row = conn.execute("SELECT path FROM uploads WHERE digest = ?", (digest,)).fetchone()
+            existing = row is not None and Path(row["path"]).exists()
+            if existing:
+                path = Path(row["path"])
+            else:
+                path = self.objects_dir / digest[:2] / digest / _safe_name(filename)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                # 先写临时文件再替换，读取方不会看到写了一半的文件
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                conn.execute(
+                    "INSERT INTO uploads (digest, path, size, created_at, last_used_at) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (digest) DO UPDATE SET path = excluded.path",
+                    (digest, str(path), len(data), _now(), _now()),
+                )
+            self._add_ref(conn, digest, owner, ttl_seconds)
+
+        logger.info(f"上传文件{'已存在，复用' if existing else '已保存'}: {path}")
+        return {"success": True, "digest": digest, "path": str(path), "size": len(data), "existing": existing}
+
+    def put_async(self, data, filename, owner, ttl_seconds=None, digest=None):
+        """
+        在后台线程中执行 put，立即返回 concurrent.futures.Future
+
+        data 在写入完成前须保持有效（如会话中仍持有的 UploadedFile 缓冲区）；
+        写入完成前引用方已被 release_owner 释放时，写入完成后随即释放本次登记的引用
+        """
+        with self._lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(
+                    max_workers=DEFAULT_CONFIG["upload_persist_workers"], thread_name_prefix="upload-writer"
+                )
+            self._pending[owner] = self._pending.get(owner, 0) + 1
+        return self._writer.submit(self._put_pending, data, filename, owner, ttl_seconds, digest)
+
+    def _put_pending(self, data, filename, owner, ttl_seconds, digest):
+        try:
+            result = self.put(data, filename, owner, ttl_seconds, digest)
+        finally:
+            with self._lock:
+                keep = self._deferred_releases.get(owner)
+                self._pending[owner] -= 1
+                if not self._pending[owner]:
+                    del self._pending[owner]
+                    self._deferred_releases.pop(owner, None)
+        if keep is not None and result["digest"] not in keep:
+            self.release(result["digest"], owner)
+        return result
+
+    def acquire(self, digest, owner, ttl_seconds=None):
+        """为已存储的文件登记引用，文件不存在时返回False"""
+        with self._lock, self._connect() as conn:
+            if conn.execute("SELECT 1 FROM uploads WHERE digest = ?", (digest,)).fetchone() is None:
+                return False
+            self._add_ref(conn, digest, owner, ttl_seconds)
+        return True
+
+    def acquire_path(self, path, owner, ttl_seconds=None):
+        """按文件路径登记引用（如报告引用的现场照片），不在存储中的文件返回False"""
+        digest = self.digest_for_path(path)
+        return digest is not None and self.acquire(digest, owner, ttl_seconds)
+
+    def digest_for_path(self, path):
+        with self._connect() as conn:
+            row = conn.execute("SELECT digest FROM uploads WHERE path = ?", (str(path),)).fetchone()
+        return row["digest"] if row else None
+
+    def release(self, digest, owner):
+        """释放引用，文件在下次回收时处理"""
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM upload_refs WHERE digest = ? AND owner = ?", (digest, owner))
+            conn.execute("UPDATE uploads SET last_used_at = ? WHERE digest = ?", (_now(), digest))
+
+    def release_owner(self, owner, keep=()):
+        """
+        释放引用方持有的全部引用（keep 中的文件除外），返回释放的引用数
+
+        该引用方仍有后台写入未完成时，这些写入登记的引用在写入完成后释放
+        """
+        keep = list(keep)
+        condition = f" AND digest NOT IN ({', '.join('?' * len(keep))})" if keep else ""
+        with self._lock, self._connect() as conn:
+            released = conn.execute(
+                f"DELETE FROM upload_refs WHERE owner = ?{condition}", (owner, *keep)
+            ).rowcount
+            if self._pending.get(owner):
+                self._deferred_releases[owner] = set(keep)
+        return released
+
+    def refcount(self, digest):
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM upload_refs WHERE digest = ?", (digest,)
+            ).fetchone()[0]
+
+    def stats(self):
+        """{"files", "total_bytes", "unreferenced_files", "unreferenced_bytes"}"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS files, COALESCE(SUM(size), 0) AS total_bytes, "
+                "COALESCE(SUM(NOT EXISTS (SELECT 1 FROM upload_refs r WHERE r.digest = u.digest)), 0) "
+                "AS unreferenced_files, "
+                "COALESCE(SUM(CASE WHEN NOT EXISTS (SELECT 1 FROM upload_refs r WHERE r.digest = u.digest) "
+                "THEN size ELSE 0 END), 0) AS unreferenced_bytes "
+                "FROM uploads u"
+            ).fetchone()
+        return dict(row)
+
+    def gc(self, max_bytes=None, grace_seconds=None):
+        """
+        回收上传文件
+
+        1. 删除已过期的引用
+        2. 删除无引用且超过宽限期的文件
+        3. 总大小仍超出配额时，按最久未使用顺序继续删除无引用的文件（不受宽限期限制）；
+           仍有引用的文件不会被删除
+
+        Returns:
+            {"expired_refs", "removed", "freed_bytes", "remaining_bytes"}
+        """
+        if max_bytes is None:
+            max_bytes = DEFAULT_CONFIG["upload_quota_mb"] * 1024 * 1024
+        if grace_seconds is None:
+            grace_seconds = DEFAULT_CONFIG["upload_gc_grace_seconds"]
+        grace_cutoff = _now(-grace_seconds)
+
+        removed = freed = 0
+        with self._lock, self._connect() as conn:
+            expired_refs = conn.execute(
+                "DELETE FROM upload_refs WHERE expires_at IS NOT NULL AND expires_at < ?", (_now(),)
+            ).rowcount
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM uploads").fetchone()[0]
+            candidates = conn.execute(
+                "SELECT digest, path, size, last_used_at FROM uploads u "
+                "WHERE NOT EXISTS (SELECT 1 FROM upload_refs r WHERE r.digest = u.digest) "
+                "ORDER BY last_used_at"
+            ).fetchall()
+            for row in candidates:
+                if row["last_used_at"] >= grace_cutoff and total <= max_bytes:
+                    continue
+                path = Path(row["path"])
+                try:
+                    path.unlink(missing_ok=True)
+                    path.parent.rmdir()
+                except OSError:
+                    pass
+                conn.execute("DELETE FROM uploads WHERE digest = ?", (row["digest"],))
+                removed += 1
+                freed += row["size"]
+                total -= row["size"]
+
+        if removed or expired_refs:
+            logger.info(
+                f"上传文件回收: 过期引用 {expired_refs} 个，删除文件 {removed} 个，释放 {freed // 1024} KB"
+            )
+        if total > max_bytes:
+            logger.warning(
+                f"上传文件总大小 {total // 1024 // 1024} MB 仍超出配额 {max_bytes // 1024 // 1024} MB"
+                "（剩余文件均有引用）"
+            )
+        return {"expired_refs": expired_refs, "removed": removed, "freed_bytes": freed, "remaining_bytes": total}
+
+
+class StorageSweeper:
+    """后台清理线程，定期回收上传文件并按配额清理导出目录与缓存目录"""
+
+    def __init__(self, upload_store, directories=(), interval_seconds=None):
+        """
+        Args:
+            directories: [(目录, 配额字节数或None, 保留秒数或None)]
+        """
+        self.upload_store = upload_store
+        self.directories = list(directories)
+        self.interval_seconds = interval_seconds or DEFAULT_CONFIG["storage_sweep_interval_seconds"]
+        self._stop = threading.Event()
+        self._worker = None
+
+    def sweep_once(self):
+        """执行一次清理，返回各部分的清理结果"""
+        results = {"uploads": self.upload_store.gc()}
+        for directory, max_bytes, max_age_seconds in self.directories:
+            results[str(directory)] = sweep_directory(directory, max_bytes, max_age_seconds)
+        return results
+
+    def start(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._stop.clear()
+            self._worker = threading.Thread(target=self._run, name="storage-sweeper", daemon=True)
+            self._worker.start()
+            logger.info(f"存储清理线程已启动（每 {self.interval_seconds} 秒）")
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep_once()
+            except Exception as e:
+                logger.error(f"存储清理失败: {e}")
+            self._stop.wait(self.interval_seconds)
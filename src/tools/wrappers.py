@@ -6,6 +6,7 @@ from src.tools import (
     KnowledgeRetriever,
     ReportGenerator,
     PDFExporter,
+    HazardRegulationMap,
 )
 from src.core.logging import getLogger
 
@@ -103,7 +104,8 @@ class Validator:
 try:
     multimodal_analyzer = MultimodalAnalyzer()
     knowledge_retriever = KnowledgeRetriever()
-    report_generator = ReportGenerator()
+    hazard_map = HazardRegulationMap(knowledge_retriever)
+    report_generator = ReportGenerator(regulation_map=hazard_map)
     pdf_exporter = PDFExporter()
     logger.info("所有工具初始化成功")
 except Exception as e:
@@ -111,66 +113,109 @@ except Exception as e:
     raise
 
 
+def _validate_image_input(input_str):
+    """校验图片路径输入，返回 (图片路径, 错误信息)"""
+    is_valid, error_msg = Validator.validate_required(input_str, "图片路径")
+    if not is_valid:
+        logger.warning(f"输入验证失败: {error_msg}")
+        return None, f"[{ErrorCode.INVALID_INPUT}] {error_msg}"
+
+    image_path = input_str.strip()
+
+    # 文件存在性检查
+    is_valid, error_msg = Validator.validate_file_exists(image_path)
+    if not is_valid:
+        logger.warning(f"文件不存在: {image_path}")
+        return None, f"[{ErrorCode.FILE_NOT_FOUND}] {error_msg}: {image_path}"
+
+    # 文件格式检查
+    is_valid, error_msg = Validator.validate_image_format(image_path)
+    if not is_valid:
+        logger.warning(f"文件格式不支持: {image_path}")
+        return None, f"[{ErrorCode.INVALID_FILE_FORMAT}] {error_msg}"
+
+    return image_path, None
+
+
+def _format_analysis_output(result):
+    """将图片分析结果整理为工具输出文本"""
+    if result.get("success"):
+        hazards = result.get("hazards", [])
+        summary = result.get("summary", "")
+
+        # 构建响应输出
+        output = f"分析完成！\n\n{summary}\n\n"
+
+        if hazards:
+            output += "检测到的隐患：\n"
+            for i, hazard in enumerate(hazards, 1):
+                hazard_type = hazard.get('hazard_type', '未知')
+                severity = hazard.get('severity', 'low')
+                location = hazard.get('location', '未知')
+                description = hazard.get('description', '')
+
+                output += f"{i}. {hazard_type} - {severity}\n"
+                output += f"   位置: {location}\n"
+                output += f"   描述: {description}\n"
+        else:
+            output += "未检测到明显安全隐患"
+
+        logger.info(f"图片分析完成，检测到 {len(hazards)} 个隐患")
+        return output
+    else:
+        error_detail = result.get('error', '未知错误')
+        logger.error(f"图片分析失败: {error_detail}")
+        return f"[{ErrorCode.TOOL_EXECUTION_ERROR}] 分析失败: {error_detail}"
+
+
 def analyze_image_tool(input_str):
     """分析施工现场图片，识别安全隐患。输入应为图片文件路径。"""
     try:
-        # 输入验证
-        is_valid, error_msg = Validator.validate_required(input_str, "图片路径")
-        if not is_valid:
-            logger.warning(f"输入验证失败: {error_msg}")
-            return f"[{ErrorCode.INVALID_INPUT}] {error_msg}"
-
-        image_path = input_str.strip()
-        
-        # 文件存在性检查
-        is_valid, error_msg = Validator.validate_file_exists(image_path)
-        if not is_valid:
-            logger.warning(f"文件不存在: {image_path}")
-            return f"[{ErrorCode.FILE_NOT_FOUND}] {error_msg}: {image_path}"
-
-        # 文件格式检查
-        is_valid, error_msg = Validator.validate_image_format(image_path)
-        if not is_valid:
-            logger.warning(f"文件格式不支持: {image_path}")
-            return f"[{ErrorCode.INVALID_FILE_FORMAT}] {error_msg}"
+        image_path, error = _validate_image_input(input_str)
+        if error:
+            return error
 
         # 执行分析
         logger.info(f"开始分析图片: {image_path}")
         result = multimodal_analyzer.analyze_image(image_path)
+        return _format_analysis_output(result)
+
+    except Exception as e:
+        logger.error(f"工具调用异常: {e}", exc_info=True)
+        return f"[{ErrorCode.INTERNAL_ERROR}] 工具调用出错: {str(e)}"
+
+
+async def aanalyze_image_tool(input_str):
+    """analyze_image_tool 的异步版本"""
+    try:
+        image_path, error = _validate_image_input(input_str)
+        if error:
+            return error
+
+        logger.info(f"开始分析图片: {image_path}")
+        result = await multimodal_analyzer.aanalyze_image(image_path)
+        return _format_analysis_output(result)
 
-        if result.get("success"):
-            hazards = result.get("hazards", [])
-            summary = result.get("summary", "")
-            
-            # 构建响应输出
-            output = f"分析完成！\n\n{summary}\n\n"
-
-            if hazards:
-                output += "检测到的隐患：\n"
-                for i, hazard in enumerate(hazards, 1):
-                    hazard_type = hazard.get('hazard_type', '未知')
-                    severity = hazard.get('severity', 'low')
-                    location = hazard.get('location', '未知')
-                    description = hazard.get('description', '')
-                    
-                    output += f"{i}. {hazard_type} - {severity}\n"
-                    output += f"   位置: {location}\n"
-                    output += f"   描述: {description}\n"
-            else:
-                output += "未检测到明显安全隐患"
-
-            logger.info(f"图片分析完成，检测到 {len(hazards)} 个隐患")
-            return output
-        else:
-            error_detail = result.get('error', '未知错误')
-            logger.error(f"图片分析失败: {error_detail}")
-            return f"[{ErrorCode.TOOL_EXECUTION_ERROR}] 分析失败: {error_detail}"
-            
     except Exception as e:
         logger.error(f"工具调用异常: {e}", exc_info=True)
         return f"[{ErrorCode.INTERNAL_ERROR}] 工具调用出错: {str(e)}"
 
 
+def _format_retrieval_output(query, results):
+    """将检索结果整理为工具输出文本"""
+    if results:
+        output = f'关于"{query}"，从知识库中检索到相关知识如下：\n\n'
+        for i, doc in enumerate(results, 1):
+            content = doc.page_content
+            content = content.replace("### ", "").replace("## ", "")
+            content = "\n".join([line for line in content.split("\n") if line.strip()])
+            output += f"{i}. {content}\n\n"
+        output += "如需进一步了解某一方面的详细内容，可继续提问。"
+        return output
+    else:
+        return "未检索到相关知识"
+
+
 def retrieve_knowledge_tool(query):
     """从知识库中检索相关的建筑施工安全知识。输入为查询关键词。"""
     try:
@@ -179,62 +224,85 @@ def retrieve_knowledge_tool(query):
             return f"[{ErrorCode.INVALID_INPUT}] {error_msg}"
 
         results = knowledge_retriever.retrieve(query, "safe")
-
-        if results:
-            output = f'关于"{query}"，从知识库中检索到相关知识如下：\n\n'
-            for i, doc in enumerate(results, 1):
-                content = doc.page_content
-                content = content.replace("### ", "").replace("## ", "")
-                content = "\n".join([line for line in content.split("\n") if line.strip()])
-                output += f"{i}. {content}\n\n"
-            output += "如需进一步了解某一方面的详细内容，可继续提问。"
-            return output
-        else:
-            return "未检索到相关知识"
+        return _format_retrieval_output(query, results)
     except Exception as e:
         return f"[{ErrorCode.INTERNAL_ERROR}] 工具调用出错: {str(e)}"
 
 
-def generate_report_tool(input_str):
-    """生成安全评估报告。输入应为JSON格式的分析结果，或使用默认示例数据。"""
+async def aretrieve_knowledge_tool(query):
+    """retrieve_knowledge_tool 的异步版本"""
     try:
-        from datetime import datetime
+        is_valid, error_msg = Validator.validate_required(query, "查询关键词")
+        if not is_valid:
+            return f"[{ErrorCode.INVALID_INPUT}] {error_msg}"
 
-        analysis_result = {
-            "success": True,
-            "hazards": [
-                {
-                    "hazard_type": "未佩戴安全帽",
-                    "location": "图片左侧工人",
-                    "severity": "high",
-                    "description": "工人未按规定佩戴安全帽",
-                    "confidence": 0.95,
-                }
-            ],
-            "summary": "检测到1项高风险隐患",
-        }
+        results = await knowledge_retriever.aretrieve(query, "safe")
+        return _format_retrieval_output(query, results)
+    except Exception as e:
+        return f"[{ErrorCode.INTERNAL_ERROR}] 工具调用出错: {str(e)}"
 
-        if input_str.strip():
-            is_valid, parsed_data = Validator.validate_json(input_str)
-            if is_valid and "hazards" in parsed_data:
-                analysis_result = parsed_data
 
-        retrieved_docs = knowledge_retriever.retrieve("施工安全", "safe")
+def _parse_report_input(input_str):
+    """解析报告生成输入，返回 (分析结果, 报告元数据)"""
+    from datetime import datetime
+
+    analysis_result = {
+        "success": True,
+        "hazards": [
+            {
+                "hazard_type": "未佩戴安全帽",
+                "location": "图片左侧工人",
+                "severity": "high",
+                "description": "工人未按规定佩戴安全帽",
+                "confidence": 0.95,
+            }
+        ],
+        "summary": "检测到1项高风险隐患",
+    }
 
-        metadata = {
-            "title": "施工现场安全评估报告",
-            "date": datetime.now().strftime("%Y年%m月%d日"),
-        }
+    if input_str.strip():
+        is_valid, parsed_data = Validator.validate_json(input_str)
+        if is_valid and "hazards" in parsed_data:
+            analysis_result = parsed_data
+
+    metadata = {
+        "title": "施工现场安全评估报告",
+        "date": datetime.now().strftime("%Y年%m月%d日"),
+    }
+    return analysis_result, metadata
+
+
+def _format_report_output(report_data):
+    if report_data.get("success") is False:
+        return f"[{ErrorCode.TOOL_EXECUTION_ERROR}] 报告生成失败: {report_data.get('error')}"
+
+    return report_generator.format_report_for_display(report_data)
+
+
+def generate_report_tool(input_str):
+    """生成安全评估报告。输入应为JSON格式的分析结果，或使用默认示例数据。"""
+    try:
+        analysis_result, metadata = _parse_report_input(input_str)
+        retrieved_docs = hazard_map.lookup_for_analysis(analysis_result)
 
         report_data = report_generator.generate_report(
             analysis_result, retrieved_docs, metadata
         )
+        return _format_report_output(report_data)
+    except Exception as e:
+        return f"[{ErrorCode.INTERNAL_ERROR}] 工具调用出错: {str(e)}"
 
-        if report_data.get("success") is False:
-            return f"[{ErrorCode.TOOL_EXECUTION_ERROR}] 报告生成失败: {report_data.get('error')}"
 
-        formatted_report = report_generator.format_report_for_display(report_data)
-        return formatted_report
+async def agenerate_report_tool(input_str):
+    """generate_report_tool 的异步版本"""
+    try:
+        analysis_result, metadata = _parse_report_input(input_str)
+
+        # 未传入检索结果，由报告生成器在线程中查映射表
+        report_data = await report_generator.agenerate_report(
+            analysis_result, None, metadata
+        )
+        return _format_report_output(report_data)
     except Exception as e:
         return f"[{ErrorCode.INTERNAL_ERROR}] 工具调用出错: {str(e)}"
 
@@ -4,6 +4,7 @@
 
 import sys
 import uuid
+import asyncio
 from pathlib import Path
 from datetime import datetime
 
@@ -14,15 +15,18 @@ sys.path.insert(0, str(project_root))
 import streamlit as st
 from dotenv import load_dotenv
 
-from src.core.config import DEFAULT_CONFIG, RISK_LEVELS
-from src.core.utils import FileUtils, RoutingUtils, TextUtils
+from src.core.config import DEFAULT_CONFIG, RISK_LEVELS, KB_SHARDS
+from src.core.image_pipeline import ImagePayload
+from src.core.utils import FileUtils, TextUtils
 from src.core.logging import getLogger
 from src.tools import (
-    MultimodalAnalyzer,
-    KnowledgeRetriever,
-    ReportGenerator,
-    PDFExporter,
+    IngestionQueue,
+    ReportStore,
+    UploadStore,
+    StorageSweeper,
 )
+from src.tools.ingest_queue import JOB_STATUS_LABELS
+from src.tools.inspection import SCOPE_LABELS, evidence_images, merge_analyses
 from src.ui.html_config import (
     inject_custom_css,
     format_message_html,
@@ -61,16 +65,108 @@ def render_message(message, is_streaming=False):
 
 @st.cache_resource
 def init_tools():
-    """初始化工具组件"""
+    """
+    初始化工具组件
+
+    分析器、检索器、映射表、报告生成器与PDF导出器复用智能体工具的全局实例：
+    页面上的入库、重建、回滚与清空对智能体工具立即可见，映射表也只有一份
+    """
     try:
-        multimodal_analyzer = MultimodalAnalyzer()
-        knowledge_retriever = KnowledgeRetriever()
-        report_generator = ReportGenerator()
-        pdf_exporter = PDFExporter()
-        return multimodal_analyzer, knowledge_retriever, report_generator, pdf_exporter
+        from src.tools import wrappers
+
+        multimodal_analyzer = wrappers.multimodal_analyzer
+        knowledge_retriever = wrappers.knowledge_retriever
+        hazard_map = wrappers.hazard_map
+        report_generator = wrappers.report_generator
+        pdf_exporter = wrappers.pdf_exporter
+        ingest_queue = IngestionQueue(knowledge_retriever)
+        report_store = ReportStore()
+        upload_store = UploadStore()
+        # 后台按年龄与配额回收上传文件、导出的PDF与照片压缩缓存
+        mb = 1024 * 1024
+        StorageSweeper(upload_store, [
+            (pdf_exporter.output_dir, DEFAULT_CONFIG["pdf_output_quota_mb"] * mb,
+             DEFAULT_CONFIG["pdf_output_max_age_days"] * 86400),
+            (DEFAULT_CONFIG["pdf_image_cache_dir"], DEFAULT_CONFIG["pdf_image_cache_quota_mb"] * mb, None),
+        ]).start()
+        return (multimodal_analyzer, knowledge_retriever, report_generator, pdf_exporter,
+                hazard_map, ingest_queue, report_store, upload_store)
     except Exception as e:
         logger.error(f"初始化工具失败: {e}")
-        return None, None, None, None
+        return None, None, None, None, None, None, None, None
+
+
+def session_upload_owner():
+    """当前会话在上传存储中的引用方标识"""
+    return st.session_state.setdefault("upload_owner", f"session:{uuid.uuid4().hex}")
+
+
+def persist_session_upload(upload_store, payload):
+    """
+    上传图片在后台按内容落盘，返回 Future；会话引用在 upload_session_ttl_hours 后过期
+
+    分析直接使用内存中的图片，只有报告嵌入现场照片时才需要等待落盘完成
+    """
+    return upload_store.put_async(
+        payload.view,
+        payload.name,
+        session_upload_owner(),
+        ttl_seconds=DEFAULT_CONFIG["upload_session_ttl_hours"] * 3600,
+        digest=payload.digest,
+    )
+
+
+def stored_upload_path(future):
+    """等待后台落盘完成并返回存储路径，落盘失败时返回None（报告不嵌入该照片）"""
+    try:
+        return future.result()["path"]
+    except Exception as e:
+        logger.warning(f"上传图片保存失败: {e}")
+        return None
+
+
+def retain_report_images(upload_store, report_data):
+    """报告引用其现场照片，照片在报告保留期内不被回收，历史报告导出PDF时仍可嵌入"""
+    ttl_seconds = DEFAULT_CONFIG["upload_report_retention_days"] * 86400
+    for image in report_data.get("evidence_images", []):
+        upload_store.acquire_path(image["path"], f"report:{report_data['report_id']}", ttl_seconds)
+
+
+def release_kb_uploads(upload_store, ingest_queue):
+    """清空知识库后释放知识库对上传文档的引用，仍在入库队列中的文档除外"""
+    keep = [
+        digest for digest in map(upload_store.digest_for_path, ingest_queue.active_files()) if digest
+    ]
+    released = upload_store.release_owner("kb", keep=keep)
+    logger.info(f"已释放知识库文档引用 {released} 个")
+
+
+def render_ingest_jobs(ingest_queue):
+    """显示最近的入库任务；有未完成任务时以局部刷新方式轮询进度"""
+    def _render():
+        jobs = ingest_queue.list_jobs(limit=5)
+        if not jobs:
+            return
+        st.markdown("**📥 入库任务**")
+        for job in jobs:
+            status = JOB_STATUS_LABELS.get(job["status"], job["status"])
+            line = f"#{job['id']} {job['file_name']} · {status}"
+            if job["status"] == "embedding":
+                line += f"（{job['num_input_chunks']} 个片段）"
+            elif job["status"] == "done":
+                line += f"（写入 {job['num_chunks']} 个片段，合并近重复 {job['num_duplicates']} 个）"
+            elif job["status"] == "failed":
+                line += f"：{job['error']}"
+            st.caption(line)
+
+        active = ingest_queue.has_active_jobs()
+        if st.session_state.get("ingest_polling") and not active:
+            # 任务全部结束后整页刷新一次，更新知识库统计
+            st.session_state.ingest_polling = False
+            st.rerun()
+        st.session_state.ingest_polling = active
+
+    st.fragment(_render, run_every=2 if ingest_queue.has_active_jobs() else None)()
 
 
 def init_chat():
@@ -93,12 +189,12 @@ def init_session_state():
         st.session_state.uploaded_image = None
     if "image_uploaded" not in st.session_state:
         st.session_state.image_uploaded = False
-    if "uploaded_image_path" not in st.session_state:
-        st.session_state.uploaded_image_path = None
-    if "current_temp_path" not in st.session_state:
-        st.session_state.current_temp_path = None
-    if "temp_files" not in st.session_state:
-        st.session_state.temp_files = []  # 用于跟踪临时文件
+    if "current_image" not in st.session_state:
+        st.session_state.current_image = None
+    if "current_upload" not in st.session_state:
+        st.session_state.current_upload = None
+    if "current_upload_digest" not in st.session_state:
+        st.session_state.current_upload_digest = None
 
 
 def sync_session_state():
@@ -111,8 +207,9 @@ def sync_session_state():
         "current_report_formatted": None,
         "uploaded_image": None,
         "image_uploaded": False,
-        "uploaded_image_path": None,
-        "current_temp_path": None,
+        "current_image": None,
+        "current_upload": None,
+        "current_upload_digest": None,
         "uploaded_file": None
     }
 
@@ -137,42 +234,31 @@ def handle_text_input(prompt, input_mode, chat_history):
     return False
 
 
-def handle_image_upload(uploaded_file, chat_history):
+def handle_image_upload(uploaded_file, chat_history, upload_store):
     """处理图片上传"""
     if uploaded_file is not None and not st.session_state.get("is_processing", False):
-        with st.spinner("正在上传图片..."):
-            temp_path = Path(DEFAULT_CONFIG["upload_dir"]) / uploaded_file.name
-            FileUtils.ensure_dir(DEFAULT_CONFIG["upload_dir"])
-
-            with open(temp_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-
-            st.session_state.uploaded_image_path = str(temp_path)
-            st.session_state.image_uploaded = True
-            st.session_state.current_temp_path = str(temp_path)
-            st.session_state.uploaded_file = uploaded_file
-            
-            # 添加到临时文件跟踪列表
-            if "temp_files" not in st.session_state:
-                st.session_state.temp_files = []
-            st.session_state.temp_files.append(str(temp_path))
-
-            is_valid, message = FileUtils.validate_image(str(temp_path))
-
-            if not is_valid:
-                st.error(f"❌ {message}")
-                # 验证失败时立即清理文件
-                try:
-                    temp_path.unlink(missing_ok=True)
-                    if str(temp_path) in st.session_state.temp_files:
-                        st.session_state.temp_files.remove(str(temp_path))
-                except:
-                    pass
-                return False
-            else:
-                st.success("✅ 图片上传成功")
-                logger.info(f"图片上传成功: {temp_path}")
-                return True
+        payload = st.session_state.current_image
+        # 页面重新运行时同一张图片不重复处理
+        if payload is None or st.session_state.get("current_upload_file_id") != uploaded_file.file_id:
+            with st.spinner("正在上传图片..."):
+                # 直接使用上传缓冲区的 memoryview，校验与哈希都在内存中完成，不先落盘
+                payload = ImagePayload(uploaded_file.getbuffer(), uploaded_file.name)
+                is_valid, message = payload.validate()
+                if not is_valid:
+                    st.error(f"❌ {message}")
+                    return False
+
+                # 按内容寻址异步落盘，其他会话上传的同名图片不会覆盖本会话的文件
+                st.session_state.current_upload = persist_session_upload(upload_store, payload)
+                st.session_state.current_image = payload
+                st.session_state.current_upload_file_id = uploaded_file.file_id
+                st.session_state.current_upload_digest = payload.digest
+                st.session_state.image_uploaded = True
+                st.session_state.uploaded_file = uploaded_file
+                logger.info(f"图片上传成功: {payload.name}（{payload.size // 1024} KB）")
+
+        st.success("✅ 图片上传成功")
+        return True
     return False
 
 
@@ -247,9 +333,92 @@ def handle_ai_response(chat_history, multimodal_analyzer, knowledge_retriever,
             st.rerun()
 
 
-def handle_security_assessment(multimodal_analyzer, knowledge_retriever, report_generator,
-                               pdf_exporter, use_cache, report_title, company_name):
+def render_pdf_download(pdf_exporter, report_data, key):
+    """
+    PDF提交到渲染进程池后台生成，完成前局部轮询，完成后直接以内存中的PDF字节提供下载
+    """
+    render_pdf_job(
+        f"{key}:{report_data['report_id']}",
+        lambda: pdf_exporter.submit_export(report_data),
+    )
+
+
+def render_pdf_job(job_key, submit, label="📥 下载 PDF"):
+    """显示后台PDF任务的进度与下载按钮，submit 在首次显示时调用并返回 Future"""
+    jobs = st.session_state.setdefault("pdf_jobs", {})
+    if job_key not in jobs:
+        jobs[job_key] = submit()
+        # 只保留最近的导出结果，避免PDF字节在会话中累积
+        while len(jobs) > 10:
+            jobs.pop(next(iter(jobs)))
+    future = jobs[job_key]
+
+    def _render():
+        if not future.done():
+            st.caption("⏳ 正在后台生成 PDF...")
+            return
+        result = future.result()
+        if result.get("success"):
+            st.download_button(
+                label,
+                data=result["data"],
+                file_name=result["filename"],
+                mime="application/pdf",
+                use_container_width=True,
+                on_click="ignore",
+                key=f"{job_key}:download",
+            )
+        else:
+            st.error(f"❌ PDF生成失败: {result.get('error')}")
+
+    st.fragment(_render, run_every=None if future.done() else 1)()
+
+
+def select_reinspection_baseline(report_store, site_id, scope, key):
+    """
+    由用户选择复查基准报告：只列出同一工地、同一检查范围的历史报告，默认不复查
+
+    Returns:
+        ReportStore.reinspection_baseline 返回的基准报告，未选择时返回None
+    """
+    if not site_id:
+        return None
+    candidates = {report["report_id"]: report for report in report_store.list_for_site(site_id, scope)}
+    if not candidates:
+        return None
+    selected = st.selectbox(
+        "复查基准",
+        [None] + list(candidates),
+        format_func=lambda report_id: "不复查（作为新的检查）" if report_id is None else (
+            f"{candidates[report_id]['report_date']} {candidates[report_id]['title']}"
+            f"（{candidates[report_id]['photo_count']} 张照片，{report_id}）"
+        ),
+        key=key,
+        help=f"选择本工地此前的{SCOPE_LABELS[scope]}报告进行复查对比；"
+             "本次照片少于基准时，未出现的隐患记为“本次未覆盖”，不判定为已整改",
+    )
+    return report_store.reinspection_baseline(selected) if selected else None
+
+
+def reinspection_events(report_generator, analysis_result, previous_report, retrieved_docs, metadata):
+    """复查报告一次生成完毕，转换为与 stream_report 相同的事件序列供页面显示"""
+    with st.spinner(f"正在与基准检查（{previous_report['report_date']}）对比..."):
+        report_data = report_generator.generate_reinspection_report(
+            analysis_result, previous_report, retrieved_docs, metadata
+        )
+    if report_data.get("success") is False:
+        yield {"event": "error", "error": report_data.get("error")}
+        return
+    yield {"event": "start", "report": dict(report_data, sections={})}
+    for section, content in report_data["sections"].items():
+        yield {"event": "section", "section": section, "content": content}
+    yield {"event": "done", "report": report_data}
+
+
+def handle_security_assessment(multimodal_analyzer, hazard_map, report_generator, pdf_exporter,
+                               report_store, upload_store, use_cache, report_title, company_name, site_id):
     """处理安全评估"""
+    previous_report = select_reinspection_baseline(report_store, site_id, "single", "single_baseline")
     if st.button("🚀 开始安全评估", type="primary", use_container_width=True):
         with st.spinner("正在进行安全评估，请稍候..."):
             try:
@@ -259,8 +428,8 @@ def handle_security_assessment(multimodal_analyzer, knowledge_retriever, report_
                 status_text.text("步骤 1/5: 分析图片中的安全隐患...")
                 progress_bar.progress(20)
 
-                analysis_result = multimodal_analyzer.analyze_image(
-                    st.session_state.current_temp_path,
+                analysis_result = multimodal_analyzer.analyze_payload(
+                    st.session_state.current_image,
                     use_cache=use_cache,
                 )
 
@@ -271,10 +440,8 @@ def handle_security_assessment(multimodal_analyzer, knowledge_retriever, report_
                 progress_bar.progress(40)
                 status_text.text("步骤 2/5: 检索相关安全规范...")
 
-                query = RoutingUtils.extract_hazard_info(analysis_result)
-                retrieved_docs = knowledge_retriever.retrieve(
-                    query if query else "施工安全", "safe"
-                )
+                # 常见隐患直接读取预计算的法规映射表，无需实时计算查询向量
+                retrieved_docs = hazard_map.lookup_for_analysis(analysis_result)
 
                 progress_bar.progress(60)
                 status_text.text("步骤 3/5: 生成安全评估报告...")
@@ -282,21 +449,10 @@ def handle_security_assessment(multimodal_analyzer, knowledge_retriever, report_
                 report_metadata = {
                     "title": report_title,
                     "company": company_name,
+                    "site_id": site_id,
                     "date": datetime.now().strftime("%Y年%m月%d日"),
                 }
 
-                report_data = report_generator.generate_report(
-                    analysis_result,
-                    retrieved_docs,
-                    report_metadata,
-                )
-
-                progress_bar.progress(80)
-                status_text.text("步骤 4/5: 准备导出...")
-
-                progress_bar.progress(100)
-                status_text.text("✅ 评估完成！")
-
                 st.markdown("---")
 
                 # 评估结果区域
@@ -320,16 +476,91 @@ def handle_security_assessment(multimodal_analyzer, knowledge_retriever, report_
 
                 st.markdown("---")
 
-                # 报告区域
+                # 报告区域：章节边生成边显示
                 with st.container():
                     st.subheader("📄 安全评估报告")
 
-                    formatted_report = report_generator.format_report_for_display(report_data)
-                    st.markdown(formatted_report)
+                    header_placeholder = st.empty()
+                    section_placeholders = {}
+                    section_texts = {}
+                    report_data = None
+                    num_sections = len(report_generator.report_template["sections"]) if hazards else 1
 
+                    # 用户选择了复查基准时生成复查报告，只为新增或变化的隐患调用大模型
+                    if previous_report:
+                        report_events = reinspection_events(
+                            report_generator, analysis_result, previous_report, retrieved_docs, report_metadata
+                        )
+                    else:
+                        report_events = report_generator.stream_report(
+                            analysis_result, retrieved_docs, report_metadata
+                        )
+
+                    for event in report_events:
+                        if event["event"] == "start":
+                            header_placeholder.markdown(
+                                report_generator.format_report_for_display(event["report"])
+                            )
+                        elif event["event"] in ("token", "section"):
+                            section = event["section"]
+                            if section not in section_placeholders:
+                                section_placeholders[section] = st.empty()
+                            if event["event"] == "token":
+                                section_texts[section] = section_texts.get(section, "") + event["content"]
+                            else:
+                                section_texts[section] = event["content"]
+                                progress_bar.progress(60 + 20 * len(section_texts) // num_sections)
+                            section_placeholders[section].markdown(
+                                f"## {section}\n{section_texts[section]}"
+                            )
+                        elif event["event"] == "done":
+                            report_data = event["report"]
+                        elif event["event"] == "error":
+                            st.error(f"❌ 报告生成失败: {event['error']}")
+                            return
+
+                    sources = list(report_data.get("section_sources", {}).values())
+                    if sources:
+                        st.caption(
+                            f"规则生成 {sources.count('rule')} 个章节，缓存命中 {sources.count('cache')} 个，"
+                            f"措施片段拼装 {sources.count('snippet')} 个，沿用上次检查 {sources.count('history')} 个，"
+                            f"调用大模型 {sources.count('llm')} 个"
+                        )
+                    tier_stats = report_generator.get_tier_stats()
+                    if tier_stats:
+                        with st.expander("模型档位用量（服务启动以来累计）"):
+                            st.table([
+                                {
+                                    "档位": tier,
+                                    "模型": entry["model"],
+                                    "调用次数": entry["calls"],
+                                    "平均延迟(ms)": entry["avg_ms"],
+                                    "输入tokens": entry["input_tokens"],
+                                    "输出tokens": entry["output_tokens"],
+                                }
+                                for tier, entry in tier_stats.items()
+                            ])
+
+                    # PDF中嵌入压缩后的现场照片，图注列出识别的隐患
+                    image_path = stored_upload_path(st.session_state.current_upload)
+                    report_data["evidence_images"] = evidence_images(
+                        {st.session_state.current_image.name: image_path} if image_path else {}, analysis_result
+                    )
+
+                    # 报告只生成一次，历史查看与导出从报告存储读取
+                    report_store.save(report_data, analysis_result)
+                    retain_report_images(upload_store, report_data)
+
+                    formatted_report = report_generator.format_report_for_display(report_data)
                     st.session_state.current_report = report_data
                     st.session_state.current_report_formatted = formatted_report
 
+                progress_bar.progress(80)
+                status_text.text("步骤 4/5: 准备导出...")
+
+                progress_bar.progress(100)
+                status_text.text("✅ 评估完成！")
+
                 st.markdown("---")
 
                 # 导出区域
@@ -348,69 +579,212 @@ def handle_security_assessment(multimodal_analyzer, knowledge_retriever, report_
                         )
 
                     with export_col2:
-                        if st.button("📑 生成并下载 PDF", use_container_width=True):
-                            with st.spinner("正在生成 PDF..."):
-                                pdf_result = pdf_exporter.export_to_pdf(report_data)
-
-                                if pdf_result.get("success"):
-                                    with open(pdf_result["output_path"], "rb") as f:
-                                        st.download_button(
-                                            "📥 下载 PDF",
-                                            data=f,
-                                            file_name=pdf_result["filename"],
-                                            mime="application/pdf",
-                                            use_container_width=True,
-                                        )
-                                    st.success(f"✅ PDF已生成: {pdf_result['filename']}")
-                                else:
-                                    st.error(f"❌ PDF生成失败: {pdf_result.get('error')}")
+                        render_pdf_download(pdf_exporter, report_data, "assessment")
 
             except Exception as e:
                 logger.error(f"安全评估过程出错: {e}")
                 st.error(f"❌ 评估过程出错: {str(e)}")
 
 
-def cleanup_resources():
+def handle_inspection_round(multimodal_analyzer, hazard_map, report_generator, report_store,
+                            upload_store, use_cache, report_title, company_name, site_id):
+    """一轮巡检的多张照片并发分析，跨照片去重后生成一份汇总报告"""
+    uploaded_files = st.file_uploader(
+        "上传本轮巡检照片",
+        type=["jpg", "jpeg", "png"],
+        accept_multiple_files=True,
+        key="inspection_uploader",
+    )
+    previous_report = select_reinspection_baseline(report_store, site_id, "round", "round_baseline")
+    if not uploaded_files or not st.button("🚀 生成巡检汇总报告", key="inspection_run"):
+        return
+
+    photos, uploads = {}, {}
+    for index, uploaded_file in enumerate(uploaded_files, 1):
+        payload = ImagePayload(uploaded_file.getbuffer(), uploaded_file.name)
+        is_valid, message = payload.validate()
+        if is_valid:
+            # 照片标识带上传序号，同名照片（如不同手机的 IMG_0001.jpg）各自保留，文件名仅用于显示
+            photo_id = f"#{index} {uploaded_file.name}"
+            photos[photo_id] = payload
+            # 按内容寻址异步落盘，与其他轮次或会话的同名照片互不覆盖；分析不等待落盘
+            uploads[photo_id] = persist_session_upload(upload_store, payload)
+        else:
+            st.warning(f"⚠️ {uploaded_file.name}: {message}")
+
+    if not photos:
+        st.error("❌ 没有可分析的照片")
+        return
+
+    async def analyze_all():
+        semaphore = asyncio.Semaphore(DEFAULT_CONFIG["inspection_max_concurrency"])
+
+        async def analyze(payload):
+            async with semaphore:
+                return await multimodal_analyzer.aanalyze_payload(payload, use_cache=use_cache)
+
+        results = await asyncio.gather(*[analyze(payload) for payload in photos.values()])
+        return dict(zip(photos, results))
+
+    with st.spinner(f"正在分析 {len(photos)} 张照片..."):
+        merged_analysis = merge_analyses(asyncio.run(analyze_all()))
+    if merged_analysis.get("failed_photos"):
+        st.warning(f"⚠️ 以下照片分析失败，未计入报告: {'、'.join(merged_analysis['failed_photos'])}")
+    if not merged_analysis.get("success"):
+        st.error(f"❌ {merged_analysis.get('error')}")
+        return
+
+    st.caption(
+        f"{merged_analysis['photo_count']} 张照片共识别 "
+        f"{sum(len(h['evidence']) for h in merged_analysis['hazards'])} 处隐患，"
+        f"去重后 {len(merged_analysis['hazards'])} 类，加权风险分 {merged_analysis['risk_score']}"
+    )
+
+    with st.spinner("正在生成巡检汇总报告..."):
+        report_data = report_generator.generate_batch_report(
+            merged_analysis,
+            hazard_map.lookup_for_analysis(merged_analysis),
+            {
+                "title": report_title,
+                "company": company_name,
+                "site_id": site_id,
+                "date": datetime.now().strftime("%Y年%m月%d日"),
+            },
+            previous=previous_report,
+        )
+    if report_data.get("success") is False:
+        st.error(f"❌ 报告生成失败: {report_data.get('error')}")
+        return
+    if report_data.get("reinspection_complete") is False:
+        st.warning("⚠️ 本轮照片未完整覆盖基准轮次，基准中本次未出现的隐患记为“本次未覆盖”，未判定为已整改")
+
+    stored_paths = {
+        photo: stored_upload_path(upload)
+        for photo, upload in uploads.items()
+        if photo not in merged_analysis["failed_photos"]
+    }
+    report_data["evidence_images"] = evidence_images(
+        {photo: path for photo, path in stored_paths.items() if path}, merged_analysis
+    )
+    report_store.save(report_data, merged_analysis)
+    retain_report_images(upload_store, report_data)
+    formatted_report = report_generator.format_report_for_display(report_data)
+    st.markdown(formatted_report)
+    st.download_button(
+        "📄 下载为 Markdown",
+        data=formatted_report,
+        file_name=f"{report_data['report_id']}.md",
+        mime="text/markdown",
+        key="inspection_download_md",
+    )
+    st.caption("汇总报告已保存，可在侧边栏“历史报告”中查看与导出PDF")
+
+
+def render_report_history_filters(report_store, pdf_exporter):
+    """历史报告查询条件与结果列表，选中的报告在主区域显示"""
+    filter_site = st.text_input("工地/项目编号", key="history_site")
+    filter_company = st.text_input("公司名称", key="history_company")
+    filter_risk = st.selectbox(
+        "整体风险",
+        [""] + list(RISK_LEVELS),
+        format_func=lambda level: RISK_LEVELS[level]["label"] if level else "全部",
+        key="history_risk",
+    )
+    filter_hazard = st.text_input("隐患类型", key="history_hazard", help="如：临边防护、安全帽")
+    date_range = st.date_input("日期范围", value=(), key="history_dates")
+    date_from = date_range[0] if len(date_range) > 0 else None
+    date_to = date_range[1] if len(date_range) > 1 else date_from
+
+    reports = report_store.query(
+        site_id=filter_site.strip() or None,
+        company=filter_company.strip() or None,
+        date_from=date_from,
+        date_to=date_to,
+        overall_risk=filter_risk or None,
+        hazard_type=filter_hazard.strip() or None,
+    )
+    if not reports:
+        st.caption("没有符合条件的报告")
+        return
+
+    selected = st.selectbox(
+        f"查询结果（{len(reports)} 份）",
+        reports,
+        format_func=lambda r: (
+            f"{r['report_date']} {r['site_id'] or r['company'] or r['title']} · "
+            f"{RISK_LEVELS.get(r['overall_risk'], RISK_LEVELS['low'])['label']} · {r['hazard_count']}项隐患"
+        ),
+        key="history_selected",
+    )
+    if st.button("查看报告", key="history_view"):
+        st.session_state.history_report_id = selected["report_id"]
+
+    if st.button(f"📚 导出合订本（{len(reports)} 份）", key="history_compendium"):
+        st.session_state.history_compendium_ids = tuple(r["report_id"] for r in reports)
+    compendium_ids = st.session_state.get("history_compendium_ids")
+    if compendium_ids:
+        # 查询条件变化后已提交的合订本仍可下载，直到再次导出
+        render_pdf_job(
+            "compendium:" + ",".join(compendium_ids),
+            lambda: pdf_exporter.submit_compendium(
+                [report for report in map(report_store.get, compendium_ids) if report]
+            ),
+            label=f"📥 下载合订本（{len(compendium_ids)} 份）",
+        )
+
+
+def render_history_report(report_store, report_generator, pdf_exporter):
+    """显示从报告存储读取的历史报告及导出按钮"""
+    report_id = st.session_state.get("history_report_id")
+    if not report_id:
+        return
+    report_data = report_store.get(report_id)
+    if report_data is None:
+        st.session_state.history_report_id = None
+        return
+
+    with st.container(border=True):
+        col_title, col_close = st.columns([5, 1])
+        with col_title:
+            st.subheader("📂 历史报告")
+        with col_close:
+            if st.button("关闭", key="history_close", use_container_width=True):
+                st.session_state.history_report_id = None
+                st.rerun()
+
+        formatted_report = report_generator.format_report_for_display(report_data)
+        st.markdown(formatted_report)
+
+        export_col1, export_col2 = st.columns([1, 1])
+        with export_col1:
+            st.download_button(
+                "📄 下载为 Markdown",
+                data=formatted_report,
+                file_name=f"{report_id}.md",
+                mime="text/markdown",
+                use_container_width=True,
+                key="history_download_md",
+            )
+        with export_col2:
+            render_pdf_download(pdf_exporter, report_data, "history")
+    st.markdown("---")
+
+
+def cleanup_resources(upload_store):
     """清理资源，防止内存泄漏"""
     # 限制消息历史长度
     if hasattr(st.session_state, 'messages') and len(st.session_state.messages) > 100:
         st.session_state.messages = st.session_state.messages[-50:]
         logger.debug("消息历史已截断")
 
-    # 清理临时文件（排除正在使用的图片）
-    temp_files_to_clean = []
-    if hasattr(st.session_state, 'temp_files'):
-        temp_files_to_clean.extend(st.session_state.temp_files)
-    
-    # 只有在图片未被使用时才清理
-    current_image_path = None
-    if hasattr(st.session_state, 'uploaded_image_path'):
-        current_image_path = st.session_state.uploaded_image_path
-    
-    # 过滤掉当前正在显示的图片
-    filtered_files = []
-    for temp_file in temp_files_to_clean:
-        if temp_file != current_image_path:
-            filtered_files.append(temp_file)
-    
-    # 执行文件清理
-    cleaned_count = 0
-    for temp_file in filtered_files:
-        try:
-            temp_path = Path(temp_file)
-            if temp_path.exists() and temp_path.is_file():
-                temp_path.unlink(missing_ok=True)
-                cleaned_count += 1
-                logger.debug(f"已清理临时文件: {temp_file}")
-        except Exception as e:
-            logger.warning(f"清理临时文件失败 {temp_file}: {e}")
-    
-    if cleaned_count > 0:
-        logger.info(f"共清理 {cleaned_count} 个临时文件")
-    
-    # 清空临时文件列表
-    if hasattr(st.session_state, 'temp_files'):
-        st.session_state.temp_files = []
+    # 释放本会话对上传文件的引用（排除正在使用的图片）；
+    # 文件可能仍被其他会话或报告引用，由存储在没有引用后统一回收
+    current_digest = st.session_state.get("current_upload_digest")
+    released = upload_store.release_owner(
+        session_upload_owner(), keep=[current_digest] if current_digest else []
+    )
+    if released > 0:
+        logger.debug(f"已释放 {released} 个上传文件引用")
 
 
 def main():
@@ -431,10 +805,12 @@ def main():
     sync_session_state()
 
     # 初始化工具
-    multimodal_analyzer, knowledge_retriever, report_generator, pdf_exporter = init_tools()
+    (multimodal_analyzer, knowledge_retriever, report_generator,
+     pdf_exporter, hazard_map, ingest_queue, report_store, upload_store) = init_tools()
 
     # 检查工具初始化
-    if not all([multimodal_analyzer, knowledge_retriever, report_generator, pdf_exporter]):
+    if not all([multimodal_analyzer, knowledge_retriever, report_generator, pdf_exporter, hazard_map,
+                ingest_queue, report_store, upload_store]):
         st.error("❌ 系统初始化失败，请检查配置")
         return
 
@@ -465,6 +841,7 @@ def main():
         with st.expander("📋 报告设置", expanded=True):
             report_title = st.text_input("报告标题", value="施工现场安全评估报告")
             company_name = st.text_input("公司名称", value="")
+            site_id = st.text_input("工地/项目编号", value="", help="用于按工地查询历史报告")
 
         st.markdown("---")
 
@@ -485,29 +862,76 @@ def main():
             )
 
             if uploaded_doc is not None:
-                doc_category = st.selectbox("文档分类", ["safe"])
+                doc_category = st.selectbox(
+                    "文档分类",
+                    ["safe"] + list(KB_SHARDS),
+                    format_func=lambda name: "自动分片" if name == "safe" else KB_SHARDS[name]["label"],
+                    help="自动分片会按内容将每个片段路由到对应专业分片",
+                )
                 if st.button("添加到知识库"):
-                    temp_path = Path(DEFAULT_CONFIG["upload_dir"]) / uploaded_doc.name
-                    FileUtils.ensure_dir(DEFAULT_CONFIG["upload_dir"])
-
-                    with st.spinner("正在上传文件..."):
-                        # 保存文件
-                        with open(temp_path, "wb") as f:
-                            f.write(uploaded_doc.getbuffer())
-
-                        # 验证文件
-                        is_valid = FileUtils.validate_file(str(temp_path))
-                        if not is_valid:
-                            st.error("❌ 文件验证失败，请检查文件类型和大小")
-                        else:
-                            with st.spinner("正在处理文档..."):
-                                result = knowledge_retriever.add_documents(
-                                    str(temp_path), doc_category
-                                )
-                                if result.get("success"):
-                                    st.success(f"✅ 成功添加 {result['num_chunks']} 个文档片段")
-                                else:
-                                    st.error(f"❌ 添加失败: {result.get('error')}")
+                    # 按内容寻址保存（保留原文件名），知识库持有引用，重建时仍可读取源文件
+                    stored = upload_store.put(uploaded_doc.getbuffer(), uploaded_doc.name, "kb")
+                    temp_path = Path(stored["path"])
+
+                    # 验证文件
+                    is_valid = FileUtils.validate_file(str(temp_path))
+                    if not is_valid:
+                        upload_store.release(stored["digest"], "kb")
+                        st.error("❌ 文件验证失败，请检查文件类型和大小")
+                    else:
+                        # 入库在后台任务队列中执行，页面不阻塞
+                        job_id = ingest_queue.submit(str(temp_path), doc_category)
+                        st.success(f"✅ 已加入入库队列（任务 #{job_id}）")
+
+            render_ingest_jobs(ingest_queue)
+
+            st.markdown("**🔄 版本化重建**")
+            rebuild_status = knowledge_retriever.get_rebuild_status()
+            st.caption(
+                f"当前版本 v{rebuild_status['active_version']}"
+                + (f"，可回滚至 v{rebuild_status['previous_version']}"
+                   if rebuild_status.get("previous_version") is not None else "")
+            )
+            if rebuild_status.get("status") == "building":
+                st.progress(
+                    rebuild_status["processed_files"] / max(rebuild_status["total_files"], 1),
+                    text=f"正在后台构建 v{rebuild_status['version']}（查询不受影响）",
+                )
+            elif rebuild_status.get("status") == "failed":
+                st.error(f"❌ 重建失败: {rebuild_status.get('error')}")
+
+            rebuild_chunk_size = st.number_input(
+                "片段长度", min_value=100, max_value=2000, value=DEFAULT_CONFIG["chunk_size"], step=50
+            )
+            rebuild_chunk_overlap = st.number_input(
+                "片段重叠", min_value=0, max_value=500, value=DEFAULT_CONFIG["chunk_overlap"], step=10
+            )
+            rebuild_model = st.text_input("嵌入模型", value=DEFAULT_CONFIG["embedding_model"])
+            col_rebuild, col_rollback = st.columns(2)
+            with col_rebuild:
+                if st.button("后台重建"):
+                    result = knowledge_retriever.rebuild(
+                        chunk_size=int(rebuild_chunk_size),
+                        chunk_overlap=int(rebuild_chunk_overlap),
+                        embedding_model=rebuild_model,
+                    )
+                    if result.get("success"):
+                        st.success(f"✅ 已开始构建 v{result['version']}")
+                    else:
+                        st.error(f"❌ {result.get('error')}")
+            with col_rollback:
+                if st.button("回滚版本"):
+                    result = knowledge_retriever.rollback()
+                    if result.get("success"):
+                        st.success(f"✅ 已回滚至 v{result['version']}")
+                    else:
+                        st.error(f"❌ {result.get('error')}")
+
+        st.markdown("---")
+
+        # 历史报告
+        with st.expander("🗂️ 历史报告", expanded=False):
+            render_report_history_filters(report_store, pdf_exporter)
 
         # 系统信息
         st.markdown("---")
@@ -516,6 +940,10 @@ def main():
         st.metric(
             label="安全规范文档", value=f"{safe_stats.get('document_count', 0)} 个片段"
         )
+        if safe_stats.get("sources"):
+            st.caption(
+                f"来源文件 {len(safe_stats['sources'])} 个，最近入库 {safe_stats.get('last_ingest_at') or '-'}"
+            )
         st.metric(
             label="系统状态", value="正常运行"
         )
@@ -524,14 +952,20 @@ def main():
         st.markdown("### ⚠️ 危险操作")
         if st.button("🗑️ 清空知识库 (谨慎操作)"):
             if st.checkbox("确认清空所有知识库数据"):
-                knowledge_retriever.clear_collection("safe")
-                st.success("✅ 知识库已清空")
-                st.rerun()
+                result = knowledge_retriever.clear_collection("safe")
+                if result.get("success"):
+                    release_kb_uploads(upload_store, ingest_queue)
+                    st.success("✅ 知识库已清空")
+                    st.rerun()
+                else:
+                    st.error(f"❌ {result.get('error')}")
 
     # 主内容区域
     st.title("建筑施工智能安全助手")
     st.markdown("---")
 
+    render_history_report(report_store, report_generator, pdf_exporter)
+
     # 智能助手区域
     st.header("💬 智能助手")
     st.markdown("通过聊天或上传图片获取安全评估和建议")
@@ -555,7 +989,7 @@ def main():
         if st.session_state.image_uploaded:
             st.markdown(get_image_upload_message(), unsafe_allow_html=True)
             st.image(
-                st.session_state.uploaded_image_path,
+                st.session_state.uploaded_file,
                 caption="上传的施工场景照片",
                 use_column_width=True  # 使用列宽自适应，避免图片过大
             )
@@ -599,7 +1033,7 @@ def main():
     text_processed = handle_text_input(prompt, input_mode, chat_history)
 
     if not text_processed:  # 只有文字输入未处理时才处理图片
-        image_processed = handle_image_upload(uploaded_file, chat_history)
+        image_processed = handle_image_upload(uploaded_file, chat_history, upload_store)
 
         if image_processed:
             st.markdown("---")
@@ -608,29 +1042,33 @@ def main():
             col_btn1, col_btn2 = st.columns([1, 1])
             with col_btn1:
                 handle_security_assessment(
-                    multimodal_analyzer, knowledge_retriever, report_generator,
-                    pdf_exporter, use_cache, report_title, company_name
+                    multimodal_analyzer, hazard_map, report_generator, pdf_exporter,
+                    report_store, upload_store, use_cache, report_title, company_name, site_id
                 )
 
             with col_btn2:
                 if st.button("❌ 取消", use_container_width=True):
-                    # 清理上传的图片文件
-                    if hasattr(st.session_state, 'uploaded_image_path') and st.session_state.uploaded_image_path:
-                        try:
-                            temp_path = Path(st.session_state.uploaded_image_path)
-                            if temp_path.exists():
-                                temp_path.unlink(missing_ok=True)
-                                logger.info(f"已删除取消的图片文件: {st.session_state.uploaded_image_path}")
-                        except Exception as e:
-                            logger.warning(f"删除图片文件失败: {e}")
-                    
+                    # 释放上传图片的引用（等待后台落盘完成，避免之后再登记引用），文件由存储在没有引用后回收
+                    if st.session_state.current_upload is not None:
+                        stored_upload_path(st.session_state.current_upload)
+                        upload_store.release(st.session_state.current_upload_digest, session_upload_owner())
+                        logger.info(f"已取消图片: {st.session_state.current_image.name}")
+
                     # 重置状态
                     st.session_state.image_uploaded = False
-                    st.session_state.uploaded_image_path = None
                     st.session_state.uploaded_file = None
-                    st.session_state.current_temp_path = None
+                    st.session_state.current_image = None
+                    st.session_state.current_upload = None
+                    st.session_state.current_upload_digest = None
                     st.rerun()
 
+    # 巡检批量评估
+    with st.expander("🗂️ 巡检批量评估（多张照片汇总为一份报告）", expanded=False):
+        handle_inspection_round(
+            multimodal_analyzer, hazard_map, report_generator, report_store,
+            upload_store, use_cache, report_title, company_name, site_id
+        )
+
     # 处理AI响应（放在最后，确保状态已更新）
     handle_ai_response(
         chat_history, multimodal_analyzer, knowledge_retriever,
@@ -638,7 +1076,7 @@ def main():
     )
 
     # 清理资源
-    cleanup_resources()
+    cleanup_resources(upload_store)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,146 @@
+"""
+近重复片段去重测试：签名稳定性、阈值判定、重复来源回写与索引持久化
+
+运行: python -m unittest tests.test_dedup
+"""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+from langchain_core.documents import Document
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.tools.dedup import MinHasher, NearDuplicateIndex
+
+ARTICLE = (
+    "第3.2.1条 脚手架作业层应满铺脚手板，外侧应设置挡脚板和防护栏杆，"
+    "防护栏杆高度不应低于1.2米，挡脚板高度不应低于180毫米，并应挂设密目式安全立网。"
+)
+# 只改动一个字，与原文高度相似
+NEAR_DUPLICATE = ARTICLE.replace("满铺", "铺满")
+UNRELATED = "第5.1.4条 施工现场临时用电必须采用TN-S接零保护系统，配电箱应设置漏电保护器并定期检测。"
+
+
+def _doc(text, source, page=None):
+    metadata = {"source": source}
+    if page is not None:
+        metadata["page"] = page
+    return Document(page_content=text, metadata=metadata)
+
+
+class TestMinHasher(unittest.TestCase):
+    def test_signature_is_deterministic(self):
+        first = MinHasher().signature(ARTICLE)
+        second = MinHasher().signature(ARTICLE)
+        np.testing.assert_array_equal(first, second)
+        self.assertEqual(first.dtype, np.uint32)
+
+    def test_normalize_ignores_layout(self):
+        hasher = MinHasher()
+        reformatted = ARTICLE.replace("，", " ,\n")
+        self.assertEqual(MinHasher.similarity(hasher.signature(ARTICLE), hasher.signature(reformatted)), 1.0)
+
+    def test_similarity_orders_near_and_unrelated(self):
+        hasher = MinHasher()
+        base = hasher.signature(ARTICLE)
+        self.assertGreaterEqual(MinHasher.similarity(base, hasher.signature(NEAR_DUPLICATE)), 0.8)
+        self.assertLess(MinHasher.similarity(base, hasher.signature(UNRELATED)), 0.2)
+
+    def test_empty_text(self):
+        signature = MinHasher().signature("  ，。 ")
+        self.assertFalse(signature.any())
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.index_path = Path(self._tmp.name) / "dedup" / "safe.json"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_near_duplicates_are_dropped(self):
+        index = NearDuplicateIndex(self.index_path, similarity_threshold=0.8)
+        docs = [_doc(ARTICLE, "a.pdf", 1), _doc(NEAR_DUPLICATE, "b.pdf", 4), _doc(UNRELATED, "c.pdf")]
+
+        kept_docs, kept_ids, updated_ids = index.deduplicate(docs)
+
+        self.assertEqual([doc.metadata["source"] for doc in kept_docs], ["a.pdf", "c.pdf"])
+        self.assertEqual(len(kept_ids), 2)
+        self.assertEqual(len(index), 2)
+        # 同一批次内的重复直接体现在待写入片段的元数据中，无需更新已入库片段
+        self.assertEqual(updated_ids, [])
+        self.assertEqual(json.loads(kept_docs[0].metadata["duplicate_sources"]), ["a.pdf#p1", "b.pdf#p4"])
+        self.assertEqual(json.loads(kept_docs[1].metadata["duplicate_sources"]), ["c.pdf"])
+
+    def test_below_threshold_is_kept(self):
+        hasher = MinHasher()
+        score = MinHasher.similarity(hasher.signature(ARTICLE), hasher.signature(NEAR_DUPLICATE))
+        # 阈值略高于两段文本的相似度时，两段都应保留
+        index = NearDuplicateIndex(self.index_path, similarity_threshold=min(1.0, score + 0.01))
+        kept_docs, _, _ = index.deduplicate([_doc(ARTICLE, "a.pdf"), _doc(NEAR_DUPLICATE, "b.pdf")])
+        self.assertEqual(len(kept_docs), 2)
+
+    def test_later_batch_updates_existing_sources(self):
+        index = NearDuplicateIndex(self.index_path)
+        _, kept_ids, _ = index.deduplicate([_doc(ARTICLE, "a.pdf")])
+
+        kept_docs, _, updated_ids = index.deduplicate([_doc(NEAR_DUPLICATE, "b.pdf")])
+        self.assertEqual(kept_docs, [])
+        self.assertEqual(updated_ids, kept_ids)
+        self.assertEqual(json.loads(index.sources_json(kept_ids[0])), ["a.pdf", "b.pdf"])
+
+        # 同一来源重复入库不会重复登记
+        _, _, updated_ids = index.deduplicate([_doc(ARTICLE, "b.pdf")])
+        self.assertEqual(updated_ids, [])
+        self.assertEqual(json.loads(index.sources_json(kept_ids[0])), ["a.pdf", "b.pdf"])
+
+    def test_chunk_ids_are_stable(self):
+        first = NearDuplicateIndex(self.index_path).deduplicate([_doc(ARTICLE, "a.pdf")])[1]
+        other_path = Path(self._tmp.name) / "other.json"
+        second = NearDuplicateIndex(other_path).deduplicate([_doc(ARTICLE, "b.pdf")])[1]
+        self.assertEqual(first, second)
+
+    def test_save_and_load(self):
+        index = NearDuplicateIndex(self.index_path)
+        _, kept_ids, _ = index.deduplicate([_doc(ARTICLE, "a.pdf"), _doc(UNRELATED, "c.pdf")])
+        index.save()
+
+        restored = NearDuplicateIndex(self.index_path)
+        self.assertEqual(len(restored), 2)
+        kept_docs, _, updated_ids = restored.deduplicate([_doc(NEAR_DUPLICATE, "b.pdf")])
+        self.assertEqual(kept_docs, [])
+        self.assertEqual(updated_ids, [kept_ids[0]])
+
+    def test_reload_discards_unsaved_changes(self):
+        index = NearDuplicateIndex(self.index_path)
+        index.deduplicate([_doc(ARTICLE, "a.pdf")])
+        index.save()
+        index.deduplicate([_doc(UNRELATED, "c.pdf")])
+        self.assertEqual(len(index), 2)
+
+        index.reload()
+        self.assertEqual(len(index), 1)
+
+    def test_clear_removes_file(self):
+        index = NearDuplicateIndex(self.index_path)
+        index.deduplicate([_doc(ARTICLE, "a.pdf")])
+        index.save()
+        index.clear()
+        self.assertEqual(len(index), 0)
+        self.assertFalse(self.index_path.exists())
+
+    def test_corrupted_index_starts_empty(self):
+        self.index_path.parent.mkdir(parents=True)
+        self.index_path.write_text("{not json", encoding="utf-8")
+        self.assertEqual(len(NearDuplicateIndex(self.index_path)), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,233 @@
+"""
+隐患法规映射表测试：版本校验、后台重建、空类别回退到实时检索与持久化
+
+运行: python -m unittest tests.test_hazard_map
+"""
+
+import json
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import HAZARD_TAXONOMY
+from src.tools.hazard_map import HazardRegulationMap
+
+
+class FakeRetriever:
+    """
+    按隐患类别过滤返回预置片段的检索器
+
+    categorized: {类别: [片段]}，按 hazard_category 过滤时返回；
+    semantic: 不带过滤条件的语义检索结果，每次返回同一个列表对象
+    """
+
+    def __init__(self, persist_dir, categorized=None, semantic=None):
+        self.config = {"persist_dir": persist_dir}
+        self.kb_version = 1
+        self.embeddings = object()
+        self.categorized = categorized or {}
+        self.semantic = semantic if semantic is not None else []
+        self.listeners = []
+        self.calls = []
+
+    def add_version_listener(self, callback):
+        self.listeners.append(callback)
+
+    def bump_version(self):
+        self.kb_version += 1
+        for callback in self.listeners:
+            callback(self.kb_version)
+
+    def retrieve(self, query, collection_name="safe", k=None, filter=None):
+        self.calls.append((query, filter))
+        if filter:
+            return self.categorized.get(filter["hazard_category"], [])
+        return self.semantic
+
+
+def _docs(*texts):
+    return [Document(page_content=text, metadata={"source": "规范.pdf"}) for text in texts]
+
+
+class HazardMapTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.persist_dir = self._tmp.name
+        self.table_path = Path(self.persist_dir) / "hazard_regulation_map.json"
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _wait_rebuild(self, hazard_map, timeout=5):
+        deadline = time.monotonic() + timeout
+        while True:
+            thread = hazard_map._rebuild_thread
+            if thread is None:
+                return
+            thread.join(max(0.0, deadline - time.monotonic()))
+            if time.monotonic() > deadline:
+                self.fail("映射表重建未在限定时间内完成")
+
+
+class TestRebuild(HazardMapTestCase):
+    def test_init_does_not_rebuild(self):
+        retriever = FakeRetriever(self.persist_dir, semantic=_docs("通用条文"))
+        hazard_map = HazardRegulationMap(retriever, k=2)
+        self.assertIsNone(hazard_map._rebuild_thread)
+        self.assertEqual(retriever.calls, [])
+        self.assertFalse(hazard_map.is_current)
+
+    def test_rebuild_fills_categories_and_saves(self):
+        retriever = FakeRetriever(
+            self.persist_dir,
+            categorized={"未佩戴安全帽": _docs("安全帽条文1", "安全帽条文2")},
+            semantic=_docs("安全帽条文1", "通用条文"),
+        )
+        hazard_map = HazardRegulationMap(retriever, k=3)
+        hazard_map._rebuild()
+
+        self.assertTrue(hazard_map.is_current)
+        # 过滤结果不足k条时用语义检索补齐并去重
+        self.assertEqual(
+            [doc.page_content for doc in hazard_map.lookup("未佩戴安全帽")],
+            ["安全帽条文1", "安全帽条文2", "通用条文"],
+        )
+        data = json.loads(self.table_path.read_text(encoding="utf-8"))
+        self.assertEqual(data["kb_version"], 1)
+        self.assertEqual(len(data["table"]), len(HAZARD_TAXONOMY))
+
+        restored = HazardRegulationMap(retriever, k=3)
+        self.assertTrue(restored.is_current)
+        self.assertEqual(len(restored.lookup("未佩戴安全帽")), 3)
+
+    def test_rebuild_does_not_mutate_retrieval_results(self):
+        semantic = _docs("通用条文1", "通用条文2")
+        categorized = {"消防隐患": _docs("消防条文")}
+        retriever = FakeRetriever(self.persist_dir, categorized=categorized, semantic=semantic)
+        HazardRegulationMap(retriever, k=3)._rebuild()
+        self.assertEqual([doc.page_content for doc in categorized["消防隐患"]], ["消防条文"])
+        self.assertEqual(len(semantic), 2)
+
+    def test_version_change_triggers_background_rebuild(self):
+        retriever = FakeRetriever(self.persist_dir, semantic=_docs("通用条文"))
+        hazard_map = HazardRegulationMap(retriever, k=1)
+        hazard_map._rebuild()
+
+        retriever.bump_version()
+        self._wait_rebuild(hazard_map)
+
+        self.assertTrue(hazard_map.is_current)
+        self.assertEqual(hazard_map._version, 2)
+
+    def test_missing_embeddings_skips_rebuild(self):
+        retriever = FakeRetriever(self.persist_dir, semantic=_docs("通用条文"))
+        retriever.embeddings = None
+        hazard_map = HazardRegulationMap(retriever)
+        hazard_map._rebuild()
+        self.assertEqual(retriever.calls, [])
+        self.assertFalse(hazard_map.is_current)
+
+
+class TestEmptyCategories(HazardMapTestCase):
+    def test_empty_rebuild_keeps_table_unversioned(self):
+        retriever = FakeRetriever(self.persist_dir)
+        hazard_map = HazardRegulationMap(retriever)
+        hazard_map._rebuild()
+
+        self.assertIsNone(hazard_map._version)
+        self.assertFalse(self.table_path.exists())
+        self.assertIsNone(hazard_map.lookup("未佩戴安全帽"))
+
+    def test_empty_rebuild_keeps_previous_table(self):
+        retriever = FakeRetriever(self.persist_dir, semantic=_docs("通用条文"))
+        hazard_map = HazardRegulationMap(retriever, k=1)
+        hazard_map._rebuild()
+
+        retriever.semantic = []
+        retriever.kb_version = 2
+        hazard_map._rebuild()
+
+        self.assertEqual(hazard_map._version, 1)
+        self.assertEqual(hazard_map.lookup("消防隐患")[0].page_content, "通用条文")
+
+    def test_failed_rebuild_is_throttled(self):
+        retriever = FakeRetriever(self.persist_dir)
+        hazard_map = HazardRegulationMap(retriever)
+        hazard_map._rebuild()
+        refreshed = []
+        hazard_map.refresh = lambda: refreshed.append(True)
+
+        hazard_map._ensure_current()
+        self.assertEqual(refreshed, [])
+
+        # 知识库版本变化后立即重试
+        retriever.kb_version = 2
+        hazard_map._ensure_current()
+        self.assertEqual(refreshed, [True])
+
+    def test_load_ignores_empty_entries(self):
+        self.table_path.write_text(
+            json.dumps({"kb_version": 1, "table": {"消防隐患": []}}, ensure_ascii=False), encoding="utf-8"
+        )
+        hazard_map = HazardRegulationMap(FakeRetriever(self.persist_dir))
+        self.assertIsNone(hazard_map._version)
+        self.assertEqual(hazard_map._table, {})
+
+    def test_corrupted_table_is_ignored(self):
+        self.table_path.write_text("{not json", encoding="utf-8")
+        hazard_map = HazardRegulationMap(FakeRetriever(self.persist_dir))
+        self.assertIsNone(hazard_map._version)
+
+
+class TestLookupForAnalysis(HazardMapTestCase):
+    def _current_map(self, categorized, semantic_after):
+        retriever = FakeRetriever(self.persist_dir, categorized=categorized)
+        hazard_map = HazardRegulationMap(retriever, k=1)
+        hazard_map._rebuild()
+        retriever.semantic = semantic_after
+        retriever.calls.clear()
+        return retriever, hazard_map
+
+    def test_table_hit_skips_live_retrieval(self):
+        retriever, hazard_map = self._current_map({"未佩戴安全帽": _docs("安全帽条文")}, _docs("实时条文"))
+        docs = hazard_map.lookup_for_analysis({"hazards": [{"hazard_type": "工人没戴安全帽"}]})
+        self.assertEqual([doc.page_content for doc in docs], ["安全帽条文"])
+        self.assertEqual(retriever.calls, [])
+
+    def test_empty_category_falls_back_to_live_retrieval(self):
+        retriever, hazard_map = self._current_map({"未佩戴安全帽": _docs("安全帽条文")}, _docs("实时条文"))
+        self.assertIsNone(hazard_map.lookup("消防隐患"))
+
+        docs = hazard_map.lookup_for_analysis({"hazards": [
+            {"hazard_type": "未戴安全帽"},
+            {"hazard_type": "灭火器过期"},
+        ]})
+
+        self.assertEqual([doc.page_content for doc in docs], ["安全帽条文", "实时条文"])
+        self.assertEqual(len(retriever.calls), 1)
+
+    def test_unclassified_hazard_falls_back(self):
+        _, hazard_map = self._current_map({"未佩戴安全帽": _docs("安全帽条文")}, _docs("实时条文"))
+        docs = hazard_map.lookup_for_analysis({"hazards": [{"hazard_type": "地面湿滑"}]})
+        self.assertEqual([doc.page_content for doc in docs], ["实时条文"])
+
+    def test_stale_table_serves_live_results_and_rebuilds(self):
+        retriever = FakeRetriever(self.persist_dir, semantic=_docs("实时条文"))
+        hazard_map = HazardRegulationMap(retriever, k=1)
+
+        docs = hazard_map.lookup_for_analysis({"hazards": [{"hazard_type": "未戴安全帽"}]})
+        self.assertEqual([doc.page_content for doc in docs], ["实时条文"])
+
+        self._wait_rebuild(hazard_map)
+        self.assertTrue(hazard_map.is_current)
+
+
+if __name__ == "__main__":
+    unittest.main()
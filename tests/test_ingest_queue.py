@@ -0,0 +1,102 @@
+"""
+入库任务队列测试：任务状态流转、失败记录、多个队列实例共用数据库时任务只被领取一次
+
+运行: python -m unittest tests.test_ingest_queue
+"""
+
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.tools.ingest_queue import IngestionQueue
+
+# 队列的后台工作线程没有停止接口，处理完最后一个任务后仍会再查询一次数据库；
+# 临时目录在进程退出时才删除，避免线程访问已删除的数据库
+_TMP = tempfile.TemporaryDirectory()
+
+
+class FakeRetriever:
+    """记录每个文件被入库的次数，文件名含 bad 时返回失败"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def add_documents(self, file_path, collection_name="safe", progress_callback=None):
+        with self._lock:
+            self.calls.append(file_path)
+        if progress_callback:
+            progress_callback("embedding", num_input_chunks=3)
+        time.sleep(self.delay)
+        if "bad" in Path(file_path).name:
+            return {"success": False, "error": "无法加载文档"}
+        return {"success": True, "num_input_chunks": 3, "num_chunks": 2, "num_duplicates": 1}
+
+
+class TestIngestionQueue(unittest.TestCase):
+    def setUp(self):
+        self.db_path = Path(tempfile.mkdtemp(dir=_TMP.name)) / "ingest_queue.db"
+
+    def _wait_idle(self, queue, timeout=10):
+        deadline = time.monotonic() + timeout
+        while queue.has_active_jobs():
+            if time.monotonic() > deadline:
+                self.fail("入库任务未在限定时间内完成")
+            time.sleep(0.01)
+
+    def test_jobs_finish_with_counts(self):
+        queue = IngestionQueue(FakeRetriever(), self.db_path)
+        job_id = queue.submit("docs/规范.pdf")
+        self._wait_idle(queue)
+
+        job = queue.get_job(job_id)
+        self.assertEqual(job["status"], "done")
+        self.assertEqual(job["file_name"], "规范.pdf")
+        self.assertEqual((job["num_input_chunks"], job["num_chunks"], job["num_duplicates"]), (3, 2, 1))
+        self.assertEqual(queue.active_files(), [])
+
+    def test_failed_job_records_error(self):
+        queue = IngestionQueue(FakeRetriever(), self.db_path)
+        job_id = queue.submit("docs/bad.pdf")
+        self._wait_idle(queue)
+
+        job = queue.get_job(job_id)
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "无法加载文档")
+
+    def test_interrupted_jobs_are_requeued(self):
+        queue = IngestionQueue(FakeRetriever(), self.db_path)
+        job_id = queue.submit("docs/a.pdf")
+        self._wait_idle(queue)
+        queue._update(job_id, status="embedding")
+
+        retriever = FakeRetriever()
+        restarted = IngestionQueue(retriever, self.db_path)
+        self._wait_idle(restarted)
+
+        self.assertEqual(restarted.get_job(job_id)["status"], "done")
+        self.assertEqual(retriever.calls, ["docs/a.pdf"])
+
+    def test_shared_database_claims_each_job_once(self):
+        # 各实例持有独立的线程锁，模拟多个进程共用同一个队列数据库
+        retriever = FakeRetriever(delay=0.005)
+        queues = [IngestionQueue(retriever, self.db_path) for _ in range(4)]
+        paths = [f"docs/{n:02d}.pdf" for n in range(40)]
+        for n, path in enumerate(paths):
+            queues[n % len(queues)].submit(path)
+        for queue in queues:
+            queue._wakeup.set()
+        self._wait_idle(queues[0])
+
+        self.assertEqual(sorted(retriever.calls), paths)
+
+
+if __name__ == "__main__":
+    unittest.main()
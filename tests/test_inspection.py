@@ -0,0 +1,223 @@
+"""
+巡检轮次汇总测试：多张照片分析结果的合并、去重与证据保留，以及复查时与基准报告的对比
+
+运行: python -m unittest tests.test_inspection
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.tools.inspection import (
+    covers_baseline,
+    diff_hazards,
+    evidence_images,
+    format_diff_section,
+    format_evidence_section,
+    hazard_key,
+    merge_analyses,
+    report_scope,
+    risk_score,
+)
+
+
+def _hazard(hazard_type, severity="low", confidence=None, location="", description=""):
+    return {
+        "hazard_type": hazard_type,
+        "severity": severity,
+        "confidence": confidence,
+        "location": location,
+        "description": description,
+    }
+
+
+def _analysis(*hazards):
+    return {"success": True, "hazards": list(hazards)}
+
+
+class TestHazardKey(unittest.TestCase):
+    def test_synonyms_share_category(self):
+        self.assertEqual(hazard_key({"hazard_type": "工人没戴安全帽"}), "未佩戴安全帽")
+        self.assertEqual(hazard_key({"hazard_type": "头盔缺失"}), "未佩戴安全帽")
+
+    def test_unclassified_uses_type_without_spaces(self):
+        self.assertEqual(hazard_key({"hazard_type": " 地面 湿滑 "}), "地面湿滑")
+        self.assertEqual(hazard_key({}), "未知隐患")
+
+    def test_category_takes_precedence(self):
+        self.assertEqual(hazard_key({"hazard_type": "工人没戴安全帽", "category": "消防隐患"}), "消防隐患")
+
+
+class TestRiskScore(unittest.TestCase):
+    def test_weighted_by_photo_count(self):
+        self.assertEqual(risk_score([{"severity": "high"}, {"severity": "low"}]), 2.0)
+        self.assertEqual(risk_score([{"severity": "high", "photo_count": 3}, {"severity": "low"}]), 2.5)
+        self.assertEqual(risk_score([]), 0.0)
+
+
+class TestMergeAnalyses(unittest.TestCase):
+    def test_same_category_is_merged_across_photos(self):
+        result = merge_analyses({
+            "IMG_1.jpg": _analysis(_hazard("工人没戴安全帽", "medium", 0.6, "3号楼入口")),
+            "IMG_2.jpg": _analysis(
+                _hazard("安全帽未佩戴", "high", 0.9, "塔吊下方", "两名工人未戴安全帽"),
+                _hazard("配电箱未上锁", "low", 0.8),
+            ),
+        })
+
+        self.assertTrue(result["success"])
+        self.assertEqual(result["photo_count"], 2)
+        self.assertEqual(len(result["hazards"]), 2)
+        helmet = result["hazards"][0]
+        self.assertEqual(helmet["category"], "未佩戴安全帽")
+        # 等级取最高，表述、位置与描述取置信度最高的证据
+        self.assertEqual(helmet["severity"], "high")
+        self.assertEqual(helmet["hazard_type"], "安全帽未佩戴")
+        self.assertEqual(helmet["location"], "塔吊下方")
+        self.assertEqual(helmet["photo_count"], 2)
+        self.assertEqual(
+            [(e["photo"], e["hazard_type"], e["severity"]) for e in helmet["evidence"]],
+            [("IMG_1.jpg", "工人没戴安全帽", "medium"), ("IMG_2.jpg", "安全帽未佩戴", "high")],
+        )
+        self.assertEqual(result["risk_score"], round((3 * 2 + 1) / 3, 2))
+
+    def test_sorted_by_severity_then_photo_count(self):
+        result = merge_analyses({
+            "a": _analysis(_hazard("配电箱未上锁", "low"), _hazard("地面湿滑", "medium")),
+            "b": _analysis(_hazard("配电箱未上锁", "low"), _hazard("灭火器过期", "medium")),
+            "c": _analysis(_hazard("灭火器过期", "medium")),
+        })
+        self.assertEqual([h["category"] for h in result["hazards"]], ["消防隐患", "地面湿滑", "临时用电不规范"])
+
+    def test_repeated_hazard_in_one_photo_counts_once(self):
+        result = merge_analyses({"a": _analysis(_hazard("未戴安全帽"), _hazard("没戴安全帽"))})
+        self.assertEqual(result["hazards"][0]["photo_count"], 1)
+        self.assertEqual(len(result["hazards"][0]["evidence"]), 2)
+
+    def test_invalid_severity_is_low(self):
+        result = merge_analyses({"a": _analysis(_hazard("地面湿滑", "critical"))})
+        self.assertEqual(result["hazards"][0]["severity"], "low")
+
+    def test_failed_photos_are_reported(self):
+        result = merge_analyses({
+            "a": _analysis(_hazard("地面湿滑")),
+            "b": {"success": False, "error": "图片无法识别"},
+            "c": None,
+        })
+        self.assertTrue(result["success"])
+        self.assertEqual(result["photo_count"], 1)
+        self.assertEqual(result["failed_photos"], ["b", "c"])
+
+    def test_all_failed(self):
+        result = merge_analyses({"a": {"success": False}})
+        self.assertFalse(result["success"])
+        self.assertEqual(result["error"], "所有照片分析均失败")
+        self.assertEqual(result["hazards"], [])
+
+
+class TestEvidence(unittest.TestCase):
+    def setUp(self):
+        self.merged = merge_analyses({
+            "IMG_1.jpg": _analysis(_hazard("工人没戴安全帽", "medium", 0.6, "3号楼入口")),
+            "IMG_2.jpg": _analysis(_hazard("安全帽未佩戴", "high", 0.9, "塔吊下方")),
+            "IMG_3.jpg": _analysis(),
+        })
+
+    def test_evidence_section(self):
+        self.assertEqual(
+            format_evidence_section(self.merged["hazards"]),
+            "1. **安全帽未佩戴**（高风险，2 张照片）：IMG_1.jpg（3号楼入口）；IMG_2.jpg（塔吊下方）",
+        )
+
+    def test_captions_use_each_photos_own_evidence(self):
+        images = evidence_images(
+            {"IMG_1.jpg": "/p/1.jpg", "IMG_2.jpg": "/p/2.jpg", "IMG_3.jpg": "/p/3.jpg"}, self.merged
+        )
+        self.assertEqual([image["caption"] for image in images], [
+            "IMG_1.jpg：工人没戴安全帽（中风险）",
+            "IMG_2.jpg：安全帽未佩戴（高风险）",
+            "IMG_3.jpg：未识别到明显安全隐患",
+        ])
+
+    def test_captions_for_single_photo_analysis(self):
+        analysis = _analysis(_hazard("配电箱未上锁", "low"))
+        images = evidence_images({"photo.jpg": "/p/photo.jpg"}, analysis)
+        self.assertEqual(images, [{"photo": "photo.jpg", "path": "/p/photo.jpg", "caption": "photo.jpg：配电箱未上锁（低风险）"}])
+
+
+class TestCoversBaseline(unittest.TestCase):
+    def test_report_scope(self):
+        self.assertEqual(report_scope({"scope": "round"}), "round")
+        self.assertEqual(report_scope({"photo_count": 4}), "round")
+        self.assertEqual(report_scope({}), "single")
+
+    def test_single_photo_against_single_photo(self):
+        self.assertTrue(covers_baseline({"scope": "single"}, {"hazards": []}))
+
+    def test_scope_must_match(self):
+        self.assertFalse(covers_baseline({"scope": "round", "photo_count": 1}, {"hazards": []}))
+        self.assertFalse(covers_baseline({"scope": "single"}, {"scope": "round", "photo_count": 3}))
+
+    def test_round_needs_all_photos(self):
+        previous = {"scope": "round", "photo_count": 5}
+        self.assertTrue(covers_baseline(previous, {"scope": "round", "photo_count": 5, "failed_photos": []}))
+        self.assertFalse(covers_baseline(previous, {"scope": "round", "photo_count": 4, "failed_photos": []}))
+        self.assertFalse(covers_baseline(previous, {"scope": "round", "photo_count": 6, "failed_photos": ["x"]}))
+
+
+class TestDiffHazards(unittest.TestCase):
+    PREVIOUS = [
+        _hazard("工人没戴安全帽", "high"),
+        _hazard("配电箱未上锁", "low"),
+        _hazard("灭火器过期", "medium"),
+        _hazard("灭火器缺失", "low"),
+    ]
+    CURRENT = [
+        _hazard("安全帽未佩戴", "medium"),
+        _hazard("灭火器数量不足", "medium"),
+        _hazard("脚手架缺少剪刀撑", "high"),
+    ]
+
+    def _keys(self, hazards):
+        return [hazard_key(h) for h in hazards]
+
+    def test_complete_inspection(self):
+        diff = diff_hazards(self.PREVIOUS, self.CURRENT)
+        self.assertEqual(self._keys(diff["new"]), ["脚手架搭设不规范"])
+        self.assertEqual(self._keys(diff["changed"]), ["未佩戴安全帽"])
+        self.assertEqual(diff["changed"][0]["previous_severity"], "high")
+        # 同类隐患取基准中的最高等级比较
+        self.assertEqual(self._keys(diff["carried"]), ["消防隐患"])
+        self.assertEqual(self._keys(diff["resolved"]), ["临时用电不规范"])
+        self.assertEqual(diff["unverified"], [])
+
+    def test_incomplete_inspection_does_not_resolve(self):
+        diff = diff_hazards(self.PREVIOUS, self.CURRENT, complete=False)
+        self.assertEqual(diff["resolved"], [])
+        self.assertEqual(self._keys(diff["unverified"]), ["临时用电不规范"])
+
+    def test_merged_hazards_compare_by_category(self):
+        # 合并结果保留模型的原始表述，对比时以 category 为准
+        merged = merge_analyses({"a": _analysis(_hazard("现场有人未戴帽子", "high"))})["hazards"]
+        self.assertEqual(merged[0]["hazard_type"], "现场有人未戴帽子")
+        diff = diff_hazards([_hazard("工人没戴安全帽", "high")], merged)
+        self.assertEqual(self._keys(diff["carried"]), ["未佩戴安全帽"])
+
+    def test_diff_section(self):
+        previous = {"report_id": "R1", "report_date": "2026-03-01", "scope": "round", "photo_count": 5}
+        diff = diff_hazards(self.PREVIOUS, self.CURRENT, complete=False)
+        lines = format_diff_section(diff, previous).split("\n")
+        self.assertEqual(lines[0], "对比基准检查（报告 R1，2026-03-01，巡检轮次）：")
+        self.assertEqual(lines[1], "- **已整改**：无")
+        self.assertEqual(lines[3], "- **风险等级变化**：未佩戴安全帽（高风险→中风险）")
+        self.assertEqual(lines[-1], "- **本次未覆盖**（照片不完整，无法确认是否整改）：临时用电不规范（低风险）")
+
+        complete = format_diff_section(diff_hazards(self.PREVIOUS, self.CURRENT), previous)
+        self.assertNotIn("本次未覆盖", complete)
+
+
+if __name__ == "__main__":
+    unittest.main()
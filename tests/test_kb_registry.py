@@ -0,0 +1,136 @@
+"""
+知识库版本注册表测试：影子版本登记、切换生效、回滚与旧版本回收
+
+运行: python -m unittest tests.test_kb_registry
+"""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import KB_SHARDS
+from src.core.kb_registry import REGISTRY_FILE, KBRegistry, physical_collection_name
+
+
+class TestPhysicalCollectionName(unittest.TestCase):
+    def test_version_zero_keeps_legacy_name(self):
+        self.assertEqual(physical_collection_name("safe", 0), "safe")
+        self.assertEqual(physical_collection_name("safe_fire", 3), "safe_fire__v3")
+
+
+class TestKBRegistry(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.persist_dir = Path(self._tmp.name)
+        self.registry = KBRegistry(self.persist_dir)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _build(self):
+        version = self.registry.create_version({"embedding_model": "bge-m3", "chunk_size": 400})
+        self.registry.set_status(version, "ready")
+        return version
+
+    def test_default_state(self):
+        self.assertEqual(self.registry.active, 0)
+        self.assertIsNone(self.registry.previous)
+        self.assertEqual(self.registry.versions(), {0: {"status": "active"}})
+
+    def test_create_version(self):
+        version = self.registry.create_version({"embedding_model": "bge-m3"})
+        self.assertEqual(version, 1)
+        info = self.registry.version_info(version)
+        self.assertEqual(info["status"], "building")
+        self.assertEqual(info["embedding_model"], "bge-m3")
+        # 影子版本不影响生效版本
+        self.assertEqual(self.registry.active, 0)
+
+    def test_physical_names_cover_all_shards(self):
+        names = self.registry.physical_names(2)
+        self.assertEqual(len(names), len(KB_SHARDS))
+        self.assertIn("safe__v2", names)
+
+    def test_activate_keeps_previous_for_rollback(self):
+        version = self._build()
+        retired = self.registry.activate(version)
+
+        self.assertIsNone(retired)
+        self.assertEqual(self.registry.active, version)
+        self.assertEqual(self.registry.previous, 0)
+        self.assertEqual(self.registry.version_info(version)["status"], "active")
+        self.assertIn("activated_at", self.registry.version_info(version))
+        self.assertEqual(self.registry.version_info(0)["status"], "standby")
+
+    def test_activate_retires_version_before_previous(self):
+        first = self._build()
+        self.registry.activate(first)
+        second = self._build()
+
+        retired = self.registry.activate(second)
+
+        self.assertEqual(retired, 0)
+        self.assertEqual(self.registry.previous, first)
+        self.assertNotIn(0, self.registry.versions())
+
+    def test_rollback_swaps_active_and_previous(self):
+        version = self._build()
+        self.registry.activate(version)
+
+        self.assertEqual(self.registry.rollback(), 0)
+        self.assertEqual(self.registry.active, 0)
+        self.assertEqual(self.registry.previous, version)
+        self.assertEqual(self.registry.version_info(0)["status"], "active")
+        self.assertEqual(self.registry.version_info(version)["status"], "standby")
+
+        # 再次回滚回到新版本
+        self.assertEqual(self.registry.rollback(), version)
+
+    def test_rollback_without_previous(self):
+        self.assertIsNone(self.registry.rollback())
+        self.assertEqual(self.registry.active, 0)
+
+    def test_reactivating_after_rollback_retires_nothing(self):
+        version = self._build()
+        self.registry.activate(version)
+        self.registry.rollback()
+
+        self.assertIsNone(self.registry.activate(version))
+        self.assertEqual(self.registry.previous, 0)
+        self.assertEqual(set(self.registry.versions()), {0, version})
+
+    def test_discard_only_removes_inactive_versions(self):
+        version = self.registry.create_version({})
+        self.registry.discard(version)
+        self.assertNotIn(version, self.registry.versions())
+
+        self.registry.discard(0)
+        self.assertIn(0, self.registry.versions())
+
+    def test_state_persists(self):
+        version = self._build()
+        self.registry.activate(version)
+
+        restored = KBRegistry(self.persist_dir)
+        self.assertEqual(restored.active, version)
+        self.assertEqual(restored.previous, 0)
+        self.assertEqual(restored.version_info(version)["embedding_model"], "bge-m3")
+
+    def test_corrupted_file_falls_back_to_default(self):
+        (self.persist_dir / REGISTRY_FILE).write_text("{not json", encoding="utf-8")
+        self.assertEqual(KBRegistry(self.persist_dir).active, 0)
+
+    def test_version_keys_are_ints_after_reload(self):
+        self._build()
+        data = json.loads((self.persist_dir / REGISTRY_FILE).read_text(encoding="utf-8"))
+        self.assertIn("1", data["versions"])
+        self.assertEqual(set(KBRegistry(self.persist_dir).versions()), {0, 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+知识库快照测试：导出导入往返、校验和检测损坏、只导出生效版本
+
+运行: python -m unittest tests.test_kb_snapshot
+"""
+
+import json
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.kb_registry import REGISTRY_FILE, KBRegistry
+from src.core.kb_stats import STATS_FILE
+from src.core.snapshot import (
+    SnapshotError,
+    export_snapshot,
+    import_snapshot,
+    read_snapshot_header,
+    verify_snapshot,
+)
+
+
+def _client(persist_dir):
+    return chromadb.PersistentClient(path=str(persist_dir), settings=Settings(anonymized_telemetry=False))
+
+
+class SnapshotTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.source_dir = self.tmp / "source"
+        self.target_dir = self.tmp / "target"
+        self.snapshot_path = self.tmp / "kb.snapshot"
+
+        client = _client(self.source_dir)
+        fire = client.create_collection("safe_fire", metadata={"hnsw:space": "cosine"})
+        fire.add(
+            ids=["f1", "f2"],
+            documents=["动火作业须办理审批", "灭火器应定期检查"],
+            metadatas=[{"source": "消防.pdf", "page": 1}, {"source": "消防.pdf", "page": 2}],
+            embeddings=[[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]],
+        )
+        general = client.create_collection("safe")
+        general.add(
+            ids=["g1"],
+            documents=["作业人员必须佩戴安全帽"],
+            metadatas=[{"source": "通用.pdf"}],
+            embeddings=[[0.7, 0.8, 0.9]],
+        )
+        (self.source_dir / "dedup").mkdir()
+        (self.source_dir / "dedup" / "safe_fire.json").write_text('{"version": 1, "entries": {}}', encoding="utf-8")
+        (self.source_dir / "kb_state.json").write_text('{"version": 7}', encoding="utf-8")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+
+class TestSnapshotRoundTrip(SnapshotTestCase):
+    def test_export_import_round_trip(self):
+        header = export_snapshot(self.snapshot_path, self.source_dir)
+        self.assertEqual({c["name"]: c["count"] for c in header["collections"]}, {"safe_fire": 2, "safe": 1})
+
+        import_snapshot(self.snapshot_path, self.target_dir)
+
+        fire = _client(self.target_dir).get_collection("safe_fire")
+        records = fire.get(ids=["f1", "f2"], include=["documents", "metadatas", "embeddings"])
+        self.assertEqual(records["documents"], ["动火作业须办理审批", "灭火器应定期检查"])
+        self.assertEqual(records["metadatas"][1], {"source": "消防.pdf", "page": 2})
+        np.testing.assert_allclose(records["embeddings"], [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]], rtol=1e-6)
+        self.assertEqual(fire.metadata, {"hnsw:space": "cosine"})
+
+        # 知识库状态文件一并恢复，统计信息留待首次读取时重建
+        self.assertEqual(json.loads((self.target_dir / "kb_state.json").read_text(encoding="utf-8")), {"version": 7})
+        self.assertTrue((self.target_dir / "dedup" / "safe_fire.json").exists())
+        self.assertEqual(KBRegistry(self.target_dir).active, 0)
+        self.assertFalse((self.target_dir / STATS_FILE).exists())
+
+    def test_import_into_non_empty_collection_requires_overwrite(self):
+        export_snapshot(self.snapshot_path, self.source_dir)
+        with self.assertRaises(SnapshotError):
+            import_snapshot(self.snapshot_path, self.source_dir)
+
+        import_snapshot(self.snapshot_path, self.source_dir, overwrite=True)
+        self.assertEqual(_client(self.source_dir).get_collection("safe_fire").count(), 2)
+
+    def test_only_active_version_is_exported(self):
+        registry = KBRegistry(self.source_dir)
+        version = registry.create_version({"embedding_model": "bge-m3"})
+        _client(self.source_dir).create_collection(f"safe__v{version}").add(
+            ids=["s1"], documents=["影子版本"], embeddings=[[1.0, 1.0, 1.0]]
+        )
+
+        header = export_snapshot(self.snapshot_path, self.source_dir)
+
+        self.assertNotIn(f"safe__v{version}", [c["name"] for c in header["collections"]])
+        import_snapshot(self.snapshot_path, self.target_dir)
+        registry_data = json.loads((self.target_dir / REGISTRY_FILE).read_text(encoding="utf-8"))
+        self.assertEqual(list(registry_data["versions"]), ["0"])
+
+
+class TestSnapshotIntegrity(SnapshotTestCase):
+    def _corrupt_last_byte(self):
+        data = bytearray(self.snapshot_path.read_bytes())
+        data[-1] ^= 0xFF
+        self.snapshot_path.write_bytes(bytes(data))
+
+    def test_corrupted_payload_is_rejected(self):
+        export_snapshot(self.snapshot_path, self.source_dir)
+        verify_snapshot(self.snapshot_path)
+        self._corrupt_last_byte()
+
+        with self.assertRaises(SnapshotError):
+            verify_snapshot(self.snapshot_path)
+        with self.assertRaises(SnapshotError):
+            import_snapshot(self.snapshot_path, self.target_dir)
+        self.assertFalse((self.target_dir / "kb_state.json").exists())
+
+    def test_not_a_snapshot(self):
+        self.snapshot_path.write_bytes(b"PK\x03\x04" + b"\x00" * 32)
+        with self.assertRaises(SnapshotError):
+            read_snapshot_header(self.snapshot_path)
+
+    def test_truncated_file(self):
+        self.snapshot_path.write_bytes(b"ZAJ")
+        with self.assertRaises(SnapshotError):
+            read_snapshot_header(self.snapshot_path)
+
+
+if __name__ == "__main__":
+    unittest.main()
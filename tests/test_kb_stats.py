@@ -0,0 +1,119 @@
+"""
+知识库统计测试：增量计数、持久化、汇总，以及升级前已入库集合的一次性补齐
+
+运行: python -m unittest tests.test_kb_stats
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import chromadb
+from chromadb.config import Settings
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.kb_stats import STATS_FILE, CollectionStats
+from src.tools.retrieval import KnowledgeRetriever
+
+
+class OfflineRetriever(KnowledgeRetriever):
+    """不创建嵌入模型的检索器，统计只读取元数据，无需向量"""
+
+    def _create_embeddings(self, model_name):
+        return None
+
+
+class TestCollectionStats(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.persist_dir = Path(self._tmp.name)
+        self.stats = CollectionStats(self.persist_dir)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_record_ingest_counts_sources(self):
+        self.stats.record_ingest("safe", ["a.pdf", "a.pdf", "b.pdf"], timestamp="2026-01-01T08:00:00")
+        self.stats.record_ingest("safe", ["b.pdf"], timestamp="2026-01-02T08:00:00")
+
+        summary = self.stats.summary(["safe"])
+        self.assertEqual(summary["document_count"], 4)
+        self.assertEqual(summary["sources"], {"a.pdf": 2, "b.pdf": 2})
+        self.assertEqual(summary["last_ingest_at"], "2026-01-02T08:00:00")
+
+    def test_empty_ingest_registers_collection_without_timestamp(self):
+        self.stats.record_ingest("safe_fire", [])
+        self.assertTrue(self.stats.has("safe_fire"))
+        self.assertIsNone(self.stats.summary(["safe_fire"])["last_ingest_at"])
+
+    def test_summary_across_shards(self):
+        self.stats.record_ingest("safe", ["a.pdf"], timestamp="2026-01-03T08:00:00")
+        self.stats.record_ingest("safe_fire", ["a.pdf", "c.pdf"], timestamp="2026-01-01T08:00:00")
+
+        summary = self.stats.summary(["safe", "safe_fire", "safe_lifting"])
+        self.assertEqual(summary["shards"], {"safe": 1, "safe_fire": 2, "safe_lifting": 0})
+        self.assertEqual(summary["sources"], {"a.pdf": 2, "c.pdf": 1})
+        self.assertEqual(summary["last_ingest_at"], "2026-01-03T08:00:00")
+
+    def test_reset(self):
+        self.stats.record_ingest("safe", ["a.pdf"])
+        self.stats.reset("safe")
+        self.assertFalse(self.stats.has("safe"))
+        self.assertFalse(CollectionStats(self.persist_dir).has("safe"))
+
+    def test_persists_between_instances(self):
+        self.stats.record_ingest("safe", ["a.pdf", "b.pdf"])
+        restored = CollectionStats(self.persist_dir)
+        self.assertTrue(restored.has("safe"))
+        self.assertEqual(restored.summary(["safe"])["document_count"], 2)
+
+    def test_corrupted_file_starts_empty(self):
+        (self.persist_dir / STATS_FILE).write_text("{not json", encoding="utf-8")
+        self.assertFalse(CollectionStats(self.persist_dir).has("safe"))
+
+
+class TestStatsBackfill(unittest.TestCase):
+    """升级前入库的集合没有统计记录，首次读取时分页扫描元数据补齐"""
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.persist_dir = Path(self._tmp.name)
+        client = chromadb.PersistentClient(path=str(self.persist_dir), settings=Settings(anonymized_telemetry=False))
+        collection = client.create_collection("safe_fire")
+        collection.add(
+            ids=["1", "2", "3"],
+            documents=["动火作业审批", "灭火器配置", "消防通道"],
+            metadatas=[{"source": "消防.pdf"}, {"source": "消防.pdf"}, {"source": "通道.pdf"}],
+            embeddings=[[1.0, 0.0], [0.0, 1.0], [1.0, 1.0]],
+        )
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _retriever(self):
+        # Chroma 同一目录只允许一种客户端设置，与上面直接创建的客户端保持一致
+        return OfflineRetriever({"persist_dir": str(self.persist_dir), "chroma_memory_limit_bytes": 0})
+
+    def test_backfill_on_first_read(self):
+        retriever = self._retriever()
+        self.assertFalse(retriever.stats.has("safe_fire"))
+
+        result = retriever.get_collection_stats("fire")
+
+        self.assertEqual(result["document_count"], 3)
+        self.assertEqual(result["sources"], {"消防.pdf": 2, "通道.pdf": 1})
+        # 补齐结果已持久化，之后的读取不再扫描集合
+        self.assertTrue(CollectionStats(self.persist_dir).has("safe_fire"))
+
+    def test_missing_collection_is_recorded_empty(self):
+        retriever = self._retriever()
+        result = retriever.get_collection_stats("lifting")
+        self.assertEqual(result["document_count"], 0)
+        self.assertTrue(retriever.stats.has("safe_lifting"))
+
+
+if __name__ == "__main__":
+    unittest.main()
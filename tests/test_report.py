@@ -0,0 +1,370 @@
+"""
+报告生成测试：以本地假模型代替大模型，覆盖混合模式的章节生成路径与缓存，
+同步/异步流式生成的事件序列、巡检汇总报告与复查报告
+
+运行: python -m unittest tests.test_report
+"""
+
+import asyncio
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import REPORT_TEMPLATE
+from src.core.utils import CacheUtils
+from src.tools.inspection import merge_analyses
+from src.tools.report import ReportGenerator
+from src.tools.report_snippets import SnippetCache
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    本地假模型：回复为“生成内容：”加提示词首行的前16个字，流式输出分两段产出
+
+    fail 为True时每次调用都抛出异常
+    """
+
+    fail: bool = False
+    prompts: list = []
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _reply(self, messages):
+        prompt = messages[-1].content
+        self.prompts.append(prompt)
+        if self.fail:
+            raise RuntimeError("模型服务不可用")
+        return "生成内容：" + prompt.split("\n")[0][:16]
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._reply(messages)
+        for part in (text[:5], text[5:]):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=part))
+
+
+class FakeReportGenerator(ReportGenerator):
+    """所有模型档位共用一个假模型"""
+
+    _lock = threading.Lock()
+
+    def _get_model(self, tier):
+        with self._lock:
+            if "fake" not in self._models:
+                self._models["fake"] = FakeChatModel(prompts=[])
+            return self._models["fake"]
+
+    @property
+    def fake(self):
+        return self._models["fake"]
+
+
+# 可归入常见隐患类别：整改建议与法规依据由规则生成
+CLASSIFIED = {"hazards": [
+    {"hazard_type": "工人未戴安全帽", "severity": "high", "location": "3号楼", "description": "两名工人未戴安全帽"},
+    {"hazard_type": "配电箱未上锁", "severity": "low", "location": "配电房"},
+]}
+UNCLASSIFIED = {"hazards": [{"hazard_type": "地面湿滑", "severity": "medium", "location": "楼梯间"}]}
+
+
+class ReportTestCase(unittest.TestCase):
+    mode = "hybrid"
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        # 整章节缓存为进程级全局缓存，各测试之间互不影响
+        CacheUtils.clear()
+        self.generator = FakeReportGenerator(mode=self.mode)
+        self.generator.snippets = SnippetCache(Path(self._tmp.name) / "snippets.json")
+
+    def tearDown(self):
+        CacheUtils.clear()
+        self._tmp.cleanup()
+
+
+class TestGenerateReport(ReportTestCase):
+    def test_hybrid_sources(self):
+        report = self.generator.generate_report(CLASSIFIED, retrieved_docs=[], metadata={"site_id": "S1"})
+
+        self.assertEqual(list(report["sections"]), REPORT_TEMPLATE["sections"])
+        self.assertEqual(report["overall_risk"], "medium")
+        self.assertEqual(report["site_id"], "S1")
+        self.assertEqual(report["scope"], "single")
+        self.assertEqual(report["section_sources"], {
+            "隐患概述": "llm",
+            "风险等级评估": "rule",
+            "隐患详细描述": "llm",
+            "整改建议": "rule",
+            "预防措施": "llm",
+            "相关法规依据": "rule",
+        })
+        self.assertTrue(report["sections"]["隐患概述"].startswith("生成内容：请根据以下隐患信息"))
+        self.assertIn("**未佩戴安全帽**", report["sections"]["整改建议"])
+        # 预防措施由每类隐患一个措施片段拼装
+        self.assertEqual(len(report["sections"]["预防措施"].split("\n")), 2)
+
+    def test_unclassified_hazard_uses_snippets(self):
+        report = self.generator.generate_report(UNCLASSIFIED, retrieved_docs=[])
+        self.assertEqual(report["section_sources"]["整改建议"], "llm")
+        self.assertEqual(report["section_sources"]["相关法规依据"], "llm")
+        self.assertTrue(report["sections"]["整改建议"].startswith("1. **地面湿滑**（中风险）："))
+
+    def test_repeat_report_uses_caches(self):
+        self.generator.generate_report(CLASSIFIED, retrieved_docs=[])
+        calls = len(self.generator.fake.prompts)
+
+        report = self.generator.generate_report(CLASSIFIED, retrieved_docs=[])
+
+        self.assertEqual(len(self.generator.fake.prompts), calls)
+        self.assertEqual(report["section_sources"]["隐患概述"], "cache")
+        self.assertEqual(report["section_sources"]["风险等级评估"], "rule")
+
+        # 其他报告中的同类隐患复用措施片段
+        CacheUtils.clear()
+        report = self.generator.generate_report(dict(CLASSIFIED, summary="另一份报告"), retrieved_docs=[])
+        self.assertEqual(report["section_sources"]["预防措施"], "snippet")
+
+    def test_regulations_are_added_to_prompt(self):
+        docs = [{"page_content": "作业人员必须正确佩戴安全帽", "metadata": {"source": "/kb/JGJ59.pdf"}}]
+        self.generator.generate_report(UNCLASSIFIED, retrieved_docs=docs)
+        self.assertTrue(any("参考规范条文" in p and "JGJ59.pdf" in p for p in self.generator.fake.prompts))
+
+    def test_no_hazards(self):
+        report = self.generator.generate_report({"hazards": []}, retrieved_docs=[])
+        self.assertEqual(report["sections"], {"隐患概述": "未检测到明显安全隐患"})
+        self.assertEqual(report["overall_risk"], "low")
+        self.assertEqual(self.generator.fake.prompts, [])
+
+    def test_model_failure_marks_section(self):
+        self.generator.fake.fail = True
+        report = self.generator.generate_report(UNCLASSIFIED, retrieved_docs=[])
+        self.assertEqual(report["sections"]["隐患概述"], "隐患概述生成失败")
+        # 失败的章节不写入缓存
+        self.generator.fake.fail = False
+        report = self.generator.generate_report(UNCLASSIFIED, retrieved_docs=[])
+        self.assertEqual(report["section_sources"]["隐患概述"], "llm")
+
+    def test_generation_stats(self):
+        self.generator.generate_report(CLASSIFIED, retrieved_docs=[])
+        stats = self.generator.get_generation_stats()
+        self.assertEqual(stats["rule"]["sections"], 3)
+        self.assertEqual(stats["llm"]["sections"], 3)
+
+
+class TestLLMMode(ReportTestCase):
+    mode = "llm"
+
+    def test_rules_are_not_used(self):
+        report = self.generator.generate_report(CLASSIFIED, retrieved_docs=[])
+        self.assertNotIn("rule", report["section_sources"].values())
+
+
+class FailingRuleEngine:
+    """指定章节的规则生成抛出异常，模拟章节生成过程中的意外错误"""
+
+    def __init__(self, engine, section_name):
+        self.engine = engine
+        self.section_name = section_name
+
+    def __getattr__(self, name):
+        return getattr(self.engine, name)
+
+    def build_section(self, section_name, hazards, overall_risk):
+        if section_name == self.section_name:
+            raise ValueError("规则库损坏")
+        return self.engine.build_section(section_name, hazards, overall_risk)
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+class TestStreamReport(ReportTestCase):
+    def _check_events(self, events, interleaved=False):
+        kinds = [event["event"] for event in events]
+        self.assertEqual(kinds[0], "start")
+        self.assertEqual(kinds[-1], "done")
+        sections = [event["section"] for event in events if event["event"] == "section"]
+        if interleaved:
+            self.assertCountEqual(sections, REPORT_TEMPLATE["sections"])
+        else:
+            self.assertEqual(sections, REPORT_TEMPLATE["sections"])
+
+        report = events[-1]["report"]
+        self.assertEqual(list(report["sections"]), REPORT_TEMPLATE["sections"])
+        for event in events:
+            if event["event"] == "section":
+                # 章节内容等于该章节全部 token 事件的拼接
+                tokens = [e["content"] for e in events if e["event"] == "token" and e["section"] == event["section"]]
+                self.assertEqual("".join(tokens), event["content"])
+                self.assertEqual(report["sections"][event["section"]], event["content"])
+        return report
+
+    def test_stream_report(self):
+        events = list(self.generator.stream_report(CLASSIFIED, retrieved_docs=[]))
+        report = self._check_events(events)
+        # 大模型章节分段产出
+        self.assertGreater(len([e for e in events if e["event"] == "token" and e["section"] == "隐患概述"]), 1)
+        self.assertEqual(report["section_sources"]["风险等级评估"], "rule")
+
+    def test_stream_matches_generate(self):
+        streamed = list(self.generator.stream_report(UNCLASSIFIED, retrieved_docs=[]))[-1]["report"]
+        CacheUtils.clear()
+        generated = self.generator.generate_report(UNCLASSIFIED, retrieved_docs=[])
+        self.assertEqual(streamed["sections"], generated["sections"])
+
+    def test_stream_no_hazards(self):
+        events = list(self.generator.stream_report({"hazards": []}, retrieved_docs=[]))
+        self.assertEqual([e["event"] for e in events], ["start", "section", "done"])
+
+    def test_stream_error(self):
+        self.generator.rule_engine = FailingRuleEngine(self.generator.rule_engine, "风险等级评估")
+        events = list(self.generator.stream_report(CLASSIFIED, retrieved_docs=[]))
+        self.assertEqual(events[-1], {"event": "error", "error": "规则库损坏"})
+        self.assertNotIn("风险等级评估", [e.get("section") for e in events if e["event"] == "section"])
+
+    def test_agenerate_report(self):
+        report = asyncio.run(self.generator.agenerate_report(CLASSIFIED, retrieved_docs=[]))
+        self.assertEqual(list(report["sections"]), REPORT_TEMPLATE["sections"])
+        # 并发生成后各章节的记录仍按模板顺序排列
+        self.assertEqual(list(report["section_sources"]), REPORT_TEMPLATE["sections"])
+        CacheUtils.clear()
+        self.assertEqual(report["sections"], self.generator.generate_report(CLASSIFIED, retrieved_docs=[])["sections"])
+
+    def test_astream_report(self):
+        events = asyncio.run(_collect(self.generator.astream_report(CLASSIFIED, retrieved_docs=[])))
+        report = self._check_events(events, interleaved=True)
+        self.assertEqual(list(report["section_sources"]), REPORT_TEMPLATE["sections"])
+
+    def test_astream_error(self):
+        self.generator.rule_engine = FailingRuleEngine(self.generator.rule_engine, "风险等级评估")
+        events = asyncio.run(_collect(self.generator.astream_report(CLASSIFIED, retrieved_docs=[])))
+        self.assertEqual(events[-1], {"event": "error", "error": "规则库损坏"})
+        self.assertNotIn("done", [e["event"] for e in events])
+        self.assertNotIn("风险等级评估", [e.get("section") for e in events if e["event"] == "section"])
+
+
+class TestBatchReport(ReportTestCase):
+    def setUp(self):
+        super().setUp()
+        self.merged = merge_analyses({
+            "IMG_1.jpg": {"success": True, "hazards": [
+                {"hazard_type": "工人没戴安全帽", "severity": "medium", "location": "3号楼", "confidence": 0.6},
+            ]},
+            "IMG_2.jpg": {"success": True, "hazards": [
+                {"hazard_type": "安全帽未佩戴", "severity": "high", "location": "塔吊下方", "confidence": 0.9},
+                {"hazard_type": "配电箱未上锁", "severity": "low", "confidence": 0.8},
+            ]},
+            "IMG_3.jpg": {"success": False, "error": "图片无法识别"},
+        })
+
+    def test_batch_report(self):
+        report = self.generator.generate_batch_report(self.merged, retrieved_docs=[], metadata={"site_id": "S1"})
+
+        self.assertEqual(report["scope"], "round")
+        self.assertEqual(report["photo_count"], 2)
+        self.assertEqual(report["risk_score"], self.merged["risk_score"])
+        self.assertEqual(list(report["sections"]), REPORT_TEMPLATE["sections"] + ["隐患照片索引"])
+        self.assertIn("IMG_1.jpg（3号楼）；IMG_2.jpg（塔吊下方）", report["sections"]["隐患照片索引"])
+        # 章节按去重后的隐患生成一次：整改建议按类别列出两项
+        self.assertEqual(len(report["sections"]["整改建议"].split("\n")), 2)
+
+    def test_async_batch_report(self):
+        report = asyncio.run(self.generator.agenerate_batch_report(self.merged, retrieved_docs=[]))
+        self.assertEqual(report["scope"], "round")
+        self.assertIn("隐患照片索引", report["sections"])
+
+    def test_all_photos_failed(self):
+        merged = merge_analyses({"IMG_1.jpg": {"success": False}})
+        report = self.generator.generate_batch_report(merged, retrieved_docs=[])
+        self.assertEqual(report, {"success": False, "error": "所有照片分析均失败"})
+        self.assertEqual(self.generator.fake.prompts, [])
+
+
+class TestReinspectionReport(ReportTestCase):
+    def _baseline(self, hazards, scope="single", photo_count=1):
+        return {
+            "report_id": "R1",
+            "report_date": "2026-03-01",
+            "scope": scope,
+            "photo_count": photo_count,
+            "sections": {section: f"上次{section}" for section in REPORT_TEMPLATE["sections"]},
+            "hazards": hazards,
+        }
+
+    def _summary_prompts(self):
+        return [p for p in self.generator.fake.prompts if "隐患概述" in p.split("\n")[0]]
+
+    def test_scope_mismatch(self):
+        report = self.generator.generate_reinspection_report(
+            CLASSIFIED, self._baseline(CLASSIFIED["hazards"], scope="round", photo_count=3), retrieved_docs=[]
+        )
+        self.assertFalse(report["success"])
+        self.assertIn("范围不一致", report["error"])
+
+    def test_unchanged_hazards_reuse_previous_sections(self):
+        report = self.generator.generate_reinspection_report(
+            CLASSIFIED, self._baseline(CLASSIFIED["hazards"]), retrieved_docs=[]
+        )
+
+        self.assertEqual(report["previous_report_id"], "R1")
+        self.assertTrue(report["reinspection_complete"])
+        self.assertEqual(report["inspection_diff"], {"new": 0, "changed": 0, "carried": 2, "resolved": 0, "unverified": 0})
+        self.assertEqual(report["sections"]["隐患概述"], "上次隐患概述")
+        self.assertEqual(report["section_sources"]["隐患概述"], "history")
+        self.assertEqual(report["section_sources"]["风险等级评估"], "rule")
+        self.assertEqual(self._summary_prompts(), [])
+        self.assertIn("复查对比", report["sections"])
+
+    def test_resolved_hazards_list_remaining(self):
+        previous = self._baseline(CLASSIFIED["hazards"])
+        current = {"hazards": CLASSIFIED["hazards"][:1]}
+        report = self.generator.generate_reinspection_report(current, previous, retrieved_docs=[])
+
+        self.assertEqual(report["inspection_diff"]["resolved"], 1)
+        self.assertTrue(report["sections"]["隐患概述"].startswith("本次复查未发现新增或等级变化的隐患"))
+        self.assertIn("1. **未佩戴安全帽**（高风险）", report["sections"]["隐患概述"])
+        self.assertIn("**已整改**：临时用电不规范（低风险）", report["sections"]["复查对比"])
+
+    def test_new_hazards_are_generated_alone(self):
+        previous = self._baseline(CLASSIFIED["hazards"])
+        current = {"hazards": CLASSIFIED["hazards"] + UNCLASSIFIED["hazards"]}
+        report = self.generator.generate_reinspection_report(current, previous, retrieved_docs=[])
+
+        self.assertEqual(report["inspection_diff"]["new"], 1)
+        self.assertEqual(report["section_sources"]["隐患概述"], "llm")
+        # 只为新增隐患调用大模型，仍存在的隐患以附注列出
+        prompt = self._summary_prompts()[0]
+        self.assertIn("地面湿滑", prompt)
+        self.assertNotIn("配电箱未上锁", prompt)
+        self.assertIn("**仍未整改的隐患**（详见上次检查报告 R1）：未佩戴安全帽、临时用电不规范", report["sections"]["隐患概述"])
+
+    def test_incomplete_round_marks_unverified(self):
+        previous = self._baseline(CLASSIFIED["hazards"], scope="round", photo_count=5)
+        merged = merge_analyses({"IMG_1.jpg": {"success": True, "hazards": CLASSIFIED["hazards"][:1]}})
+
+        report = self.generator.generate_batch_report(merged, retrieved_docs=[], previous=previous)
+
+        self.assertFalse(report["reinspection_complete"])
+        self.assertEqual(report["inspection_diff"]["resolved"], 0)
+        self.assertEqual(report["inspection_diff"]["unverified"], 1)
+        self.assertIn("以下隐患本次照片未覆盖，无法确认是否整改：临时用电不规范", report["sections"]["隐患概述"])
+        self.assertIn("**本次未覆盖**", report["sections"]["复查对比"])
+        self.assertIn("隐患照片索引", report["sections"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+报告提示词上下文测试：token估算、隐患序列化、法规片段去重与按预算装填
+
+运行: python -m unittest tests.test_report_context
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+from langchain_core.documents import Document
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.tools.report_context import ReportContextBuilder, estimate_tokens, serialize_hazards
+
+
+class TestEstimateTokens(unittest.TestCase):
+    def test_cjk_counts_per_character(self):
+        self.assertEqual(estimate_tokens("安全帽，"), 4)
+
+    def test_other_characters_per_four(self):
+        self.assertEqual(estimate_tokens("JGJ 59-2011"), 3)
+        self.assertEqual(estimate_tokens("安全 abcd"), 3)
+
+    def test_empty(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens(None), 0)
+
+
+class TestSerializeHazards(unittest.TestCase):
+    def test_one_line_per_hazard(self):
+        text = serialize_hazards([
+            {"hazard_type": "未戴安全帽", "severity": "high", "location": "3号楼", "description": "两名工人\n未戴安全帽"},
+            {"hazard_type": "配电箱未上锁", "severity": "unknown", "photo_count": 3},
+        ])
+        self.assertEqual(text.split("\n"), [
+            "1. [高风险] 未戴安全帽｜3号楼｜两名工人 未戴安全帽",
+            "2. [低风险] 配电箱未上锁｜见于3张照片",
+        ])
+
+    def test_description_is_truncated(self):
+        text = serialize_hazards([{"hazard_type": "临边", "description": "无防护" * 10}], description_chars=6)
+        self.assertTrue(text.endswith("｜无防护无防护…"))
+
+    def test_no_hazards(self):
+        self.assertEqual(serialize_hazards([]), "未发现隐患")
+
+
+class TestReportContextBuilder(unittest.TestCase):
+    def setUp(self):
+        self.builder = ReportContextBuilder(budgets={"整改建议": 40}, default_budget=0, description_chars=50)
+
+    def test_dedupe_chunks(self):
+        chunks = self.builder.dedupe_chunks([
+            Document(page_content="脚手架应设置剪刀撑", metadata={"source": "/kb/JGJ130.pdf"}),
+            {"page_content": "脚手架应设置剪刀撑  ", "metadata": {"source": "other.pdf"}},
+            "剪刀撑",
+            Document(page_content="脚手架应设置剪刀撑和连墙件", metadata={"source": "/kb/GB51210.pdf"}),
+            Document(page_content="   "),
+        ])
+        # 完全相同与被包含的片段去除，包含已保留片段的较长片段替换之
+        self.assertEqual(chunks, [("脚手架应设置剪刀撑和连墙件", "GB51210.pdf")])
+
+    def test_pack_chunks_stays_within_budget(self):
+        chunks = [("甲" * 30, "a.pdf"), ("乙" * 20, ""), ("丙" * 8, "c.pdf"), ("丁" * 5, "")]
+        for budget in (0, 5, 10, 25, 40, 100):
+            text, count = self.builder.pack_chunks(chunks, budget)
+            self.assertLessEqual(sum(estimate_tokens(line) for line in text.split("\n")), budget)
+            self.assertEqual(count, len(text.split("\n")) if text else 0)
+
+    def test_pack_chunks_skips_oversized_and_continues(self):
+        chunks = [("甲" * 30, "a.pdf"), ("乙" * 20, ""), ("丙" * 8, "")]
+        text, count = self.builder.pack_chunks(chunks, 25)
+        self.assertEqual(text.split("\n"), ["- " + "乙" * 20])
+        self.assertEqual(count, 1)
+
+        text, count = self.builder.pack_chunks(chunks, 31)
+        self.assertEqual(text.split("\n"), ["- " + "乙" * 20, "- " + "丙" * 8])
+        self.assertEqual(count, 2)
+
+    def test_build_uses_section_budget(self):
+        chunks = [("规范条文" * 5, "JGJ59.pdf")]
+        analysis = {"hazards": [{"hazard_type": "未戴安全帽", "severity": "medium"}], "summary": "现场存在隐患"}
+
+        inputs, stats = self.builder.build("整改建议", analysis, chunks)
+        self.assertEqual(set(inputs), {"hazards", "regulations"})
+        self.assertEqual(stats["regulation_chunks"], 1)
+        self.assertEqual(stats["input_tokens"], estimate_tokens(inputs["hazards"]) + estimate_tokens(inputs["regulations"]))
+
+        # 未配置预算的章节使用默认预算（此处为0，不附带法规）
+        inputs, stats = self.builder.build("隐患概述", analysis, chunks)
+        self.assertEqual(inputs["regulations"], "")
+        self.assertEqual(stats["regulation_chunks"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""
+报告规则引擎测试：风险等级评估、整改建议与法规依据章节的规则生成及回退条件
+
+运行: python -m unittest tests.test_report_rules
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.config import HAZARD_REMEDIATION
+from src.tools.report_rules import ReportRuleEngine
+
+HELMET = {"hazard_type": "工人未戴安全帽", "severity": "medium", "location": "3号楼"}
+HELMET_HIGH = {"hazard_type": "安全帽佩戴不规范", "severity": "high", "location": "塔吊下方"}
+ELECTRIC = {"hazard_type": "配电箱未上锁", "severity": "low"}
+UNKNOWN = {"hazard_type": "地面湿滑", "severity": "low", "location": "楼梯间"}
+
+
+class TestReportRuleEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = ReportRuleEngine()
+
+    def test_canonical_category(self):
+        self.assertEqual(self.engine.canonical_category(HELMET), "未佩戴安全帽")
+        self.assertIsNone(self.engine.canonical_category(UNKNOWN))
+        # 巡检合并后的隐患以 category 为准
+        merged = {"hazard_type": "其他", "category": "临时用电不规范"}
+        self.assertEqual(self.engine.canonical_category(merged), "临时用电不规范")
+
+    def test_unsupported_section_or_no_hazards(self):
+        self.assertIsNone(self.engine.build_section("隐患概述", [HELMET], "medium"))
+        self.assertIsNone(self.engine.build_section("整改建议", [], "low"))
+
+    def test_risk_assessment(self):
+        content = self.engine.build_section("风险等级评估", [HELMET, ELECTRIC, UNKNOWN], "medium")
+        self.assertIn("共发现安全隐患 3 项，整体风险等级为**中风险**", content)
+        self.assertIn("风险分布：中风险 1 项，低风险 2 项", content)
+        self.assertIn("1. 工人未戴安全帽（3号楼）：中风险，限期整改", content)
+        self.assertIn("2. 配电箱未上锁（位置未注明）：低风险，注意防范", content)
+
+    def test_risk_assessment_does_not_need_library(self):
+        # 风险等级评估不依赖整改要求库，无法归类的隐患同样由规则生成
+        self.assertIsNotNone(self.engine.build_section("风险等级评估", [UNKNOWN], "low"))
+
+    def test_remediation_uses_highest_severity_per_category(self):
+        content = self.engine.build_section("整改建议", [HELMET, ELECTRIC, HELMET_HIGH], "high")
+        lines = content.split("\n")
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith("1. **未佩戴安全帽**（立即整改）："))
+        self.assertIn(HAZARD_REMEDIATION["未佩戴安全帽"]["remediation"], lines[0])
+        self.assertTrue(lines[1].startswith("2. **临时用电不规范**（注意防范）："))
+
+    def test_regulations_are_deduplicated(self):
+        content = self.engine.build_section("相关法规依据", [HELMET, HELMET_HIGH, ELECTRIC], "high")
+        expected = HAZARD_REMEDIATION["未佩戴安全帽"]["regulations"] + HAZARD_REMEDIATION["临时用电不规范"]["regulations"]
+        self.assertEqual(content.split("\n"), [f"{i}. {r}" for i, r in enumerate(expected, 1)])
+
+    def test_unclassified_hazard_falls_back_to_llm(self):
+        self.assertIsNone(self.engine.build_section("整改建议", [HELMET, UNKNOWN], "medium"))
+        self.assertIsNone(self.engine.build_section("相关法规依据", [UNKNOWN], "low"))
+
+    def test_custom_library(self):
+        engine = ReportRuleEngine({"未佩戴安全帽": {"remediation": "补发安全帽", "regulations": ["规范A"]}})
+        self.assertEqual(engine.build_section("相关法规依据", [HELMET], "medium"), "1. 规范A")
+        self.assertIsNone(engine.build_section("整改建议", [ELECTRIC], "low"))
+
+
+if __name__ == "__main__":
+    unittest.main()
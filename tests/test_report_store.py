@@ -0,0 +1,145 @@
+"""
+报告存储测试：只写一次的保存、按条件查询、工地历史列表与复查基准读取
+
+运行: python -m unittest tests.test_report_store
+"""
+
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.tools.report_store import ReportStore
+
+
+def _report(report_id, site_id="S1", company="甲建筑公司", generated_at="2026-03-01T09:00:00",
+            overall_risk="medium", **extra):
+    return {
+        "report_id": report_id,
+        "title": "施工现场安全评估报告",
+        "site_id": site_id,
+        "company": company,
+        "generated_at": generated_at,
+        "overall_risk": overall_risk,
+        "sections": {"隐患概述": f"{report_id} 概述"},
+        **extra,
+    }
+
+
+def _analysis(*hazards):
+    return {"hazards": [{"hazard_type": t, "severity": s} for t, s in hazards]}
+
+
+class ReportStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = ReportStore(Path(self._tmp.name) / "reports.db")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+
+class TestSave(ReportStoreTestCase):
+    def test_save_and_get(self):
+        report = _report("R1")
+        analysis = _analysis(("工人未戴安全帽", "high"))
+        self.assertEqual(self.store.save(report, analysis), {"success": True, "report_id": "R1"})
+
+        self.assertEqual(self.store.get("R1"), report)
+        self.assertEqual(self.store.get_hazards("R1"), analysis["hazards"])
+
+    def test_missing_report(self):
+        self.assertIsNone(self.store.get("missing"))
+        self.assertEqual(self.store.get_hazards("missing"), [])
+
+    def test_report_is_written_once(self):
+        self.store.save(_report("R1"))
+        result = self.store.save(_report("R1", overall_risk="high"))
+        self.assertFalse(result["success"])
+        self.assertEqual(self.store.get("R1")["overall_risk"], "medium")
+
+    def test_failed_report_is_not_saved(self):
+        result = self.store.save({"success": False, "report_id": "R1"})
+        self.assertFalse(result["success"])
+        self.assertIsNone(self.store.get("R1"))
+
+
+class TestQuery(ReportStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store.save(_report("R1", generated_at="2026-03-01T09:00:00", overall_risk="high"),
+                        _analysis(("工人未戴安全帽", "high"), ("配电箱未上锁", "low")))
+        self.store.save(_report("R2", generated_at="2026-03-05T09:00:00", company="乙建筑公司"),
+                        _analysis(("脚手架缺少剪刀撑", "medium")))
+        self.store.save(_report("R3", site_id="S2", generated_at="2026-03-10T09:00:00", overall_risk="low"),
+                        _analysis(("地面湿滑", "low")))
+
+    def _ids(self, **kwargs):
+        return [row["report_id"] for row in self.store.query(**kwargs)]
+
+    def test_newest_first(self):
+        self.assertEqual(self._ids(), ["R3", "R2", "R1"])
+        self.assertEqual(self._ids(limit=1), ["R3"])
+
+    def test_filters(self):
+        self.assertEqual(self._ids(site_id="S1"), ["R2", "R1"])
+        self.assertEqual(self._ids(company="乙建筑公司"), ["R2"])
+        self.assertEqual(self._ids(overall_risk="high"), ["R1"])
+        self.assertEqual(self._ids(date_from="2026-03-05", date_to="2026-03-10"), ["R3", "R2"])
+        self.assertEqual(self._ids(site_id="S1", overall_risk="low"), [])
+
+    def test_hazard_type_is_canonicalized(self):
+        # 不同表述归入同一规范类别
+        self.assertEqual(self._ids(hazard_type="没戴头盔"), ["R1"])
+        self.assertEqual(self._ids(hazard_type="未佩戴安全帽"), ["R1"])
+        # 无法归类的类型按原始表述匹配
+        self.assertEqual(self._ids(hazard_type="地面湿滑"), ["R3"])
+
+    def test_merged_hazard_category_is_indexed(self):
+        self.store.save(_report("R4"), {"hazards": [
+            {"hazard_type": "现场存在违规情况", "category": "消防隐患", "severity": "medium"},
+        ]})
+        self.assertEqual(self._ids(hazard_type="灭火器"), ["R4"])
+
+    def test_summary_excludes_content(self):
+        row = self.store.query(site_id="S2")[0]
+        self.assertEqual(row["hazard_count"], 1)
+        self.assertEqual(row["report_date"], "2026-03-10")
+        self.assertNotIn("report_json", row)
+
+
+class TestReinspection(ReportStoreTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store.save(_report("SINGLE", scope="single"), _analysis(("工人未戴安全帽", "high")))
+        self.store.save(_report("ROUND", scope="round", photo_count=5), _analysis(("配电箱未上锁", "low")))
+        # 早期保存的巡检报告没有 scope 字段
+        self.store.save(_report("LEGACY", photo_count=3))
+        self.store.save(_report("OTHER", site_id="S2"))
+
+    def test_list_for_site(self):
+        rows = self.store.list_for_site("S1")
+        self.assertEqual([row["report_id"] for row in rows], ["LEGACY", "ROUND", "SINGLE"])
+        self.assertEqual([row["scope"] for row in rows], ["round", "round", "single"])
+        self.assertEqual([row["photo_count"] for row in rows], [3, 5, 1])
+
+    def test_list_for_site_by_scope(self):
+        self.assertEqual([row["report_id"] for row in self.store.list_for_site("S1", scope="single")], ["SINGLE"])
+        self.assertEqual(len(self.store.list_for_site("S1", scope="round", limit=1)), 1)
+        self.assertEqual(self.store.list_for_site(""), [])
+
+    def test_reinspection_baseline(self):
+        baseline = self.store.reinspection_baseline("ROUND")
+        self.assertEqual(baseline["report_id"], "ROUND")
+        self.assertEqual(baseline["scope"], "round")
+        self.assertEqual(baseline["photo_count"], 5)
+        self.assertEqual(baseline["sections"], {"隐患概述": "ROUND 概述"})
+        self.assertEqual(baseline["hazards"], [{"hazard_type": "配电箱未上锁", "severity": "low"}])
+        self.assertIsNone(self.store.reinspection_baseline("missing"))
+
+
+if __name__ == "__main__":
+    unittest.main()
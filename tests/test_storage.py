@@ -0,0 +1,227 @@
+"""
+存储生命周期测试：上传存储的引用与回收、目录清理、后台写入与释放的先后顺序
+
+运行: python -m unittest tests.test_storage
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.tools.storage import StorageSweeper, UploadStore, _now, sweep_directory
+
+
+class UploadStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.tmp = Path(self._tmp.name)
+        self.store = UploadStore(self.tmp / "uploads", self.tmp / "uploads.db")
+
+    def tearDown(self):
+        if self.store._writer is not None:
+            self.store._writer.shutdown(wait=True)
+        self._tmp.cleanup()
+
+    def _age(self, digest, seconds):
+        """把文件的最近使用时间提前，模拟宽限期已过"""
+        with self.store._connect() as conn:
+            conn.execute("UPDATE uploads SET last_used_at = ? WHERE digest = ?", (_now(-seconds), digest))
+
+
+class TestUploadStore(UploadStoreTestCase):
+    def test_same_content_is_stored_once(self):
+        first = self.store.put(b"photo", "IMG_0001.jpg", "session:a")
+        second = self.store.put(b"photo", "other.jpg", "session:b")
+        self.assertFalse(first["existing"])
+        self.assertTrue(second["existing"])
+        self.assertEqual(first["path"], second["path"])
+        self.assertEqual(self.store.refcount(first["digest"]), 2)
+
+    def test_same_name_different_content_does_not_collide(self):
+        first = self.store.put(b"photo-1", "IMG_0001.jpg", "session:a")
+        second = self.store.put(b"photo-2", "IMG_0001.jpg", "session:a")
+        self.assertNotEqual(first["path"], second["path"])
+        self.assertEqual(Path(first["path"]).read_bytes(), b"photo-1")
+        self.assertEqual(Path(second["path"]).read_bytes(), b"photo-2")
+
+    def test_release_owner_keeps_listed_digests(self):
+        kept = self.store.put(b"current", "a.jpg", "session:a")
+        dropped = self.store.put(b"old", "b.jpg", "session:a")
+        other = self.store.put(b"old", "b.jpg", "report:R1")
+
+        released = self.store.release_owner("session:a", keep=[kept["digest"]])
+
+        self.assertEqual(released, 1)
+        self.assertEqual(self.store.refcount(kept["digest"]), 1)
+        # 其他引用方的引用不受影响
+        self.assertEqual(self.store.refcount(dropped["digest"]), 1)
+        self.assertEqual(other["digest"], dropped["digest"])
+
+    def test_release_owner_without_keep(self):
+        self.store.put(b"a", "a.txt", "kb")
+        self.store.put(b"b", "b.txt", "kb")
+        self.assertEqual(self.store.release_owner("kb"), 2)
+        self.assertEqual(self.store.stats()["unreferenced_files"], 2)
+
+    def test_acquire_path(self):
+        stored = self.store.put(b"photo", "a.jpg", "session:a")
+        self.assertTrue(self.store.acquire_path(stored["path"], "report:R1"))
+        self.assertFalse(self.store.acquire_path(self.tmp / "missing.jpg", "report:R1"))
+        self.assertEqual(self.store.refcount(stored["digest"]), 2)
+
+
+class TestUploadStoreGC(UploadStoreTestCase):
+    def test_referenced_files_survive(self):
+        stored = self.store.put(b"x" * 100, "a.jpg", "kb")
+        self._age(stored["digest"], 3600)
+        result = self.store.gc(max_bytes=0, grace_seconds=0)
+        self.assertEqual(result["removed"], 0)
+        self.assertTrue(Path(stored["path"]).exists())
+
+    def test_unreferenced_files_wait_for_grace_period(self):
+        stored = self.store.put(b"x" * 100, "a.jpg", "session:a")
+        self.store.release(stored["digest"], "session:a")
+
+        result = self.store.gc(max_bytes=10 ** 9, grace_seconds=600)
+        self.assertEqual(result["removed"], 0)
+
+        self._age(stored["digest"], 3600)
+        result = self.store.gc(max_bytes=10 ** 9, grace_seconds=600)
+        self.assertEqual(result["removed"], 1)
+        self.assertEqual(result["freed_bytes"], 100)
+        self.assertFalse(Path(stored["path"]).exists())
+        self.assertEqual(self.store.stats()["files"], 0)
+
+    def test_expired_refs_are_dropped(self):
+        stored = self.store.put(b"x", "a.jpg", "session:a", ttl_seconds=-1)
+        self._age(stored["digest"], 3600)
+        result = self.store.gc(max_bytes=10 ** 9, grace_seconds=600)
+        self.assertEqual(result["expired_refs"], 1)
+        self.assertEqual(result["removed"], 1)
+
+    def test_over_quota_evicts_unreferenced_regardless_of_grace(self):
+        old = self.store.put(b"o" * 100, "old.jpg", "session:a")
+        new = self.store.put(b"n" * 100, "new.jpg", "session:a")
+        held = self.store.put(b"h" * 100, "held.jpg", "report:R1")
+        self.store.release_owner("session:a")
+        self._age(old["digest"], 60)
+
+        result = self.store.gc(max_bytes=150, grace_seconds=600)
+
+        # 从最久未使用的开始删除，降到配额以下即停止；有引用的文件保留
+        self.assertEqual(result["removed"], 2)
+        self.assertEqual(result["remaining_bytes"], 100)
+        self.assertFalse(Path(old["path"]).exists())
+        self.assertFalse(Path(new["path"]).exists())
+        self.assertTrue(Path(held["path"]).exists())
+
+
+class TestPutAsync(UploadStoreTestCase):
+    def _blocking_put(self):
+        """让后台写入停在登记引用之前，直到 gate 被放行"""
+        gate = threading.Event()
+        put = self.store.put
+
+        def blocked(*args, **kwargs):
+            gate.wait(5)
+            return put(*args, **kwargs)
+
+        self.store.put = blocked
+        return gate
+
+    def test_release_before_put_completes_leaves_no_ref(self):
+        gate = self._blocking_put()
+        future = self.store.put_async(b"photo", "a.jpg", "session:a", ttl_seconds=86400)
+
+        # 页面清理先于后台写入执行
+        self.assertEqual(self.store.release_owner("session:a"), 0)
+        gate.set()
+        stored = future.result(5)
+
+        self.assertTrue(Path(stored["path"]).exists())
+        self.assertEqual(self.store.refcount(stored["digest"]), 0)
+
+    def test_release_keeps_pending_current_upload(self):
+        gate = self._blocking_put()
+        current = self.store.put_async(b"current", "a.jpg", "session:a")
+        previous = self.store.put_async(b"previous", "b.jpg", "session:a")
+
+        self.store.release_owner("session:a", keep=[hashlib.sha256(b"current").hexdigest()])
+        gate.set()
+
+        self.assertEqual(self.store.refcount(current.result(5)["digest"]), 1)
+        self.assertEqual(self.store.refcount(previous.result(5)["digest"]), 0)
+
+    def test_put_async_without_release_keeps_ref(self):
+        stored = self.store.put_async(b"photo", "a.jpg", "session:a").result(5)
+        self.assertEqual(self.store.refcount(stored["digest"]), 1)
+        # 写入全部完成后不再保留待释放记录
+        self.store.put_async(b"other", "b.jpg", "session:a").result(5)
+        self.assertEqual(self.store._pending, {})
+        self.assertEqual(self.store._deferred_releases, {})
+
+
+class TestSweepDirectory(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, name, size, age_seconds=0):
+        path = self.dir / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        mtime = time.time() - age_seconds
+        os.utime(path, (mtime, mtime))
+        return path
+
+    def test_removes_expired_files(self):
+        old = self._write("old.pdf", 10, age_seconds=7200)
+        new = self._write("sub/new.pdf", 10)
+        result = sweep_directory(self.dir, max_age_seconds=3600)
+        self.assertEqual(result["removed"], 1)
+        self.assertFalse(old.exists())
+        self.assertTrue(new.exists())
+
+    def test_quota_removes_oldest_first(self):
+        oldest = self._write("a.jpg", 100, age_seconds=300)
+        middle = self._write("b.jpg", 100, age_seconds=200)
+        newest = self._write("c.jpg", 100, age_seconds=100)
+        result = sweep_directory(self.dir, max_bytes=150)
+        self.assertEqual(result, {"removed": 2, "freed_bytes": 200, "remaining_bytes": 100})
+        self.assertFalse(oldest.exists())
+        self.assertFalse(middle.exists())
+        self.assertTrue(newest.exists())
+
+    def test_missing_directory(self):
+        result = sweep_directory(self.dir / "missing", max_bytes=0)
+        self.assertEqual(result["removed"], 0)
+
+
+class TestStorageSweeper(UploadStoreTestCase):
+    def test_sweep_once_covers_uploads_and_directories(self):
+        output_dir = self.tmp / "output"
+        output_dir.mkdir()
+        (output_dir / "report.pdf").write_bytes(b"x" * 100)
+        stored = self.store.put(b"photo", "a.jpg", "session:a")
+        self.store.release(stored["digest"], "session:a")
+        self._age(stored["digest"], 3600)
+
+        results = StorageSweeper(self.store, [(output_dir, 0, None)]).sweep_once()
+
+        self.assertEqual(results["uploads"]["removed"], 1)
+        self.assertEqual(results[str(output_dir)]["removed"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
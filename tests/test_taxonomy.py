@@ -0,0 +1,99 @@
+"""
+隐患分类匹配测试：前缀树最长匹配、同义词归一化、分片路由
+
+运行: python -m unittest tests.test_taxonomy
+"""
+
+import sys
+import unittest
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from src.core.taxonomy import HazardTaxonomy, TrieMatcher, get_taxonomy
+from src.core.utils import RoutingUtils
+
+
+class TestTrieMatcher(unittest.TestCase):
+    def test_longest_match_wins(self):
+        matcher = TrieMatcher({"起重": {"short"}, "塔式起重机": {"long"}, "塔式": {"prefix"}})
+        matches = list(matcher.iter_matches("检查塔式起重机的起重限位器"))
+        self.assertEqual(matches, [(2, "塔式起重机", "long"), (8, "起重", "short")])
+
+    def test_pattern_with_several_payloads(self):
+        matcher = TrieMatcher({"配电箱": {"a", "b"}})
+        self.assertEqual(sorted(payload for _, _, payload in matcher.iter_matches("配电箱")), ["a", "b"])
+
+    def test_count_keeps_first_seen_order(self):
+        matcher = TrieMatcher({"基坑": {"pit"}, "脚手架": {"scaffold"}})
+        self.assertEqual(list(matcher.count("脚手架靠近基坑，基坑边堆土")), ["scaffold", "pit"])
+        self.assertEqual(matcher.count("脚手架靠近基坑，基坑边堆土"), {"scaffold": 1, "pit": 2})
+
+    def test_special_characters_are_escaped(self):
+        matcher = TrieMatcher({"TN-S": {"tns"}, "a.b": {"dot"}})
+        self.assertEqual(matcher.count("采用TN-S系统，axb"), {"tns": 1})
+
+    def test_empty_patterns(self):
+        matcher = TrieMatcher({"": {"empty"}})
+        self.assertEqual(list(matcher.iter_matches("任意文本")), [])
+
+
+class TestHazardTaxonomy(unittest.TestCase):
+    def setUp(self):
+        self.taxonomy = HazardTaxonomy()
+
+    def test_synonyms_canonicalize_to_category(self):
+        self.assertEqual(self.taxonomy.categories("工人没戴安全帽"), ["未佩戴安全帽"])
+        self.assertEqual(self.taxonomy.categories("塔吊吊物下方有人"), ["起重吊装违规"])
+        self.assertEqual(self.taxonomy.categories("电焊作业旁放置氧气瓶"), ["动火作业违规"])
+
+    def test_every_category_canonicalizes_to_itself(self):
+        for category in self.taxonomy.taxonomy:
+            self.assertEqual(self.taxonomy.categories(category)[0], category)
+
+    def test_categories_ordered_by_hits(self):
+        categories = self.taxonomy.categories("配电箱无漏电保护，电缆拖地，未戴安全帽")
+        self.assertEqual(categories, ["临时用电不规范", "未佩戴安全帽"])
+
+    def test_route_always_includes_general(self):
+        self.assertEqual(self.taxonomy.route("施工现场整体情况良好"), ["general"])
+        self.assertEqual(self.taxonomy.route("塔式起重机附着装置松动"), ["lifting", "general"])
+        self.assertEqual(self.taxonomy.route("脚手架立杆悬空，旁边配电箱未上锁，脚手架无剪刀撑")[-1], "general")
+        self.assertEqual(self.taxonomy.route(""), ["general"])
+
+    def test_general_categories_do_not_add_shards(self):
+        categories, shards = self.taxonomy.analyze("工人未系安全带")
+        self.assertEqual(categories, ["未系安全带"])
+        self.assertEqual(shards, [])
+
+    def test_custom_taxonomy(self):
+        taxonomy = HazardTaxonomy(
+            {"坑洞": {"discipline": "excavation", "synonyms": ["深坑"], "query": ""}},
+            {"excavation": {"keywords": ["基坑"]}, "general": {"keywords": []}},
+        )
+        self.assertEqual(taxonomy.analyze("基坑边有深坑"), (["坑洞"], ["excavation"]))
+
+    def test_invalid_input(self):
+        self.assertEqual(self.taxonomy.analyze(None), ([], []))
+
+    def test_default_taxonomy_is_shared(self):
+        self.assertIs(get_taxonomy(), get_taxonomy())
+
+
+class TestRoutingUtils(unittest.TestCase):
+    def test_canonicalize_hazard(self):
+        self.assertEqual(RoutingUtils.canonicalize_hazard("工人没戴安全帽"), ["未佩戴安全帽"])
+        self.assertEqual(RoutingUtils.canonicalize_hazard(None), [])
+
+    def test_route_shards(self):
+        self.assertEqual(RoutingUtils.route_shards("基坑边坡无支护"), ["excavation", "general"])
+        self.assertEqual(RoutingUtils.route_shards(None), ["general"])
+
+    def test_route_question_returns_collection_name(self):
+        self.assertEqual(RoutingUtils.route_question("脚手架有哪些安全要求"), "safe")
+        self.assertEqual(RoutingUtils.route_question(""), "safe")
+
+
+if __name__ == "__main__":
+    unittest.main()